@@ -0,0 +1,87 @@
+from fastapi import Depends
+from fastapi.routing import APIRouter
+
+from core.database import database_client
+from core.dependencies import get_admin_user, get_database
+from core.exceptions import NotFoundException
+from database.feed_refresh_run import FeedRefreshRunDatabase
+from database.feed_search_index import feed_search_index
+from models.feed_refresh import RefreshRunReport
+from models.subscriber import Subscriber
+from services.feeds_scheduler import feed_scheduler
+from services.utils.codec import password_codec
+from services.utils.http_client import feed_fetcher
+from services.utils.principal_cache import principal_cache
+from services.utils.response_cache import response_cache
+from services.utils.timeline_cache import timeline_cache
+from services.utils.view_tracker import view_tracker
+
+router = APIRouter(prefix="/monitoring", tags=["MONITORING"])
+
+
+@router.get("/database_pool")
+async def get_database_pool_stats(current_user: Subscriber = Depends(get_admin_user)):
+    """Gets the connection pool statistics of the worker serving the request"""
+    return database_client.stats()
+
+
+@router.get("/feed_fetches")
+async def get_feed_fetch_stats(current_user: Subscriber = Depends(get_admin_user)):
+    """Gets the fetch latency and size of every rss feed fetched by the worker"""
+    return feed_fetcher.stats()
+
+
+@router.get("/feed_refresh", response_model=RefreshRunReport)
+async def get_last_feed_refresh(
+    db=Depends(get_database),
+    current_user: Subscriber = Depends(get_admin_user),
+):
+    """Gets the report of the most recent feed refresh run"""
+    report = await FeedRefreshRunDatabase(db).get_latest()
+    if report:
+        return report
+    raise NotFoundException("No feed refresh run found")
+
+
+@router.get("/scheduler_lease")
+async def get_scheduler_lease(current_user: Subscriber = Depends(get_admin_user)):
+    """Gets whether the worker serving the request owns the feed scheduler"""
+    return feed_scheduler.lease.status()
+
+
+@router.get("/principal_cache")
+async def get_principal_cache_stats(current_user: Subscriber = Depends(get_admin_user)):
+    """Gets the hit and miss counts of the authenticated principal cache"""
+    return principal_cache.stats()
+
+
+@router.get("/password_hashing")
+async def get_password_hashing_stats(
+    current_user: Subscriber = Depends(get_admin_user),
+):
+    """Gets the load of the password hashing pool of the worker"""
+    return password_codec.stats()
+
+
+@router.get("/timeline_cache")
+async def get_timeline_cache_stats(current_user: Subscriber = Depends(get_admin_user)):
+    """Gets the hit and miss counts of the timeline page cache of the worker"""
+    return timeline_cache.stats()
+
+
+@router.get("/response_cache")
+async def get_response_cache_stats(current_user: Subscriber = Depends(get_admin_user)):
+    """Gets the hit and miss counts of the response cache of the worker"""
+    return response_cache.stats()
+
+
+@router.get("/views")
+async def get_view_tracker_stats(current_user: Subscriber = Depends(get_admin_user)):
+    """Gets the rss feed views buffered and written by the worker"""
+    return view_tracker.stats()
+
+
+@router.get("/search_index")
+async def get_search_index_stats(current_user: Subscriber = Depends(get_admin_user)):
+    """Gets the size and snapshot state of the embedded search index of the worker"""
+    return feed_search_index.stats()
@@ -1,24 +1,150 @@
 import asyncio
-from typing import List
+from datetime import datetime
+from typing import List, Tuple, Union
+from bson import ObjectId
 from fastapi.routing import APIRouter
-from fastapi.responses import JSONResponse
-from fastapi import Depends, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import Depends, Query, status
 
-from core.dependencies import get_database, get_current_user, get_admin_user
+from application.schema.rss_feed import (
+    RssFeedPageSchema,
+    RssFeedSearchPageSchema,
+    RssFeedViewsRequestSchema,
+    RssFeedViewsResponseSchema,
+)
+from core.config import settings
+from core.dependencies import (
+    ConditionalGet,
+    get_database,
+    get_current_user,
+    get_admin_user,
+)
+from core.exceptions import BadRequest
+from core.responses import FastJSONResponse
 from models.rss_feed import RssFeed
 from models.subscriber import Subscriber
 from services.rss_feed import RssFeedService
 from services.rss_provider import RssProviderService
+from services.utils.invalidation import RSS_FEEDS
+from services.utils.response_cache import response_cache
+from services.utils.view_tracker import view_tracker
 
 router = APIRouter(prefix="/rss_feeds", tags=["RSS Feed"])
 
+rss_feeds_version = ConditionalGet(
+    settings.RSS_FEEDS_COLLECTION, cache_control=settings.RSS_FEEDS_CACHE_CONTROL
+)
 
-@router.get("/", response_model=List[RssFeed])
-async def list_rss_feeds(db=Depends(get_database)):
-    """Gets a list of all rss feeds"""
+
+@router.get("/", response_model=RssFeedPageSchema)
+async def list_rss_feeds(
+    limit: int = Query(
+        settings.RSS_FEEDS_PAGE_SIZE, ge=1, le=settings.RSS_FEEDS_MAX_PAGE_SIZE
+    ),
+    after: Union[str, None] = None,
+    stream: bool = False,
+    db=Depends(get_database),
+    etag: str = Depends(rss_feeds_version),
+):
+    """Gets a page of rss feeds, newest first
+
+    Pass the returned `next_cursor` as `after` to get the next page. With
+    `stream=true` every rss feed after the cursor is streamed as NDJSON.
+    Answers 304 when `If-None-Match` holds the current `ETag`.
+    """
     rss_feed_service = RssFeedService(db)
-    rss_feeds = await rss_feed_service.list()
-    return rss_feeds
+    if stream:
+        rss_feeds = rss_feed_service.iterate(after)
+        return StreamingResponse(
+            (rss_feed.json() + "\n" async for rss_feed in rss_feeds),
+            media_type="application/x-ndjson",
+            headers=rss_feeds_version.headers(etag),
+        )
+    if settings.FAST_JSON_RESPONSES:
+        # documents straight from the database, not validated again
+        rss_feeds, next_cursor = await response_cache.get_or_load(
+            RSS_FEEDS,
+            ("page_documents", limit, after, etag),
+            lambda: rss_feed_service.list_page_documents(limit, after),
+            Tuple[List[dict], Union[str, None]],
+        )
+        return FastJSONResponse(
+            {"items": rss_feeds, "next_cursor": next_cursor},
+            headers=rss_feeds_version.headers(etag),
+        )
+    rss_feeds, next_cursor = await response_cache.get_or_load(
+        RSS_FEEDS,
+        ("page", limit, after, etag),
+        lambda: rss_feed_service.list_page(limit, after),
+        Tuple[List[RssFeed], Union[str, None]],
+    )
+    return RssFeedPageSchema(items=rss_feeds, next_cursor=next_cursor)
+
+
+@router.get("/search", response_model=RssFeedSearchPageSchema)
+async def search_rss_feeds(
+    q: str = Query(..., min_length=1),
+    provider_id: Union[str, None] = None,
+    published_after: Union[datetime, None] = None,
+    published_before: Union[datetime, None] = None,
+    limit: int = Query(
+        settings.SEARCH_PAGE_SIZE, ge=1, le=settings.SEARCH_MAX_PAGE_SIZE
+    ),
+    offset: int = Query(0, ge=0, le=settings.SEARCH_MAX_OFFSET),
+    db=Depends(get_database),
+    current_user: Subscriber = Depends(get_current_user),
+):
+    """Searches rss feeds by title and description, most relevant first
+
+    Pass the returned `next_offset` as `offset` to get the next page.
+    """
+    rss_feeds, next_offset = await RssFeedService(db).search(
+        q, limit, offset, provider_id, published_after, published_before
+    )
+    return RssFeedSearchPageSchema(items=rss_feeds, next_offset=next_offset)
+
+
+@router.post(
+    "/views",
+    response_model=RssFeedViewsResponseSchema,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def record_rss_feed_views(
+    views: RssFeedViewsRequestSchema,
+    current_user: Subscriber = Depends(get_current_user),
+):
+    """Records that the current subscriber viewed several rss feeds
+
+    Views are buffered and written in the background, a view of the same
+    rss feed shortly after the previous one is counted once.
+    """
+    if not all(ObjectId.is_valid(feed_id) for feed_id in views.feed_ids):
+        raise BadRequest("Invalid rss feed id")
+    response = RssFeedViewsResponseSchema()
+    for feed_id in views.feed_ids:
+        outcome = view_tracker.record(feed_id, current_user.id)
+        setattr(response, outcome, getattr(response, outcome) + 1)
+    return response
+
+
+@router.post(
+    "/{id}/views",
+    response_model=RssFeedViewsResponseSchema,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def record_rss_feed_view(
+    id: str,
+    current_user: Subscriber = Depends(get_current_user),
+):
+    """Records that the current subscriber viewed a rss feed
+
+    The view is buffered and written in the background, a view of the same
+    rss feed shortly after the previous one is counted once.
+    """
+    if not ObjectId.is_valid(id):
+        raise BadRequest("Invalid rss feed id")
+    outcome = view_tracker.record(id, current_user.id)
+    return RssFeedViewsResponseSchema(**{outcome: 1})
 
 
 @router.get("/{id}", response_model=RssFeed)
@@ -26,10 +152,16 @@ async def get_rss_feed_by_id(
     id: str,
     db=Depends(get_database),
     current_user: Subscriber = Depends(get_current_user),
+    etag: str = Depends(rss_feeds_version),
 ):
-    """Gets a rss feed by id"""
+    """Gets a rss feed by id
+
+    Answers 304 when `If-None-Match` holds the current `ETag`.
+    """
     rss_feed_service = RssFeedService(db)
-    rss_feed = await rss_feed_service.get_by_id(id)
+    rss_feed = await response_cache.get_or_load(
+        RSS_FEEDS, ("id", id, etag), lambda: rss_feed_service.get_by_id(id), RssFeed
+    )
     return rss_feed
 
 
@@ -54,7 +186,7 @@ async def get_rss_feed_by_provider_name(
     """Gets a rss feed by provider name"""
     rss_feed_service = RssFeedService(db)
     rss_provider_service = RssProviderService(db)
-    rss_providers = await rss_provider_service.search_by_name(provider_name)
+    rss_providers = await rss_provider_service.search_by_name(provider_name, ["id"])
 
     rss_feeds = await asyncio.gather(
         *[
@@ -1,40 +1,108 @@
 from typing import List
-from fastapi import Depends, status
+from fastapi import Depends, Query, status
 from fastapi.responses import JSONResponse
 from fastapi.routing import APIRouter
 from pydantic import AnyUrl
 
+from application.schema.rss_provider import (
+    RssProviderSchema,
+    RssProviderSearchPageSchema,
+)
+from core.config import settings
+from core.responses import FastJSONResponse
 from models.rss_provider import RssProvider
-from core.dependencies import get_database, get_current_user, get_admin_user
+from core.dependencies import (
+    ConditionalGet,
+    get_database,
+    get_current_user,
+    get_admin_user,
+)
 from services.rss_provider import RssProviderService
+from services.utils.invalidation import RSS_PROVIDERS
+from services.utils.response_cache import response_cache
 
 router = APIRouter(prefix="/rss_providers", tags=["RSS_PROVIDER"])
 
+# the fetch state of the scheduler is never read for the responses
+RSS_PROVIDER_FIELDS = list(RssProviderSchema.__fields__)
 
-@router.get("/", response_model=List[RssProvider])
+rss_providers_version = ConditionalGet(
+    settings.RSS_PROVIDER_COLLECTION,
+    cache_control=settings.RSS_PROVIDERS_CACHE_CONTROL,
+)
+
+
+@router.get("/", response_model=List[RssProviderSchema])
 async def list_rss_providers(
     db=Depends(get_database),
     current_user=Depends(get_current_user),
+    etag: str = Depends(rss_providers_version),
 ):
-    """Gets a list of all rss providers"""
+    """Gets a list of all rss providers
+
+    Answers 304 when `If-None-Match` holds the current `ETag`.
+    """
     rss_provider_service = RssProviderService(db)
-    rss_providers = await rss_provider_service.list()
+    if settings.FAST_JSON_RESPONSES:
+        # documents straight from the database, not validated again
+        rss_providers = await response_cache.get_or_load(
+            RSS_PROVIDERS,
+            ("list_documents", etag),
+            lambda: rss_provider_service.list_documents(RSS_PROVIDER_FIELDS),
+            List[dict],
+        )
+        return FastJSONResponse(
+            rss_providers, headers=rss_providers_version.headers(etag)
+        )
+    rss_providers = await response_cache.get_or_load(
+        RSS_PROVIDERS,
+        ("list", etag),
+        lambda: rss_provider_service.list(RSS_PROVIDER_FIELDS),
+        List[RssProvider],
+    )
     return rss_providers
 
 
-@router.get("/{id}", response_model=RssProvider)
+@router.get("/search", response_model=RssProviderSearchPageSchema)
+async def search_rss_providers(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(
+        settings.SEARCH_PAGE_SIZE, ge=1, le=settings.SEARCH_MAX_PAGE_SIZE
+    ),
+    offset: int = Query(0, ge=0, le=settings.SEARCH_MAX_OFFSET),
+    db=Depends(get_database),
+    current_user=Depends(get_current_user),
+):
+    """Searches rss providers by title and description, most relevant first
+
+    Pass the returned `next_offset` as `offset` to get the next page.
+    """
+    rss_providers, next_offset = await RssProviderService(db).search(q, limit, offset)
+    return RssProviderSearchPageSchema(items=rss_providers, next_offset=next_offset)
+
+
+@router.get("/{id}", response_model=RssProviderSchema)
 async def get_rss_provider_by_id(
     id: str,
     db=Depends(get_database),
     current_user=Depends(get_current_user),
+    etag: str = Depends(rss_providers_version),
 ):
-    """Gets a rss provider by id"""
+    """Gets a rss provider by id
+
+    Answers 304 when `If-None-Match` holds the current `ETag`.
+    """
     rss_provider_service = RssProviderService(db)
-    rss_provider = await rss_provider_service.get_by_id(id)
+    rss_provider = await response_cache.get_or_load(
+        RSS_PROVIDERS,
+        ("id", id, etag),
+        lambda: rss_provider_service.get_by_id(id, RSS_PROVIDER_FIELDS),
+        RssProvider,
+    )
     return rss_provider
 
 
-@router.post("/", response_model=RssProvider, status_code=status.HTTP_201_CREATED)
+@router.post("/", response_model=RssProviderSchema, status_code=status.HTTP_201_CREATED)
 async def create_rss_provider(
     url: AnyUrl,
     db=Depends(get_database),
@@ -46,7 +114,7 @@ async def create_rss_provider(
     return rss_provider
 
 
-@router.put("/{id}", response_model=RssProvider)
+@router.put("/{id}", response_model=RssProviderSchema)
 async def update_rss_provider(
     id: str,
     url: AnyUrl,
@@ -1,21 +1,27 @@
-from typing import List
-from fastapi import BackgroundTasks, Depends, status
+from typing import List, Union
+from fastapi import BackgroundTasks, Depends, Query, status
 from fastapi.responses import JSONResponse
 from fastapi.routing import APIRouter
 
+from core.config import settings
 from core.dependencies import get_database, get_current_user, get_admin_user
 from core.exceptions import UnauthorizedException
 from application.schema.subscriber import (
     SubscriberRequestSchema,
     SubscriberResponseSchema,
 )
+from application.schema.rss_feed import TimelinePageSchema
 from models.subscriber import Subscriber
 from services.subscriber import SubscriberService
+from services.timeline import TimelineService
 from services.auth import AuthService
 from services.utils.mailing import Mailing, TemplateBodyVars
 
 router = APIRouter(prefix="/subscribers", tags=["SUBSCRIBER"])
 
+# only what the response shows is read, never the password hash
+SUBSCRIBER_FIELDS = list(SubscriberResponseSchema.__fields__)
+
 
 @router.get("/", response_model=List[SubscriberResponseSchema])
 async def get_all_subscribers(
@@ -23,7 +29,7 @@ async def get_all_subscribers(
     current_user: Subscriber = Depends(get_admin_user),
 ):
     """Get all subscribers"""
-    return await SubscriberService(database).list()
+    return await SubscriberService(database).list(SUBSCRIBER_FIELDS)
 
 
 @router.get("/{id}", response_model=SubscriberResponseSchema)
@@ -33,12 +39,35 @@ async def get_subscriber(
     database: str = Depends(get_database),
 ):
     """Get subscriber by id"""
-    subscriber = await SubscriberService(database).get_by_id(id)
+    subscriber = await SubscriberService(database).get_by_id(id, SUBSCRIBER_FIELDS)
     if subscriber.id == user.id:
         return SubscriberResponseSchema(**subscriber.dict())
     raise UnauthorizedException("Unauthorized to view account")
 
 
+@router.get("/{id}/timeline", response_model=TimelinePageSchema)
+async def get_subscriber_timeline(
+    id: str,
+    limit: int = Query(
+        settings.RSS_FEEDS_PAGE_SIZE, ge=1, le=settings.RSS_FEEDS_MAX_PAGE_SIZE
+    ),
+    after: Union[str, None] = None,
+    user: Subscriber = Depends(get_current_user),
+    database: str = Depends(get_database),
+):
+    """Gets a page of the rss feeds of the providers the subscriber follows,
+    newest first
+
+    Pass the returned `next_cursor` as `after` to get the next page.
+    """
+    if str(user.id) != id:
+        raise UnauthorizedException("Unauthorized to view timeline")
+    rss_feeds, next_cursor = await TimelineService(database).get_page(
+        user, limit, after
+    )
+    return TimelinePageSchema(items=rss_feeds, next_cursor=next_cursor)
+
+
 @router.post(
     "/", response_model=SubscriberResponseSchema, status_code=status.HTTP_201_CREATED
 )
@@ -81,7 +110,7 @@ async def update_subscriber(
     current_user: Subscriber = Depends(get_current_user),
 ):
     """Update subscriber"""
-    if current_user.id != id:
+    if str(current_user.id) != id:
         raise UnauthorizedException("Unauthorized to update account")
     return await SubscriberService(database).update(id, subscriber)
 
@@ -107,7 +136,7 @@ async def follow_provider(
     current_user: Subscriber = Depends(get_current_user),
 ):
     """Add provider to subscriber"""
-    if current_user.id != id:
+    if str(current_user.id) != id:
         raise UnauthorizedException("Unauthorized to update account")
     return await SubscriberService(database).provider_follow(id, provider_id)
 
@@ -120,6 +149,6 @@ async def unfollow_provider(
     current_user: Subscriber = Depends(get_current_user),
 ):
     """Remove provider from subscriber"""
-    if current_user.id != id:
+    if str(current_user.id) != id:
         raise UnauthorizedException("Unauthorized to update account")
     return await SubscriberService(database).provider_unfollow(id, provider_id)
@@ -0,0 +1,67 @@
+from datetime import datetime
+from typing import List, Union
+
+from bson import ObjectId
+from pydantic import AnyUrl, BaseModel, conlist
+
+from core.config import settings
+
+from models.rss_feed import RssFeed, RssFeedSearchHit
+from models.utils.custom_type import PyObjectId
+
+
+class RssFeedPageSchema(BaseModel):
+    items: List[RssFeed]
+    next_cursor: Union[str, None] = None
+
+    class Config:
+        """Items are encoded with the encoders of the page"""
+
+        json_encoders = {ObjectId: str}
+
+
+class RssFeedSearchPageSchema(BaseModel):
+    items: List[RssFeedSearchHit]
+    next_offset: Union[int, None] = None
+
+    class Config:
+        """Items are encoded with the encoders of the page"""
+
+        json_encoders = {ObjectId: str}
+
+
+class TimelineFeedSchema(BaseModel):
+    id: PyObjectId
+    title: str
+    link: AnyUrl
+    description: str
+    published_date: datetime
+    provider_id: PyObjectId
+    view_count: int = 0
+
+    class Config:
+        """Config for pydantic to handle json serialization"""
+
+        allow_population_by_field_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+
+
+class TimelinePageSchema(BaseModel):
+    items: List[TimelineFeedSchema]
+    next_cursor: Union[str, None] = None
+
+    class Config:
+        """Items are encoded with the encoders of the page"""
+
+        json_encoders = {ObjectId: str}
+
+
+class RssFeedViewsRequestSchema(BaseModel):
+    feed_ids: conlist(str, min_items=1, max_items=settings.VIEW_BATCH_MAX_ITEMS)
+
+
+class RssFeedViewsResponseSchema(BaseModel):
+    accepted: int = 0
+    duplicate: int = 0
+    dropped: int = 0
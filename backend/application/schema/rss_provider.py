@@ -0,0 +1,41 @@
+from datetime import datetime
+from typing import List, Union
+
+from bson import ObjectId
+from pydantic import AnyUrl, BaseModel
+
+from models.utils.custom_type import PyObjectId
+
+
+class RssProviderSchema(BaseModel):
+    """Public fields of a rss provider, the fetch state kept by the
+    scheduler stays in the database"""
+
+    id: PyObjectId
+    url: AnyUrl
+    title: str
+    description: str
+    image: AnyUrl
+    last_feed_time: datetime = None
+    follower_count: int = 0
+
+    class Config:
+        """Config for pydantic to handle json serialization"""
+
+        allow_population_by_field_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+
+
+class RssProviderSearchHitSchema(RssProviderSchema):
+    score: float = 0
+
+
+class RssProviderSearchPageSchema(BaseModel):
+    items: List[RssProviderSearchHitSchema]
+    next_offset: Union[int, None] = None
+
+    class Config:
+        """Items are encoded with the encoders of the page"""
+
+        json_encoders = {ObjectId: str}
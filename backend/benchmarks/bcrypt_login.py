@@ -0,0 +1,74 @@
+"""Login throughput against concurrency, bcrypt inline versus in the pool
+
+Run from backend/:
+
+    python -m benchmarks.bcrypt_login [--rounds 12] [--requests 64]
+
+For every concurrency level, `requests` password verifications are issued
+`concurrency` at a time, once calling bcrypt on the event loop as the login
+route used to and once through the shared PasswordCodec pool. Besides the
+throughput, the worst delay of a 10ms ticker running next to the logins is
+reported: it is how long any other request of the worker would have waited.
+"""
+import argparse
+import asyncio
+import time
+
+from services.utils.codec import PasswordCodec
+
+CONCURRENCY_LEVELS = [1, 2, 4, 8, 16, 32]
+TICK = 0.01
+
+
+async def ticker(stop: asyncio.Event) -> float:
+    """Returns the longest the event loop took to wake a 10ms sleep"""
+    worst = 0.0
+    while not stop.is_set():
+        started_at = time.perf_counter()
+        await asyncio.sleep(TICK)
+        worst = max(worst, time.perf_counter() - started_at - TICK)
+    return worst
+
+
+async def run(verify, requests: int, concurrency: int) -> tuple:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with semaphore:
+            await verify()
+
+    stop = asyncio.Event()
+    lag = asyncio.create_task(ticker(stop))
+    started_at = time.perf_counter()
+    await asyncio.gather(*[login() for _ in range(requests)])
+    elapsed = time.perf_counter() - started_at
+    stop.set()
+    return requests / elapsed, await lag
+
+
+async def main(rounds: int, requests: int, threads: int):
+    codec = PasswordCodec(rounds=rounds, threads=threads, max_pending=requests)
+    hashed_password = await codec.hash("benchmark")
+
+    async def inline():
+        codec.pwd_context.verify("benchmark", hashed_password)
+
+    async def pooled():
+        await codec.verify("benchmark", hashed_password)
+
+    print(f"bcrypt rounds={rounds} requests={requests} threads={threads}")
+    print(f"{'concurrency':>11} {'mode':>7} {'logins/s':>9} {'max lag ms':>11}")
+    for concurrency in CONCURRENCY_LEVELS:
+        for mode, verify in (("inline", inline), ("pooled", pooled)):
+            throughput, lag = await run(verify, requests, concurrency)
+            print(f"{concurrency:>11} {mode:>7} {throughput:>9.1f} {lag * 1000:>11.1f}")
+    codec.shutdown()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--rounds", type=int, default=12)
+    arg_parser.add_argument("--requests", type=int, default=64)
+    arg_parser.add_argument("--threads", type=int, default=4)
+    args = arg_parser.parse_args()
+    asyncio.run(main(args.rounds, args.requests, args.threads))
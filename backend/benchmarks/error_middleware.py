@@ -0,0 +1,121 @@
+"""Requests per second through the error middleware, BaseHTTPMiddleware
+versus plain ASGI
+
+Run from backend/:
+
+    python -m benchmarks.error_middleware [--requests 5000]
+
+The same application, a JSON route, a route raising NotFoundException and
+a streamed route, is wrapped once in the BaseHTTPMiddleware error handler
+the application used to have (without its `print`) and once in the
+current ASGI ErrorHandlerMiddleware. Requests are sent straight to the
+ASGI application, so only the application and middleware are measured.
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from core.exception_handler import AppExceptionHandler
+from core.exceptions import NotFoundException
+from middlewares.error_handler import ErrorHandlerMiddleware
+
+ROUTES = ["/ok", "/missing", "/stream"]
+
+
+class BaseHTTPErrorHandlerMiddleware(BaseHTTPMiddleware):
+    """The error handler as it was, for comparison"""
+
+    async def dispatch(self, request, call_next):
+        try:
+            return await call_next(request)
+        except Exception as e:
+            return AppExceptionHandler(e).raiseException()
+
+
+def create_app(middleware) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(middleware)
+
+    @app.get("/ok")
+    async def ok():
+        return {"ping": "pong"}
+
+    @app.get("/missing")
+    async def missing():
+        raise NotFoundException("Rss feed with id 0 not found")
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse(
+            (f"{line}\n" for line in range(100)), media_type="application/x-ndjson"
+        )
+
+    return app
+
+
+async def request(app, path: str) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"benchmark")],
+        "client": ("127.0.0.1", 1),
+        "server": ("benchmark", 80),
+    }
+    status_code = None
+    request_sent = False
+    response_complete = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if request_sent:
+            # the client disconnects once the response is complete
+            await response_complete.wait()
+            return {"type": "http.disconnect"}
+        request_sent = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+        elif not message.get("more_body", False):
+            response_complete.set()
+
+    await app(scope, receive, send)
+    return status_code
+
+
+async def main(requests: int):
+    print(f"requests={requests}")
+    print(f"{'route':>8} {'middleware':>12} {'requests/s':>11}")
+    apps = {
+        "base_http": create_app(BaseHTTPErrorHandlerMiddleware),
+        "asgi": create_app(ErrorHandlerMiddleware),
+    }
+    for path in ROUTES:
+        for name, app in apps.items():
+            for _ in range(100):  # warm up
+                await request(app, path)
+            started_at = time.perf_counter()
+            for _ in range(requests):
+                await request(app, path)
+            throughput = requests / (time.perf_counter() - started_at)
+            print(f"{path:>8} {name:>12} {throughput:>11.0f}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--requests", type=int, default=5000)
+    args = arg_parser.parse_args()
+    asyncio.run(main(args.requests))
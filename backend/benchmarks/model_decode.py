@@ -0,0 +1,92 @@
+"""Per document decode cost of database reads, validated versus trusted
+
+Run from backend/:
+
+    python -m benchmarks.model_decode [--documents 20000]
+
+Documents shaped like the ones the database classes read are turned into
+models once with full validation, as `Model(**document, id=document["_id"])`
+did, and once through the trusted `read_model`, without touching MongoDB.
+"""
+import argparse
+import time
+from datetime import datetime
+
+from bson import ObjectId
+
+from core.config import settings
+from database.documents import read_model
+from models.rss_feed import RssFeed
+from models.rss_provider import RssProvider
+from models.subscriber import Subscriber
+
+
+def rss_feed_document(index: int) -> dict:
+    return {
+        "_id": ObjectId(),
+        "title": f"Rss feed {index}",
+        "link": f"https://example.com/posts/{index}",
+        "description": "<p>A short description of the rss feed</p>" * 4,
+        "published_date": datetime.utcnow(),
+        "provider_id": ObjectId(),
+        "view_count": index,
+    }
+
+
+def rss_provider_document(index: int) -> dict:
+    return {
+        "_id": ObjectId(),
+        "url": f"https://example.com/{index}/feed.xml",
+        "title": f"Rss provider {index}",
+        "description": "A blog",
+        "image": f"https://example.com/{index}/logo.png",
+        "last_feed_time": datetime.utcnow(),
+        "etag": '"abc"',
+        "next_fetch_at": datetime.utcnow(),
+        "follower_count": index,
+    }
+
+
+def subscriber_document(index: int) -> dict:
+    return {
+        "_id": ObjectId(),
+        "name": f"Subscriber {index}",
+        "email": f"subscriber{index}@example.com",
+        "is_verified": True,
+        "subscribed_providers": [ObjectId() for _ in range(20)],
+        "password": "$2b$12$" + "x" * 53,
+        "created_at": datetime.utcnow().isoformat(),
+    }
+
+
+def decode_cost(model, documents: list, trusted: bool) -> float:
+    """Returns the microseconds spent per document"""
+    settings.DATABASE_TRUSTED_READS = trusted
+    started_at = time.perf_counter()
+    for document in documents:
+        read_model(model, document)
+    return (time.perf_counter() - started_at) / len(documents) * 1e6
+
+
+def main(documents: int):
+    print(f"documents={documents}")
+    print(f"{'model':>12} {'validated us':>13} {'trusted us':>11} {'speedup':>8}")
+    for model, make_document in (
+        (RssFeed, rss_feed_document),
+        (RssProvider, rss_provider_document),
+        (Subscriber, subscriber_document),
+    ):
+        batch = [make_document(index) for index in range(documents)]
+        validated = decode_cost(model, batch, trusted=False)
+        trusted = decode_cost(model, batch, trusted=True)
+        print(
+            f"{model.__name__:>12} {validated:>13.2f} {trusted:>11.2f} "
+            f"{validated / trusted:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--documents", type=int, default=20000)
+    args = arg_parser.parse_args()
+    main(args.documents)
@@ -1,4 +1,5 @@
 import secrets
+from typing import Union
 
 from decouple import config
 from pydantic import BaseSettings
@@ -20,9 +21,145 @@ class Settings(BaseSettings):
         "DATABASE_URL", cast=str, default="mongodb://localhost:27017"
     )
     DATABASE_NAME: str = "rss-feeders"
+    DATABASE_MAX_POOL_SIZE: int = config("DATABASE_MAX_POOL_SIZE", cast=int, default=50)
+    DATABASE_MIN_POOL_SIZE: int = config("DATABASE_MIN_POOL_SIZE", cast=int, default=5)
+    DATABASE_MAX_IDLE_TIME_MS: int = config(
+        "DATABASE_MAX_IDLE_TIME_MS", cast=int, default=60000
+    )
+    DATABASE_WAIT_QUEUE_TIMEOUT_MS: int = config(
+        "DATABASE_WAIT_QUEUE_TIMEOUT_MS", cast=int, default=5000
+    )
+    SYNC_INDEXES_ON_STARTUP: bool = config(
+        "SYNC_INDEXES_ON_STARTUP", cast=bool, default=True
+    )
+    DATABASE_TRUSTED_READS: bool = config(
+        "DATABASE_TRUSTED_READS", cast=bool, default=True
+    )
     SUBSCRIBER_COLLECTION: str = "subscribers"
     RSS_PROVIDER_COLLECTION: str = "rss_providers"
     RSS_FEEDS_COLLECTION: str = "rss_feeds"
+    RSS_FEED_VIEWS_COLLECTION: str = "rss_feed_views"
+    RSS_FEEDS_PAGE_SIZE: int = 50
+    RSS_FEEDS_MAX_PAGE_SIZE: int = 500
+    RSS_FEEDS_STREAM_BATCH_SIZE: int = 500
+    FAST_JSON_RESPONSES: bool = config("FAST_JSON_RESPONSES", cast=bool, default=False)
+    SEARCH_PAGE_SIZE: int = 20
+    SEARCH_MAX_PAGE_SIZE: int = 100
+    SEARCH_MAX_OFFSET: int = 1000
+    FEED_SEARCH_BACKEND: str = config("FEED_SEARCH_BACKEND", default="mongo")
+    FEED_SEARCH_INDEX_PATH: str = config(
+        "FEED_SEARCH_INDEX_PATH", default="feed_search.idx"
+    )
+    FEED_SEARCH_REFRESH_INTERVAL: int = config(
+        "FEED_SEARCH_REFRESH_INTERVAL", cast=int, default=30
+    )
+    FEED_SEARCH_SNAPSHOT_INTERVAL: int = config(
+        "FEED_SEARCH_SNAPSHOT_INTERVAL", cast=int, default=300
+    )
+    FEED_REFRESH_RUNS_COLLECTION: str = "feed_refresh_runs"
+    SCHEDULER_LEASE_COLLECTION: str = "scheduler_leases"
+    TIMELINE_INBOX_COLLECTION: str = "timeline_inboxes"
+    COLLECTION_VERSIONS_COLLECTION: str = "collection_versions"
+    RSS_FEEDS_CACHE_CONTROL: str = config("RSS_FEEDS_CACHE_CONTROL", default="no-cache")
+    RSS_PROVIDERS_CACHE_CONTROL: str = config(
+        "RSS_PROVIDERS_CACHE_CONTROL", default="private, no-cache"
+    )
+
+    FEED_FETCH_MAX_CONNECTIONS: int = config(
+        "FEED_FETCH_MAX_CONNECTIONS", cast=int, default=100
+    )
+    FEED_FETCH_MAX_CONNECTIONS_PER_HOST: int = config(
+        "FEED_FETCH_MAX_CONNECTIONS_PER_HOST", cast=int, default=4
+    )
+    FEED_FETCH_DNS_CACHE_TTL: int = config(
+        "FEED_FETCH_DNS_CACHE_TTL", cast=int, default=300
+    )
+    FEED_FETCH_CONNECT_TIMEOUT: float = config(
+        "FEED_FETCH_CONNECT_TIMEOUT", cast=float, default=5
+    )
+    FEED_FETCH_READ_TIMEOUT: float = config(
+        "FEED_FETCH_READ_TIMEOUT", cast=float, default=20
+    )
+    FEED_FETCH_TOTAL_TIMEOUT: float = config(
+        "FEED_FETCH_TOTAL_TIMEOUT", cast=float, default=60
+    )
+    FEED_FETCH_METRICS_SIZE: int = config(
+        "FEED_FETCH_METRICS_SIZE", cast=int, default=10000
+    )
+    FEED_FETCH_METRICS_TTL: int = config(
+        "FEED_FETCH_METRICS_TTL", cast=int, default=86400
+    )
+    FEED_FETCH_USER_AGENT: str = (
+        "rss-feed-api/0.1.0 (+https://rss-fidder.herokuapp.com)"
+    )
+
+    FEED_REFRESH_CONCURRENCY: int = config(
+        "FEED_REFRESH_CONCURRENCY", cast=int, default=10
+    )
+    FEED_REFRESH_MAX_RETRIES: int = config(
+        "FEED_REFRESH_MAX_RETRIES", cast=int, default=3
+    )
+    FEED_REFRESH_BACKOFF_BASE: float = config(
+        "FEED_REFRESH_BACKOFF_BASE", cast=float, default=1.0
+    )
+    FEED_REFRESH_MIN_INTERVAL: int = config(
+        "FEED_REFRESH_MIN_INTERVAL", cast=int, default=300
+    )
+    FEED_REFRESH_MAX_INTERVAL: int = config(
+        "FEED_REFRESH_MAX_INTERVAL", cast=int, default=86400
+    )
+    FEED_REFRESH_DEFAULT_INTERVAL: int = config(
+        "FEED_REFRESH_DEFAULT_INTERVAL", cast=int, default=3600
+    )
+    FEED_REFRESH_JITTER: float = config("FEED_REFRESH_JITTER", cast=float, default=0.1)
+    FEED_REFRESH_RUNS_RETENTION: int = config(
+        "FEED_REFRESH_RUNS_RETENTION", cast=int, default=604800
+    )
+    FEED_DISPATCH_INTERVAL: int = config("FEED_DISPATCH_INTERVAL", cast=int, default=60)
+    FEED_DISPATCH_BATCH_SIZE: int = config(
+        "FEED_DISPATCH_BATCH_SIZE", cast=int, default=500
+    )
+    SCHEDULER_LEASE_TTL: int = config("SCHEDULER_LEASE_TTL", cast=int, default=15)
+    SCHEDULER_LEASE_RENEW_INTERVAL: int = config(
+        "SCHEDULER_LEASE_RENEW_INTERVAL", cast=int, default=5
+    )
+    FEED_PARSER_PROCESSES: int = config("FEED_PARSER_PROCESSES", cast=int, default=2)
+
+    REDIS_URL: Union[str, None] = config("REDIS_URL", default=None)
+    PRINCIPAL_CACHE_SIZE: int = config("PRINCIPAL_CACHE_SIZE", cast=int, default=10000)
+    PRINCIPAL_CACHE_TTL: int = config("PRINCIPAL_CACHE_TTL", cast=int, default=60)
+    RESPONSE_CACHE_ENABLED: bool = config(
+        "RESPONSE_CACHE_ENABLED", cast=bool, default=True
+    )
+    RESPONSE_CACHE_SIZE: int = config("RESPONSE_CACHE_SIZE", cast=int, default=10000)
+    RESPONSE_CACHE_TTL: int = config("RESPONSE_CACHE_TTL", cast=int, default=30)
+    INVALIDATION_CHANNEL: str = config("INVALIDATION_CHANNEL", default="invalidations")
+
+    VIEW_FLUSH_INTERVAL_MS: int = config(
+        "VIEW_FLUSH_INTERVAL_MS", cast=int, default=1000
+    )
+    VIEW_FLUSH_BATCH_SIZE: int = config("VIEW_FLUSH_BATCH_SIZE", cast=int, default=1000)
+    VIEW_BUFFER_SIZE: int = config("VIEW_BUFFER_SIZE", cast=int, default=100000)
+    VIEW_DEDUPE_WINDOW: int = config("VIEW_DEDUPE_WINDOW", cast=int, default=300)
+    VIEW_DEDUPE_SIZE: int = config("VIEW_DEDUPE_SIZE", cast=int, default=100000)
+    VIEW_COUNTS_VERSION_INTERVAL: int = config(
+        "VIEW_COUNTS_VERSION_INTERVAL", cast=int, default=300
+    )
+    VIEW_BATCH_MAX_ITEMS: int = 100
+
+    TIMELINE_FANOUT_ENABLED: bool = config(
+        "TIMELINE_FANOUT_ENABLED", cast=bool, default=False
+    )
+    TIMELINE_INBOX_SIZE: int = config("TIMELINE_INBOX_SIZE", cast=int, default=1000)
+    TIMELINE_FANOUT_MAX_FOLLOWERS: int = config(
+        "TIMELINE_FANOUT_MAX_FOLLOWERS", cast=int, default=5000
+    )
+    TIMELINE_CACHE_SIZE: int = config("TIMELINE_CACHE_SIZE", cast=int, default=10000)
+    TIMELINE_CACHE_TTL: int = config("TIMELINE_CACHE_TTL", cast=int, default=30)
+
+    BCRYPT_ROUNDS: int = config("BCRYPT_ROUNDS", cast=int, default=12)
+    BCRYPT_THREADS: int = config("BCRYPT_THREADS", cast=int, default=4)
+    BCRYPT_MAX_PENDING: int = config("BCRYPT_MAX_PENDING", cast=int, default=64)
 
     PROJECT_NAME: str = "rss-feed-api"
     PROJECT_DESCRIPTION: str = "api for getting rss feeds from providers"
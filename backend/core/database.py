@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from typing import Union
+
+import motor.motor_asyncio
+from pymongo import monitoring
+
+from core.config import settings
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Collects connection pool checkout statistics for this process
+
+    Motor runs pymongo operations on executor threads, and a checkout is
+    started and completed on the same thread, so the start time of a
+    pending checkout is kept in a thread local.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        """Resets all counters"""
+        with self._lock:
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.checked_out = 0
+            self.connections_created = 0
+            self.connections_closed = 0
+            self.total_wait_ms = 0.0
+            self.max_wait_ms = 0.0
+
+    def connection_check_out_started(self, event):
+        self._local.started_at = time.perf_counter()
+
+    def _record_wait(self) -> float:
+        started_at = getattr(self._local, "started_at", None)
+        self._local.started_at = None
+        if started_at is None:
+            return 0.0
+        return (time.perf_counter() - started_at) * 1000
+
+    def connection_checked_out(self, event):
+        wait_ms = self._record_wait()
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def connection_check_out_failed(self, event):
+        self._record_wait()
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def stats(self) -> dict:
+        """Returns a snapshot of the collected statistics"""
+        with self._lock:
+            average_wait_ms = (
+                self.total_wait_ms / self.checkouts if self.checkouts else 0.0
+            )
+            return {
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checked_out": self.checked_out,
+                "open_connections": self.connections_created - self.connections_closed,
+                "average_wait_ms": round(average_wait_ms, 3),
+                "max_wait_ms": round(self.max_wait_ms, 3),
+            }
+
+
+class DatabaseClient:
+    """Owns the process wide Motor client and its connection pool"""
+
+    def __init__(self):
+        self.client: Union[motor.motor_asyncio.AsyncIOMotorClient, None] = None
+        self.pool_stats = PoolStatsListener()
+
+    def connect(self) -> motor.motor_asyncio.AsyncIOMotorClient:
+        """Creates the shared client if it does not exist yet"""
+        if self.client is None:
+            self.client = motor.motor_asyncio.AsyncIOMotorClient(
+                settings.DATABASE_URL,
+                maxPoolSize=settings.DATABASE_MAX_POOL_SIZE,
+                minPoolSize=settings.DATABASE_MIN_POOL_SIZE,
+                maxIdleTimeMS=settings.DATABASE_MAX_IDLE_TIME_MS,
+                waitQueueTimeoutMS=settings.DATABASE_WAIT_QUEUE_TIMEOUT_MS,
+                event_listeners=[self.pool_stats],
+            )
+        return self.client
+
+    def close(self):
+        """Closes the shared client and its connection pool"""
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+            self.pool_stats.reset()
+
+    def get_database(self):
+        """Retrieves the application database from the shared client"""
+        return self.connect()[settings.DATABASE_NAME]
+
+    def stats(self) -> dict:
+        """Returns the pool configuration and checkout statistics"""
+        return {
+            "pid": os.getpid(),
+            "connected": self.client is not None,
+            "max_pool_size": settings.DATABASE_MAX_POOL_SIZE,
+            "min_pool_size": settings.DATABASE_MIN_POOL_SIZE,
+            **self.pool_stats.stats(),
+        }
+
+
+database_client = DatabaseClient()
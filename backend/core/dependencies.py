@@ -1,18 +1,26 @@
-import motor.motor_asyncio
+import hashlib
+from typing import Union
+
 from fastapi.security import HTTPBearer
-from fastapi import Depends
+from fastapi import Depends, Request, Response
 
-from core.exceptions import NotFoundException, UnauthorizedException, ForbiddenException
-from core.config import settings
+from core.exceptions import (
+    NotFoundException,
+    NotModifiedException,
+    UnauthorizedException,
+    ForbiddenException,
+)
+from core.database import database_client
+from database.collection_version import CollectionVersionDatabase
+from models.subscriber import Subscriber
 from services.auth import AuthService
 
 token_auth_scheme = HTTPBearer()
 
 
 def get_database():
-    """Retrieves database connection object"""
-    client = motor.motor_asyncio.AsyncIOMotorClient(settings.DATABASE_URL)
-    return client[settings.DATABASE_NAME]
+    """Retrieves database object backed by the shared connection pool"""
+    return database_client.get_database()
 
 
 async def get_current_user(token: HTTPBearer = Depends(token_auth_scheme)):
@@ -25,9 +33,59 @@ async def get_current_user(token: HTTPBearer = Depends(token_auth_scheme)):
         raise UnauthorizedException("Invalid authentication credentials")
 
 
-async def get_admin_user(token: HTTPBearer = Depends(token_auth_scheme)):
-    """Retrieve current admin user from token"""
-    subscriber = await get_current_user(token)
+async def get_admin_user(subscriber: Subscriber = Depends(get_current_user)):
+    """Retrieve current admin user from token, reusing the current user
+    already resolved for the request"""
     if subscriber.is_admin:
         return subscriber
     raise ForbiddenException("You are not permitted to perform this action")
+
+
+class ConditionalGet:
+    """Dependency answering conditional GET requests from collection versions
+
+    The ETag of a response is derived from the versions of the collections
+    it is read from and the requested url, so it changes whenever one of
+    them is written to. A request whose If-None-Match holds the current
+    ETag gets a 304 before the endpoint runs, without reading the
+    collections themselves.
+
+    Declare it after the authentication dependencies of the route so an
+    unauthenticated request is still rejected. It resolves to the ETag,
+    which changes with the versions of the collections.
+
+    Args:
+        collections (str): names of the collections the route reads
+        cache_control (str): Cache-Control header of the route, if any
+    """
+
+    def __init__(self, *collections: str, cache_control: Union[str, None] = None):
+        self.collections = collections
+        self.cache_control = cache_control
+
+    @staticmethod
+    def _matches(if_none_match: Union[str, None], etag: str) -> bool:
+        if not if_none_match:
+            return False
+        # If-None-Match uses the weak comparison
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+    async def __call__(self, request: Request, response: Response):
+        versions = await CollectionVersionDatabase(get_database()).get(self.collections)
+        fingerprint = "|".join(
+            [request.url.path, request.url.query]
+            + [f"{name}:{versions[name]}" for name in self.collections]
+        )
+        etag = f'"{hashlib.sha1(fingerprint.encode()).hexdigest()}"'
+        if self._matches(request.headers.get("if-none-match"), etag):
+            raise NotModifiedException(etag, self.cache_control)
+        response.headers.update(self.headers(etag))
+        return etag
+
+    def headers(self, etag: str) -> dict:
+        """Gets the headers to set on a response the route builds itself"""
+        headers = {"ETag": etag}
+        if self.cache_control:
+            headers["Cache-Control"] = self.cache_control
+        return headers
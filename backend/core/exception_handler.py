@@ -1,6 +1,8 @@
+from typing import Dict, Tuple, Type
+
 from bson.errors import InvalidId
 from fastapi import status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from core.exceptions import (
     BadRequest,
     DatabaseException,
@@ -8,38 +10,65 @@ from core.exceptions import (
     NotFoundException,
     ForbiddenException,
     UnauthorizedException,
+    TooManyRequestsException,
+    NotModifiedException,
 )
 
+# status code and headers of the responses of each application exception,
+# subclasses answer like their closest listed base class
+EXCEPTION_RESPONSES: Dict[Type[Exception], Tuple[int, dict]] = {
+    NotFoundException: (status.HTTP_404_NOT_FOUND, {}),
+    DatabaseException: (status.HTTP_500_INTERNAL_SERVER_ERROR, {}),
+    ExistingDataException: (status.HTTP_409_CONFLICT, {}),
+    BadRequest: (status.HTTP_400_BAD_REQUEST, {}),
+    InvalidId: (status.HTTP_400_BAD_REQUEST, {}),
+    ForbiddenException: (status.HTTP_403_FORBIDDEN, {}),
+    UnauthorizedException: (
+        status.HTTP_401_UNAUTHORIZED,
+        {"WWW-Authenticate": "Bearer"},
+    ),
+    TooManyRequestsException: (status.HTTP_429_TOO_MANY_REQUESTS, {"Retry-After": "1"}),
+    NotModifiedException: (status.HTTP_304_NOT_MODIFIED, {}),
+}
+DEFAULT_RESPONSE = (status.HTTP_500_INTERNAL_SERVER_ERROR, {})
 
-class AppExceptionHandler:
-    """Base application exception handler"""
-
-    def __init__(self, exception: Exception):
-        self.message = str(exception)
-        self.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
-        self.headers = {}
+# resolved once per raised exception type, walking its MRO
+_responses_by_type: Dict[type, Tuple[int, dict]] = {}
 
-        if isinstance(exception, NotFoundException):
-            self.status_code = status.HTTP_404_NOT_FOUND
 
-        if isinstance(exception, DatabaseException):
-            self.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+def exception_response(exception_type: type) -> Tuple[int, dict]:
+    """Gets the status code and headers answering an exception type"""
+    response = _responses_by_type.get(exception_type)
+    if response is None:
+        response = next(
+            (
+                EXCEPTION_RESPONSES[base]
+                for base in exception_type.__mro__
+                if base in EXCEPTION_RESPONSES
+            ),
+            DEFAULT_RESPONSE,
+        )
+        _responses_by_type[exception_type] = response
+    return response
 
-        if isinstance(exception, ExistingDataException):
-            self.status_code = status.HTTP_409_CONFLICT
 
-        if isinstance(exception, BadRequest) or isinstance(exception, InvalidId):
-            self.status_code = status.HTTP_400_BAD_REQUEST
+class AppExceptionHandler:
+    """Base application exception handler"""
 
-        if isinstance(exception, ForbiddenException):
-            self.status_code = status.HTTP_403_FORBIDDEN
+    def __init__(self, exception: Exception):
+        self.message = str(exception)
+        self.status_code, self.headers = exception_response(type(exception))
 
-        if isinstance(exception, UnauthorizedException):
-            self.status_code = status.HTTP_401_UNAUTHORIZED
-            self.headers = ({"WWW-Authenticate": "Bearer"},)
+        if isinstance(exception, NotModifiedException):
+            self.headers = {"ETag": exception.etag}
+            if exception.cache_control:
+                self.headers["Cache-Control"] = exception.cache_control
 
     def raiseException(self):
         """Raises the exception with the appropriate status code"""
+        if self.status_code == status.HTTP_304_NOT_MODIFIED:
+            # a 304 must not have a body
+            return Response(status_code=self.status_code, headers=self.headers)
         message = {
             "status": "failed",
             "message": self.message,
@@ -74,3 +74,31 @@ class UnauthorizedException(Exception):
 
     def __str__(self):
         return self.message
+
+
+class TooManyRequestsException(Exception):
+    """
+    Exception for when the server is too busy to take a request
+    """
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(message)
+
+    def __str__(self):
+        return self.message
+
+
+class NotModifiedException(Exception):
+    """
+    Exception for when the client already has the current version of a resource
+    """
+
+    def __init__(self, etag: str, cache_control: str = None):
+        self.message = "Not modified"
+        self.etag = etag
+        self.cache_control = cache_control
+        super().__init__(self.message)
+
+    def __str__(self):
+        return self.message
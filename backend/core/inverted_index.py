@@ -0,0 +1,365 @@
+"""
+Compact in-memory inverted index with a memory mapped on-disk snapshot
+
+Documents are numbered in insertion order and their postings are stored
+as varint encoded (doc number delta, term frequency) pairs, so a posting
+usually takes two or three bytes. Postings loaded from a snapshot stay in
+the mapped file and are decoded on query; documents added afterwards are
+appended to an in-memory tail continuing the same delta sequence. Deleted
+documents are tombstoned until the next snapshot compacts them away.
+
+Snapshot layout, little endian:
+
+    header     8s magic, I document count, I term count
+    documents  12s id, 12s group, d timestamp, I length   (per document)
+    terms      H size, term, I df, Q offset, I size, i last document
+    postings   concatenated posting lists, offsets relative to this section
+"""
+import math
+import mmap
+import os
+import re
+import struct
+import tempfile
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Dict, Iterator, List, Tuple, Union
+
+MAGIC = b"RSSIDX01"
+HEADER = struct.Struct("<8sII")
+DOCUMENT = struct.Struct("<12s12sdI")
+TERM = struct.Struct("<H")
+TERM_ENTRY = struct.Struct("<IQIi")
+
+WORD = re.compile(r"\w+")
+TAG = re.compile(r"<[^>]+>")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that "
+    "the this to was were will with".split()
+)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: Union[str, None]) -> List[str]:
+    """Lowercases, strips markup and accents and splits text into terms"""
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKD", TAG.sub(" ", text).lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [
+        word for word in WORD.findall(text) if len(word) > 1 and word not in STOPWORDS
+    ]
+
+
+def encode_varint(value: int, out: bytearray):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_postings(
+    buffer, start: int, end: int, doc: int = -1
+) -> Iterator[Tuple[int, int]]:
+    """Yields the (doc number, term frequency) pairs of a posting list
+
+    Args:
+        buffer: bytes, bytearray or mmap holding the postings
+        start (int): offset of the first byte
+        end (int): offset after the last byte
+        doc (int): document number the first delta is relative to
+    """
+    position = start
+    while position < end:
+        values = []
+        for _ in range(2):
+            value = shift = 0
+            while True:
+                byte = buffer[position]
+                position += 1
+                value |= (byte & 0x7F) << shift
+                if byte < 0x80:
+                    break
+                shift += 7
+            values.append(value)
+        doc += values[0]
+        yield doc, values[1]
+
+
+class InvertedIndex:
+    """Inverted index of documents identified by 12 byte ids
+
+    Each document also carries a group id (the provider of a rss feed) and
+    a timestamp (its publish date) to filter on. Not thread safe, it is
+    meant to be used from the event loop only.
+    """
+
+    def __init__(self):
+        self.ids: List[bytes] = []
+        self.groups: List[bytes] = []
+        self.timestamps = array("d")
+        self.lengths = array("I")
+        self.numbers: Dict[bytes, int] = {}
+        self.deleted = set()
+        self.total_length = 0
+        # term -> (df, offset, size, last document) in the mapped snapshot
+        self._directory: Dict[str, Tuple[int, int, int, int]] = {}
+        self._mapped: Union[mmap.mmap, None] = None
+        self._postings_start = 0
+        self._tail: Dict[str, bytearray] = {}
+        self._tail_df: Counter = Counter()
+        self._last_doc: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def __contains__(self, id: bytes) -> bool:
+        return id in self.numbers
+
+    def add(self, id: bytes, group: bytes, timestamp: float, weighted_terms: Counter):
+        """Indexes a document, replacing a previous version of it
+
+        Args:
+            id (bytes): 12 byte id of the document
+            group (bytes): 12 byte id of the group of the document
+            timestamp (float): timestamp of the document
+            weighted_terms (Counter): weighted frequency of each term
+        """
+        self.remove(id)
+        doc = len(self.ids)
+        length = sum(weighted_terms.values())
+        self.ids.append(id)
+        self.groups.append(group)
+        self.timestamps.append(timestamp)
+        self.lengths.append(length)
+        self.numbers[id] = doc
+        self.total_length += length
+        for term, frequency in weighted_terms.items():
+            postings = self._tail.get(term)
+            if postings is None:
+                postings = self._tail[term] = bytearray()
+            encode_varint(doc - self._last_doc.get(term, -1), postings)
+            encode_varint(frequency, postings)
+            self._last_doc[term] = doc
+            self._tail_df[term] += 1
+
+    def remove(self, id: bytes) -> bool:
+        """Tombstones a document, its postings go away with the next snapshot"""
+        doc = self.numbers.pop(id, None)
+        if doc is None:
+            return False
+        self.deleted.add(doc)
+        self.total_length -= self.lengths[doc]
+        return True
+
+    def remove_group(self, group: bytes) -> int:
+        """Tombstones every document of a group"""
+        ids = [
+            self.ids[doc] for doc in self.numbers.values() if self.groups[doc] == group
+        ]
+        for id in ids:
+            self.remove(id)
+        return len(ids)
+
+    def postings(self, term: str) -> Iterator[Tuple[int, int]]:
+        """Yields the (doc number, term frequency) pairs of a term, deleted
+        documents included"""
+        doc = -1
+        entry = self._directory.get(term)
+        if entry is not None:
+            _, offset, size, last_doc = entry
+            start = self._postings_start + offset
+            yield from decode_postings(self._mapped, start, start + size)
+            doc = last_doc
+        tail = self._tail.get(term)
+        if tail:
+            yield from decode_postings(tail, 0, len(tail), doc)
+
+    def document_frequency(self, term: str) -> int:
+        entry = self._directory.get(term)
+        return (entry[0] if entry else 0) + self._tail_df.get(term, 0)
+
+    def search(
+        self,
+        terms: List[str],
+        limit: int,
+        offset: int = 0,
+        group: bytes = None,
+        after: float = None,
+        before: float = None,
+    ) -> Tuple[List[Tuple[bytes, float]], bool]:
+        """Ranks the documents matching any of the terms with BM25
+
+        Args:
+            terms (List[str]): normalized query terms
+            limit (int): maximum number of documents
+            offset (int): number of documents to skip
+            group (bytes): only match documents of this group
+            after (float): only match documents with a later timestamp
+            before (float): only match documents with an earlier timestamp
+
+        Returns:
+            List[tuple]: (id, score) of matching documents, best first,
+                then most recent first
+            bool: True if more documents match
+        """
+        documents = len(self.numbers)
+        if not documents:
+            return [], False
+        average_length = self.total_length / documents or 1
+        scores: Dict[int, float] = {}
+        for term in set(terms):
+            df = self.document_frequency(term)
+            if not df:
+                continue
+            idf = math.log(1 + (documents - df + 0.5) / (df + 0.5))
+            for doc, frequency in self.postings(term):
+                if doc in self.deleted:
+                    continue
+                if group is not None and self.groups[doc] != group:
+                    continue
+                timestamp = self.timestamps[doc]
+                if (after is not None and timestamp <= after) or (
+                    before is not None and timestamp >= before
+                ):
+                    continue
+                norm = K1 * (1 - B + B * self.lengths[doc] / average_length)
+                scores[doc] = scores.get(doc, 0) + idf * frequency * (K1 + 1) / (
+                    frequency + norm
+                )
+
+        ranked = sorted(
+            scores.items(),
+            key=lambda item: (item[1], self.timestamps[item[0]]),
+            reverse=True,
+        )
+        page = ranked[offset : offset + limit]
+        return [(self.ids[doc], score) for doc, score in page], len(
+            ranked
+        ) > offset + limit
+
+    def save(self, path: str):
+        """Writes a compacted snapshot and maps it in place of the current one
+
+        The snapshot is mapped from its temporary file before it is renamed
+        over `path`, so a snapshot another process renames there meanwhile
+        is never mapped instead of this one.
+        """
+        temporary_path = self.write(path)
+        try:
+            self.load(temporary_path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+        os.replace(temporary_path, path)
+
+    def write(self, path: str) -> str:
+        """Writes a compacted snapshot next to `path` without changing the index
+
+        Deleted documents are dropped and the others renumbered. The
+        snapshot goes to a temporary file of its own, so neither a crash nor
+        another process writing the same path leaves a torn snapshot.
+
+        Returns:
+            str: path of the temporary file, to be renamed over `path`
+        """
+        live = sorted(self.numbers.values())
+        renumber = {doc: number for number, doc in enumerate(live)}
+        terms = set(self._directory) | set(self._tail)
+
+        directory, postings = bytearray(), bytearray()
+        term_count = 0
+        for term in sorted(terms):
+            encoded, df, last_doc = bytearray(), 0, -1
+            for doc, frequency in self.postings(term):
+                number = renumber.get(doc)
+                if number is None:
+                    continue
+                encode_varint(number - last_doc, encoded)
+                encode_varint(frequency, encoded)
+                last_doc = number
+                df += 1
+            if not df:
+                continue
+            term_bytes = term.encode()
+            directory += TERM.pack(len(term_bytes)) + term_bytes
+            directory += TERM_ENTRY.pack(df, len(postings), len(encoded), last_doc)
+            postings += encoded
+            term_count += 1
+
+        descriptor, temporary_path = tempfile.mkstemp(
+            prefix=f"{os.path.basename(path)}.",
+            suffix=".tmp",
+            dir=os.path.dirname(path) or ".",
+        )
+        try:
+            with open(descriptor, "wb") as snapshot:
+                snapshot.write(HEADER.pack(MAGIC, len(live), term_count))
+                for doc in live:
+                    snapshot.write(
+                        DOCUMENT.pack(
+                            self.ids[doc],
+                            self.groups[doc],
+                            self.timestamps[doc],
+                            self.lengths[doc],
+                        )
+                    )
+                snapshot.write(directory)
+                snapshot.write(postings)
+                snapshot.flush()
+                os.fsync(snapshot.fileno())
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+        return temporary_path
+
+    def load(self, path: str):
+        """Replaces the content of the index with a snapshot, mapping its
+        postings instead of reading them
+
+        Raises:
+            ValueError: if the file is not a snapshot
+        """
+        with open(path, "rb") as snapshot:
+            mapped = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, document_count, term_count = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC:
+            mapped.close()
+            raise ValueError(f"{path} is not a search index snapshot")
+
+        self.__init__()
+        position = HEADER.size
+        for doc in range(document_count):
+            id, group, timestamp, length = DOCUMENT.unpack_from(mapped, position)
+            position += DOCUMENT.size
+            self.ids.append(id)
+            self.groups.append(group)
+            self.timestamps.append(timestamp)
+            self.lengths.append(length)
+            self.numbers[id] = doc
+            self.total_length += length
+
+        for _ in range(term_count):
+            (size,) = TERM.unpack_from(mapped, position)
+            position += TERM.size
+            term = mapped[position : position + size].decode()
+            position += size
+            df, offset, length, last_doc = TERM_ENTRY.unpack_from(mapped, position)
+            position += TERM_ENTRY.size
+            self._directory[term] = (df, offset, length, last_doc)
+            self._last_doc[term] = last_doc
+        self._postings_start = position
+        self._mapped = mapped
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self.numbers),
+            "deleted": len(self.deleted),
+            "terms": len(set(self._directory) | set(self._tail)),
+            "mapped_bytes": len(self._mapped) if self._mapped is not None else 0,
+            "tail_bytes": sum(len(postings) for postings in self._tail.values()),
+        }
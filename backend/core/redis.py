@@ -0,0 +1,33 @@
+from typing import Union
+
+from core.config import settings
+
+try:
+    import aioredis
+except ImportError:  # the Redis tier is optional
+    aioredis = None
+
+
+class RedisClient:
+    """Optional shared Redis connection, enabled by setting REDIS_URL"""
+
+    def __init__(self):
+        self.client = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.REDIS_URL) and aioredis is not None
+
+    def get(self) -> Union["aioredis.Redis", None]:
+        """Gets the shared client, None when Redis is not configured"""
+        if self.client is None and self.enabled:
+            self.client = aioredis.from_url(settings.REDIS_URL)
+        return self.client
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+
+redis_client = RedisClient()
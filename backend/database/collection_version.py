@@ -0,0 +1,49 @@
+from typing import Dict, List
+
+from pymongo import UpdateOne
+from core.config import settings
+
+
+class CollectionVersionDatabase:
+    """Keeps a counter per collection, bumped on every write to it
+
+    Reading the counters is a point lookup on a tiny collection, cheap
+    enough to tell whether a cached response is still current without
+    querying the collection itself.
+    """
+
+    indexes = []
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = self.db[settings.COLLECTION_VERSIONS_COLLECTION]
+
+    async def get(self, names: List[str]) -> Dict[str, int]:
+        """
+        Gets the versions of collections
+
+        Args:
+            names (List[str]): names of the collections
+
+        Returns:
+            dict: version of each collection, 0 if never written
+        """
+        versions = dict.fromkeys(names, 0)
+        async for version in self.collection.find({"_id": {"$in": list(names)}}):
+            versions[version["_id"]] = version["version"]
+        return versions
+
+    async def bump(self, *names: str):
+        """
+        Bumps the versions of collections after writing to them
+
+        Args:
+            names (str): names of the collections
+        """
+        await self.collection.bulk_write(
+            [
+                UpdateOne({"_id": name}, {"$inc": {"version": 1}}, upsert=True)
+                for name in names
+            ],
+            ordered=False,
+        )
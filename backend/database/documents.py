@@ -0,0 +1,83 @@
+"""
+Document to model conversions of the database classes
+
+Documents were validated on their way in, reading them back does not
+validate them again unless DATABASE_TRUSTED_READS is turned off. Routes
+serializing what the database returns can also skip the models entirely.
+"""
+from typing import Iterable, Type, TypeVar, Union
+
+from pydantic import BaseModel
+
+from core.config import settings
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def field_projection(
+    fields: Union[Iterable[str], None], default: dict = None
+) -> Union[dict, None]:
+    """Gets the projection reading some fields of a model
+
+    Args:
+        fields (Iterable[str]): names of the fields, None to read them all
+        default (dict): projection to use when reading all the fields
+
+    Returns:
+        dict: projection, `_id` always included
+    """
+    if fields is None:
+        return default
+    projection = {"_id": 1}
+    projection.update({name: 1 for name in fields if name != "id"})
+    return projection
+
+
+def read_model(model: Type[ModelT], document: dict, partial: bool = False) -> ModelT:
+    """Builds a model from a document the application stored itself
+
+    With DATABASE_TRUSTED_READS the values are used as they are, like
+    `Model.construct`: ids stay bson ObjectIds and urls plain strings.
+    Fields missing from the document get their default and fields unknown
+    to the model, such as `_id`, are left out.
+
+    Args:
+        model (Type[BaseModel]): model to build
+        document (dict): document read from the database
+        partial (bool): True if the document was read with a projection;
+            it is never validated and only holds the fields read, others
+            do not get a default that could be mistaken for stored data
+    """
+    if not (settings.DATABASE_TRUSTED_READS or partial):
+        return model(**document, id=document["_id"])
+    fields = model.__fields__
+    values = {name: value for name, value in document.items() if name in fields}
+    values["id"] = document["_id"]
+    if not partial:
+        return model.construct(**values)
+    instance = model.__new__(model)
+    object.__setattr__(instance, "__dict__", values)
+    object.__setattr__(instance, "__fields_set__", set(values))
+    return instance
+
+
+def model_projection(model: Type[BaseModel]) -> dict:
+    """Gets the projection of the fields of a model, `_id` included"""
+    return field_projection(model.__fields__)
+
+
+def as_model_document(
+    document: dict, model: Type[BaseModel], fields: Iterable[str] = None
+) -> dict:
+    """Shapes a document read with `model_projection` like the model
+
+    The document is trusted to hold valid values: `_id` becomes `id` and
+    missing fields get their default, nothing is validated or converted.
+    A document read with a narrower projection only gets the defaults of
+    the fields it was read for.
+    """
+    document["id"] = document.pop("_id")
+    for name, field in model.__fields__.items():
+        if name not in document and (fields is None or name in fields):
+            document[name] = field.get_default()
+    return document
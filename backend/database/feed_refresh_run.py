@@ -0,0 +1,56 @@
+from typing import Union
+
+import pymongo
+from pymongo import IndexModel
+from core.config import settings
+from models.feed_refresh import RefreshRunReport
+
+
+class FeedRefreshRunDatabase:
+    """Stores the reports of feed refresh runs
+
+    Reports are removed by the server FEED_REFRESH_RUNS_RETENTION seconds
+    after their run started.
+    """
+
+    indexes = [
+        IndexModel(
+            [("started_at", pymongo.ASCENDING)],
+            name="started_at_ttl",
+            expireAfterSeconds=settings.FEED_REFRESH_RUNS_RETENTION,
+        )
+    ]
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = self.db[settings.FEED_REFRESH_RUNS_COLLECTION]
+
+    async def create(self, report: RefreshRunReport) -> RefreshRunReport:
+        """
+        Stores a refresh run report
+
+        Args:
+            report (RefreshRunReport): report of the run
+
+        Returns:
+            RefreshRunReport: stored report
+        """
+        await self.collection.insert_one(
+            {**report.dict(exclude={"id"}), "_id": report.id}
+        )
+        return report
+
+    async def get_latest(self) -> Union[RefreshRunReport, None]:
+        """
+        Gets the report of the most recent run
+
+        Returns:
+            RefreshRunReport: report of the run
+            None: if no run was stored
+        """
+        report = await self.collection.find_one(
+            {}, sort=[("started_at", pymongo.DESCENDING)]
+        )
+        if report:
+            return RefreshRunReport(**report, id=report["_id"])
+        return None
@@ -0,0 +1,271 @@
+import asyncio
+import logging
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Callable, Iterable, List, Tuple, Union
+
+from bson import ObjectId
+
+from core.config import settings
+from core.database import database_client
+from core.inverted_index import InvertedIndex, tokenize
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+NO_PROVIDER = bytes(12)
+
+# rss feed ids are generated when a feed is parsed, not when it is stored,
+# so catching up rescans this far behind the newest id already indexed
+CATCH_UP_LOOKBACK = timedelta(minutes=10)
+
+# a title term counts as much as this many description terms, like the
+# weights of the mongo text index
+TITLE_WEIGHT = 10
+
+SEARCH_FIELDS = {"title": 1, "description": 1, "provider_id": 1, "published_date": 1}
+
+
+def _timestamp(published_date: Union[datetime, None]) -> float:
+    return (published_date - EPOCH).total_seconds() if published_date else 0.0
+
+
+def _weighted_terms(title: Union[str, None], description: Union[str, None]) -> Counter:
+    terms = Counter(tokenize(description))
+    for term in tokenize(title):
+        terms[term] += TITLE_WEIGHT
+    return terms
+
+
+class FeedSearchIndex:
+    """Embedded full-text index of rss feeds, used instead of the mongo
+    text index when FEED_SEARCH_BACKEND is "embedded"
+
+    RssFeedDatabase adds and removes rss feeds as it writes them. Since
+    every worker keeps its own index, rss feeds stored by other workers
+    are picked up every FEED_SEARCH_REFRESH_INTERVAL seconds, and the
+    index is written to FEED_SEARCH_INDEX_PATH every
+    FEED_SEARCH_SNAPSHOT_INTERVAL seconds so a restart only has to catch
+    up since the last snapshot instead of reading every rss feed.
+
+    Rss feeds deleted by another worker stay in the index until this one
+    restarts without a snapshot; searches read the matching rss feeds
+    back from the database, which drops them.
+
+    The index is only touched from a single thread of its own: changes
+    are handed to it in order, searches and snapshots are awaited from it,
+    so the event loop never waits on the index and no lock is needed.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or settings.FEED_SEARCH_INDEX_PATH
+        self.index = InvertedIndex()
+        self._newest_id: Union[ObjectId, None] = None
+        self._task: Union[asyncio.Task, None] = None
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="feed-search-index")
+        self.snapshots = 0
+        self.refresh_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.FEED_SEARCH_BACKEND == "embedded"
+
+    @staticmethod
+    def _apply(change: Callable[[], None]):
+        try:
+            change()
+        except Exception:
+            logger.exception("changing the search index failed")
+
+    def _change(self, change: Callable[[], None]):
+        self._executor.submit(self._apply, change)
+
+    async def _call(self, func: Callable, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, partial(func, *args, **kwargs)
+        )
+
+    def _add(self, id: ObjectId, provider_id, published_date, title, description):
+        self.index.add(
+            id.binary,
+            ObjectId(provider_id).binary if provider_id else NO_PROVIDER,
+            _timestamp(published_date),
+            _weighted_terms(title, description),
+        )
+        if self._newest_id is None or id > self._newest_id:
+            self._newest_id = id
+
+    def add(self, rss_feeds: Iterable):
+        """Indexes rss feeds, replacing the ones already indexed"""
+        if not self.enabled:
+            return
+        rss_feeds = [
+            (
+                ObjectId(rss_feed.id),
+                rss_feed.provider_id,
+                rss_feed.published_date,
+                rss_feed.title,
+                rss_feed.description,
+            )
+            for rss_feed in rss_feeds
+        ]
+
+        def change():
+            for rss_feed in rss_feeds:
+                self._add(*rss_feed)
+
+        self._change(change)
+
+    def remove(self, feed_id):
+        """Removes a rss feed from the index"""
+        if self.enabled:
+            id = ObjectId(feed_id).binary
+            self._change(lambda: self.index.remove(id))
+
+    def remove_provider(self, provider_id):
+        """Removes every rss feed of a provider from the index"""
+        if self.enabled:
+            group = ObjectId(provider_id).binary
+            self._change(lambda: self.index.remove_group(group))
+
+    async def search(
+        self,
+        text: str,
+        limit: int,
+        offset: int = 0,
+        provider_id: str = None,
+        published_after: datetime = None,
+        published_before: datetime = None,
+    ) -> Tuple[List[Tuple[ObjectId, float]], bool]:
+        """Searches rss feeds by title and description, most relevant first
+
+        Returns:
+            List[tuple]: (id, score) of matching rss feeds
+            bool: True if more rss feeds match
+        """
+        hits, has_more = await self._call(
+            self.index.search,
+            tokenize(text),
+            limit,
+            offset,
+            group=ObjectId(provider_id).binary if provider_id else None,
+            after=_timestamp(published_after) if published_after else None,
+            before=_timestamp(published_before) if published_before else None,
+        )
+        return [(ObjectId(id), score) for id, score in hits], has_more
+
+    async def catch_up(self) -> int:
+        """Indexes the rss feeds stored since the newest one indexed
+
+        Returns:
+            int: number of rss feeds indexed
+        """
+        collection = database_client.get_database()[settings.RSS_FEEDS_COLLECTION]
+        query = {}
+        if self._newest_id is not None:
+            since = self._newest_id.generation_time.replace(tzinfo=None)
+            query = {"_id": {"$gte": ObjectId.from_datetime(since - CATCH_UP_LOOKBACK)}}
+        added = 0
+        rss_feeds = collection.find(query, SEARCH_FIELDS).batch_size(
+            settings.RSS_FEEDS_STREAM_BATCH_SIZE
+        )
+        async for rss_feed in rss_feeds:
+            if rss_feed["_id"].binary in self.index:
+                continue
+            self._change(
+                partial(
+                    self._add,
+                    rss_feed["_id"],
+                    rss_feed.get("provider_id"),
+                    rss_feed.get("published_date"),
+                    rss_feed.get("title"),
+                    rss_feed.get("description"),
+                )
+            )
+            added += 1
+        return added
+
+    def load(self) -> bool:
+        """Loads the snapshot, if there is a readable one
+
+        Returns:
+            bool: True if the snapshot was loaded
+        """
+        if not os.path.exists(self.path):
+            return False
+        try:
+            self.index.load(self.path)
+        except (OSError, ValueError) as e:
+            logger.warning("ignoring search index snapshot %s: %s", self.path, e)
+            self.index = InvertedIndex()
+            return False
+        self._loaded()
+        return True
+
+    def _loaded(self):
+        self._newest_id = max(map(ObjectId, self.index.numbers), default=None)
+
+    def _save(self):
+        self.index.save(self.path)
+        self._loaded()
+
+    async def save(self):
+        """Writes a compacted snapshot of the index and maps it"""
+        await self._call(self._save)
+        self.snapshots += 1
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        last_snapshot = loop.time()
+        while True:
+            try:
+                added = await self.catch_up()
+                if added:
+                    logger.info("indexed %d rss feeds for search", added)
+                if (
+                    loop.time() - last_snapshot
+                    >= settings.FEED_SEARCH_SNAPSHOT_INTERVAL
+                ):
+                    await self.save()
+                    last_snapshot = loop.time()
+            except Exception as e:
+                self.refresh_errors += 1
+                logger.warning("refreshing the search index failed: %s", e)
+            await asyncio.sleep(settings.FEED_SEARCH_REFRESH_INTERVAL)
+
+    def start(self):
+        """Loads the snapshot and keeps the index up to date in the background"""
+        if self.enabled and self._task is None:
+            self.load()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops refreshing in the background and writes a snapshot"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            await self.save()
+        except OSError as e:
+            logger.warning("writing the search index snapshot failed: %s", e)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "newest_id": str(self._newest_id) if self._newest_id else None,
+            "snapshots": self.snapshots,
+            "refresh_errors": self.refresh_errors,
+            **self.index.stats(),
+        }
+
+
+feed_search_index = FeedSearchIndex()
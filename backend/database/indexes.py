@@ -0,0 +1,197 @@
+"""
+Declared index bootstrap for every collection of the application
+
+Run outside of app boot with:
+
+    python -m database.indexes [--check] [--drop-extra]
+"""
+import argparse
+import asyncio
+import logging
+from typing import Dict, List
+
+from pymongo.errors import OperationFailure
+
+from core.database import database_client
+from database.feed_refresh_run import FeedRefreshRunDatabase
+from database.rss_feed import RssFeedDatabase
+from database.rss_feed_view import RssFeedViewDatabase
+from database.rss_provider import RssProviderDatabase
+from database.subscriber import DBSubscriber
+
+logger = logging.getLogger(__name__)
+
+DATABASE_CLASSES = [
+    DBSubscriber,
+    RssProviderDatabase,
+    RssFeedDatabase,
+    RssFeedViewDatabase,
+    FeedRefreshRunDatabase,
+]
+
+
+def _normalize_key(key) -> List[tuple]:
+    """Normalizes an index key so declared and existing keys compare equal
+
+    The fields of a text index are stored by the server as the `_fts` and
+    `_ftsx` pseudo fields, declared text fields are folded the same way;
+    which fields are indexed is compared through the index weights.
+    """
+    normalized = []
+    for field, direction in key:
+        if direction == "text" and field != "_fts":
+            if ("_fts", "text") not in normalized:
+                normalized += [("_fts", "text"), ("_ftsx", 1)]
+            continue
+        normalized.append(
+            (field, int(direction) if isinstance(direction, float) else direction)
+        )
+    return normalized
+
+
+def _text_fields(document: dict) -> set:
+    """Gets the fields covered by a text index, empty for other indexes"""
+    if "weights" in document:
+        return set(document["weights"])
+    key = document["key"]
+    key = key.items() if isinstance(key, dict) else key
+    return {field for field, direction in key if direction == "text"}
+
+
+class IndexSync:
+    """Creates the indexes declared by the database classes and reports drift"""
+
+    def __init__(self, db, database_classes=None):
+        self.db = db
+        self.database_classes = database_classes or DATABASE_CLASSES
+
+    async def diff(self) -> Dict[str, dict]:
+        """Compares declared indexes with the indexes present in the database
+
+        Returns:
+            dict: per collection, names of `missing`, `conflicting` and `extra` indexes
+        """
+        report = {}
+        for database_class in self.database_classes:
+            collection = database_class(self.db).collection
+            existing = await collection.index_information()
+            declared = {
+                index.document["name"]: index.document
+                for index in database_class.indexes
+            }
+
+            missing, conflicting = [], []
+            for name, document in declared.items():
+                if name not in existing:
+                    missing.append(name)
+                    continue
+                same_key = _normalize_key(document["key"].items()) == _normalize_key(
+                    existing[name]["key"]
+                )
+                same_unique = document.get("unique", False) == existing[name].get(
+                    "unique", False
+                )
+                same_text = _text_fields(document) == _text_fields(existing[name])
+                same_ttl = document.get("expireAfterSeconds") == existing[name].get(
+                    "expireAfterSeconds"
+                )
+                if not (same_key and same_unique and same_text and same_ttl):
+                    conflicting.append(name)
+
+            extra = [
+                name for name in existing if name != "_id_" and name not in declared
+            ]
+            report[collection.name] = {
+                "missing": missing,
+                "conflicting": conflicting,
+                "extra": extra,
+            }
+        return report
+
+    async def sync(self, drop_extra: bool = False) -> Dict[str, dict]:
+        """Creates missing indexes, optionally dropping undeclared ones
+
+        Creating an index that already exists is a no-op, so this is safe to
+        run on every startup. Conflicting indexes are reported, never dropped.
+
+        Args:
+            drop_extra (bool): drop indexes that are not declared
+
+        Returns:
+            dict: the drift report after syncing, with `errors` per collection
+        """
+        drift = await self.diff()
+        for database_class in self.database_classes:
+            collection = database_class(self.db).collection
+            collection_drift = drift[collection.name]
+            collection_drift["errors"] = []
+
+            missing = [
+                index
+                for index in database_class.indexes
+                if index.document["name"] in collection_drift["missing"]
+            ]
+            for index in missing:
+                try:
+                    await collection.create_indexes([index])
+                    collection_drift["missing"].remove(index.document["name"])
+                except OperationFailure as e:
+                    collection_drift["errors"].append(
+                        f"{index.document['name']}: {e.details.get('errmsg', e)}"
+                    )
+
+            if drop_extra:
+                for name in list(collection_drift["extra"]):
+                    await collection.drop_index(name)
+                    collection_drift["extra"].remove(name)
+
+            self._log_drift(collection.name, collection_drift)
+        return drift
+
+    @staticmethod
+    def _log_drift(collection_name: str, collection_drift: dict):
+        for kind in ("missing", "conflicting", "extra", "errors"):
+            if collection_drift.get(kind):
+                logger.warning(
+                    "index drift on %s, %s: %s",
+                    collection_name,
+                    kind,
+                    ", ".join(collection_drift[kind]),
+                )
+
+
+async def main(check: bool = False, drop_extra: bool = False) -> int:
+    index_sync = IndexSync(database_client.get_database())
+    try:
+        if check:
+            report = await index_sync.diff()
+        else:
+            report = await index_sync.sync(drop_extra=drop_extra)
+    finally:
+        database_client.close()
+
+    has_drift = False
+    for collection_name, collection_drift in report.items():
+        for kind, names in collection_drift.items():
+            if names:
+                has_drift = True
+                print(f"{collection_name}: {kind}: {', '.join(names)}")
+    if not has_drift:
+        print("indexes are in sync")
+    return 1 if has_drift else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the declared indexes")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="only report drift, do not create anything",
+    )
+    parser.add_argument(
+        "--drop-extra",
+        action="store_true",
+        help="drop indexes that are not declared",
+    )
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(check=args.check, drop_extra=args.drop_extra)))
@@ -0,0 +1,68 @@
+"""
+Moves the viewers embedded in rss feed documents to the views collection
+
+Each rss feed with a `viewers` array gets its views appended to the views
+collection, then `view_count` set and the array removed in a single update.
+Views keep the id derived from their position, so running the migration
+again after an interruption does not store them twice. Run from backend/:
+
+    python -m database.migrate_viewers [--batch-size 500]
+"""
+import argparse
+import asyncio
+import hashlib
+
+from bson import ObjectId
+
+from core.database import database_client
+from database.rss_feed import RssFeedDatabase
+from database.rss_feed_view import RssFeedViewDatabase
+from models.rss_feed import RssFeedView
+
+
+def _view_id(feed_id: ObjectId, position: int) -> ObjectId:
+    """Derives a stable view id from its rss feed and position"""
+    digest = hashlib.sha1(feed_id.binary + position.to_bytes(4, "big")).digest()
+    return ObjectId(digest[:12])
+
+
+async def main(batch_size: int) -> int:
+    db = database_client.get_database()
+    rss_feed_db = RssFeedDatabase(db)
+    view_db = RssFeedViewDatabase(db)
+    migrated = views_moved = 0
+    try:
+        rss_feeds = rss_feed_db.collection.find(
+            {"viewers": {"$exists": True}}, {"viewers": 1, "view_count": 1}
+        ).batch_size(batch_size)
+        async for rss_feed in rss_feeds:
+            views = [
+                RssFeedView(
+                    id=_view_id(rss_feed["_id"], position),
+                    feed_id=rss_feed["_id"],
+                    viewer_id=viewer["viewer_id"],
+                    viewed_at=viewer["datetime"],
+                )
+                for position, viewer in enumerate(rss_feed["viewers"] or [])
+            ]
+            await view_db.insert_many(views)
+            await rss_feed_db.collection.update_one(
+                {"_id": rss_feed["_id"], "viewers": {"$exists": True}},
+                {
+                    "$unset": {"viewers": ""},
+                    "$inc": {"view_count": len(views)},
+                },
+            )
+            migrated += 1
+            views_moved += len(views)
+    finally:
+        database_client.close()
+    print(f"moved {views_moved} views out of {migrated} rss feeds")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move embedded viewers out")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.batch_size)))
@@ -1,30 +1,341 @@
-from typing import List
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Tuple, Union
 
+import pymongo
 from bson import ObjectId
+from pymongo import IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 from core.config import settings
-from models.rss_feed import RssFeed
+from database.collection_version import CollectionVersionDatabase
+from database.documents import (
+    as_model_document,
+    field_projection,
+    model_projection,
+    read_model,
+)
+from database.feed_search_index import feed_search_index
+from database.rss_feed_view import DUPLICATE_KEY_ERROR
+from models.rss_feed import RssFeed, RssFeedIngestResult, RssFeedSearchHit
+
+# newest first, with _id as tie breaker so the order is total
+KEYSET_SORT = [("published_date", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)]
+
+# relevance first, then the most recent of equally relevant rss feeds
+SEARCH_SORT = [
+    ("score", {"$meta": "textScore"}),
+    ("published_date", pymongo.DESCENDING),
+]
+
+# views live in their own collection; documents written before the
+# viewers migration may still embed them, never load that history
+FEED_PROJECTION = {"viewers": 0}
 
 
 class RssFeedDatabase:
     """Provides Database CRUD operations for rss feeds"""
 
+    indexes = [
+        IndexModel([("link", pymongo.ASCENDING)], name="link_unique", unique=True),
+        IndexModel(
+            [("provider_id", pymongo.ASCENDING)] + KEYSET_SORT,
+            name="provider_published",
+        ),
+        IndexModel(KEYSET_SORT, name="published"),
+        IndexModel(
+            [("title", pymongo.TEXT), ("description", pymongo.TEXT)],
+            name="text",
+            weights={"title": 10, "description": 1},
+        ),
+    ]
+
     def __init__(self, db):
         self.db = db
         self.collection = self.db[settings.RSS_FEEDS_COLLECTION]
 
-    async def list(self, **query) -> List[RssFeed]:
+    async def _bump_version(self):
+        await CollectionVersionDatabase(self.db).bump(settings.RSS_FEEDS_COLLECTION)
+
+    async def list(self, projection: List[str] = None, **query) -> List[RssFeed]:
         """Gets a list of all rss feeds
 
         Args:
+            projection (List[str]): fields of the rss feeds to read, all when None
             query (dict): values to be used for filtering
 
         Returns:
             List[RssFeed]: list of rss feeds
         """
-        rss_feeds = await self.collection.find(query).to_list(None)
-        rss_feeds = [RssFeed(**rss_feed, id=rss_feed["_id"]) for rss_feed in rss_feeds]
+        rss_feeds = await self.collection.find(
+            query, field_projection(projection, FEED_PROJECTION)
+        ).to_list(None)
+        rss_feeds = [
+            read_model(RssFeed, rss_feed, projection is not None)
+            for rss_feed in rss_feeds
+        ]
         return rss_feeds
 
+    @staticmethod
+    def _keyset_query(
+        query: dict, after: Union[Tuple[datetime, ObjectId], None]
+    ) -> dict:
+        """Restricts a query to items sorted after the given sort key"""
+        if after is None:
+            return query
+        published_date, id = after
+        return {
+            "$and": [
+                query,
+                {
+                    "$or": [
+                        {"published_date": {"$lt": published_date}},
+                        {"published_date": published_date, "_id": {"$lt": id}},
+                    ]
+                },
+            ]
+        }
+
+    async def list_page(
+        self,
+        limit: int,
+        after: Union[Tuple[datetime, ObjectId], None] = None,
+        projection: List[str] = None,
+        **query,
+    ) -> Tuple[List[RssFeed], bool]:
+        """Gets a page of rss feeds, newest first
+
+        Args:
+            limit (int): maximum number of rss feeds in the page
+            after (tuple): (published_date, id) of the last item of the previous page
+            projection (List[str]): fields of the rss feeds to read, all when None
+            query (dict): values to be used for filtering
+
+        Returns:
+            List[RssFeed]: list of rss feeds
+            bool: True if more rss feeds follow the page
+        """
+        cursor = (
+            self.collection.find(
+                self._keyset_query(query, after),
+                field_projection(projection, FEED_PROJECTION),
+            )
+            .sort(KEYSET_SORT)
+            .limit(limit + 1)
+        )
+        rss_feeds = await cursor.to_list(limit + 1)
+        has_more = len(rss_feeds) > limit
+        rss_feeds = [
+            read_model(RssFeed, rss_feed, projection is not None)
+            for rss_feed in rss_feeds[:limit]
+        ]
+        return rss_feeds, has_more
+
+    async def list_page_documents(
+        self,
+        limit: int,
+        after: Union[Tuple[datetime, ObjectId], None] = None,
+        projection: List[str] = None,
+        **query,
+    ) -> Tuple[List[dict], bool]:
+        """Gets a page of rss feeds, newest first, as documents shaped like
+        RssFeed without building the models
+
+        Args:
+            limit (int): maximum number of rss feeds in the page
+            after (tuple): (published_date, id) of the last item of the previous page
+            projection (List[str]): fields of the rss feeds to read, all when None
+            query (dict): values to be used for filtering
+
+        Returns:
+            List[dict]: list of rss feed documents
+            bool: True if more rss feeds follow the page
+        """
+        cursor = (
+            self.collection.find(
+                self._keyset_query(query, after),
+                field_projection(projection, model_projection(RssFeed)),
+            )
+            .sort(KEYSET_SORT)
+            .limit(limit + 1)
+        )
+        rss_feeds = await cursor.to_list(limit + 1)
+        has_more = len(rss_feeds) > limit
+        rss_feeds = [
+            as_model_document(rss_feed, RssFeed, projection)
+            for rss_feed in rss_feeds[:limit]
+        ]
+        return rss_feeds, has_more
+
+    async def list_timeline(
+        self,
+        provider_ids: List[ObjectId],
+        limit: int,
+        after: Union[Tuple[datetime, ObjectId], None] = None,
+        projection: List[str] = None,
+    ) -> Tuple[List[RssFeed], bool]:
+        """Gets a page of the rss feeds of several providers, newest first
+
+        A single `$in` query; the provider_published index serves it by
+        merging the already sorted range of each provider.
+
+        Args:
+            provider_ids (List[ObjectId]): ids of rss providers
+            limit (int): maximum number of rss feeds in the page
+            after (tuple): (published_date, id) of the last item of the previous page
+            projection (List[str]): fields of the rss feeds to read, all when None
+
+        Returns:
+            List[RssFeed]: list of rss feeds
+            bool: True if more rss feeds follow the page
+        """
+        query = {"provider_id": {"$in": provider_ids}}
+        cursor = (
+            self.collection.find(
+                self._keyset_query(query, after),
+                field_projection(projection, FEED_PROJECTION),
+            )
+            .sort(KEYSET_SORT)
+            .limit(limit + 1)
+        )
+        rss_feeds = await cursor.to_list(limit + 1)
+        has_more = len(rss_feeds) > limit
+        rss_feeds = [
+            read_model(RssFeed, rss_feed, projection is not None)
+            for rss_feed in rss_feeds[:limit]
+        ]
+        return rss_feeds, has_more
+
+    async def list_by_ids(
+        self, feed_ids: List[ObjectId], projection: List[str] = None
+    ) -> List[RssFeed]:
+        """Gets rss feeds by id
+
+        Args:
+            feed_ids (List[ObjectId]): ids of rss feeds
+            projection (List[str]): fields of the rss feeds to read, all when None
+
+        Returns:
+            List[RssFeed]: rss feeds found, in no particular order
+        """
+        rss_feeds = self.collection.find(
+            {"_id": {"$in": feed_ids}}, field_projection(projection, FEED_PROJECTION)
+        )
+        return [
+            read_model(RssFeed, rss_feed, projection is not None)
+            async for rss_feed in rss_feeds
+        ]
+
+    async def get_recent_inbox_entries(
+        self, provider_id: str, limit: int
+    ) -> List[dict]:
+        """
+        Gets the timeline inbox entries of the most recent rss feeds of a
+        provider, answered from the provider index alone
+
+        Args:
+            provider_id (str): id of rss provider
+            limit (int): maximum number of entries
+
+        Returns:
+            List[dict]: (published_date, feed_id, provider_id) entries, newest first
+        """
+        provider_id = ObjectId(provider_id)
+        rss_feeds = (
+            self.collection.find({"provider_id": provider_id}, {"published_date": 1})
+            .sort(KEYSET_SORT)
+            .limit(limit)
+        )
+        return [
+            {
+                "published_date": rss_feed["published_date"],
+                "feed_id": rss_feed["_id"],
+                "provider_id": provider_id,
+            }
+            async for rss_feed in rss_feeds
+        ]
+
+    async def iterate(
+        self,
+        after: Union[Tuple[datetime, ObjectId], None] = None,
+        projection: List[str] = None,
+        **query,
+    ) -> AsyncIterator[RssFeed]:
+        """Yields rss feeds, newest first, as they arrive from the database
+
+        Args:
+            after (tuple): (published_date, id) to resume after
+            projection (List[str]): fields of the rss feeds to read, all when None
+            query (dict): values to be used for filtering
+
+        Yields:
+            RssFeed: rss feed
+        """
+        cursor = (
+            self.collection.find(
+                self._keyset_query(query, after),
+                field_projection(projection, FEED_PROJECTION),
+            )
+            .sort(KEYSET_SORT)
+            .batch_size(settings.RSS_FEEDS_STREAM_BATCH_SIZE)
+        )
+        async for rss_feed in cursor:
+            yield read_model(RssFeed, rss_feed, projection is not None)
+
+    async def search(
+        self,
+        text: str,
+        limit: int,
+        offset: int = 0,
+        provider_id: str = None,
+        published_after: datetime = None,
+        published_before: datetime = None,
+        projection: List[str] = None,
+    ) -> Tuple[List[RssFeedSearchHit], bool]:
+        """Searches rss feeds by title and description, most relevant first
+
+        Args:
+            text (str): words to search, "quoted phrases" and -negations allowed
+            limit (int): maximum number of rss feeds
+            offset (int): number of rss feeds to skip
+            provider_id (str): only search the rss feeds of this provider
+            published_after (datetime): only search rss feeds published after
+            published_before (datetime): only search rss feeds published before
+            projection (List[str]): fields of the rss feeds to read, all when None
+
+        Returns:
+            List[RssFeedSearchHit]: matching rss feeds with their score
+            bool: True if more rss feeds match
+        """
+        query = {"$text": {"$search": text}}
+        if provider_id is not None:
+            query["provider_id"] = ObjectId(provider_id)
+        published_date = {}
+        if published_after is not None:
+            published_date["$gt"] = published_after
+        if published_before is not None:
+            published_date["$lt"] = published_before
+        if published_date:
+            query["published_date"] = published_date
+
+        cursor = (
+            self.collection.find(
+                query,
+                {
+                    **field_projection(projection, FEED_PROJECTION),
+                    "score": {"$meta": "textScore"},
+                },
+            )
+            .sort(SEARCH_SORT)
+            .skip(offset)
+            .limit(limit + 1)
+        )
+        rss_feeds = await cursor.to_list(limit + 1)
+        has_more = len(rss_feeds) > limit
+        rss_feeds = [
+            read_model(RssFeedSearchHit, rss_feed, projection is not None)
+            for rss_feed in rss_feeds[:limit]
+        ]
+        return rss_feeds, has_more
+
     async def count(self, **query) -> int:
         """Gets the count of rss feeds
 
@@ -36,52 +347,89 @@ class RssFeedDatabase:
         """
         return await self.collection.count_documents(query)
 
-    async def get_by_id(self, feed_id: str) -> RssFeed:
+    async def get_by_id(self, feed_id: str, projection: List[str] = None) -> RssFeed:
         """
         Gets a rss feed by id
 
         Args:
             id (str): id of rss feed
+            projection (List[str]): fields of the rss feeds to read, all when None
 
         Returns:
             RssFeed: rss feed
             None: if no rss feed found
         """
-        rss_feed = await self.collection.find_one({"_id": ObjectId(feed_id)})
+        rss_feed = await self.collection.find_one(
+            {"_id": ObjectId(feed_id)}, field_projection(projection, FEED_PROJECTION)
+        )
         if rss_feed:
-            return RssFeed(**rss_feed, id=rss_feed["_id"])
+            return read_model(RssFeed, rss_feed, projection is not None)
         return None
 
-    async def get_by_provider_id(self, provider_id: str) -> List[RssFeed]:
+    async def get_by_provider_id(
+        self, provider_id: str, projection: List[str] = None
+    ) -> List[RssFeed]:
         """
         Gets a list of rss feeds by provider id
 
         Args:
             provider_id (str): id of rss provider
+            projection (List[str]): fields of the rss feeds to read, all when None
 
         Returns:
             List[RssFeed]: list of rss feeds
         """
         rss_feeds = await self.collection.find(
-            {"provider_id": ObjectId(provider_id)}
+            {"provider_id": ObjectId(provider_id)},
+            field_projection(projection, FEED_PROJECTION),
         ).to_list(None)
-        rss_feeds = [RssFeed(**rss_feed, id=rss_feed["_id"]) for rss_feed in rss_feeds]
+        rss_feeds = [
+            read_model(RssFeed, rss_feed, projection is not None)
+            for rss_feed in rss_feeds
+        ]
         return rss_feeds
 
-    async def get_by_url(self, url: str) -> RssFeed:
+    async def get_recent_published_dates(
+        self, provider_id: str, limit: int
+    ) -> List[datetime]:
+        """
+        Gets the publish dates of the most recent rss feeds of a provider,
+        answered from the provider index alone
+
+        Args:
+            provider_id (str): id of rss provider
+            limit (int): maximum number of dates
+
+        Returns:
+            List[datetime]: publish dates, newest first
+        """
+        rss_feeds = (
+            self.collection.find(
+                {"provider_id": ObjectId(provider_id)},
+                {"published_date": 1, "_id": 0},
+            )
+            .sort(KEYSET_SORT)
+            .limit(limit)
+        )
+        return [rss_feed["published_date"] async for rss_feed in rss_feeds]
+
+    async def get_by_url(self, url: str, projection: List[str] = None) -> RssFeed:
         """
         Gets a rss feed by url
 
         Args:
             url (str): url of rss feed
+            projection (List[str]): fields of the rss feeds to read, all when None
 
         Returns:
             RssFeed: rss feed
             None: if no rss feed found
         """
-        rss_feed = await self.collection.find_one({"link": url})
+        rss_feed = await self.collection.find_one(
+            {"link": url}, field_projection(projection, FEED_PROJECTION)
+        )
         if rss_feed:
-            return RssFeed(**rss_feed, id=rss_feed["_id"])
+            return read_model(RssFeed, rss_feed, projection is not None)
         return None
 
     async def create(self, rss_feed: RssFeed) -> RssFeed:
@@ -92,10 +440,16 @@ class RssFeedDatabase:
             rss_feed (RssFeed): rss feed
 
         Returns:
-            RssFeed: rss feed
+            RssFeed: rss feed, as stored
+
+        Raises:
+            DuplicateKeyError: if a rss feed with the same link exists
         """
-        result = await self.collection.insert_one(rss_feed.dict())
-        rss_feed = await self.get_by_id(result.inserted_id)
+        await self.collection.insert_one(
+            {**rss_feed.dict(exclude={"id"}), "_id": rss_feed.id}
+        )
+        await self._bump_version()
+        feed_search_index.add([rss_feed])
         return rss_feed
 
     async def create_many(self, rss_feeds: List[RssFeed]) -> List[RssFeed]:
@@ -106,17 +460,86 @@ class RssFeedDatabase:
             rss_feeds (List[RssFeed]): list of rss feeds
 
         Returns:
-            List[RssFeed]: list of rss feeds
+            List[RssFeed]: list of rss feeds, as stored
+
+        Raises:
+            BulkWriteError: if a rss feed with the same link exists
         """
-        result = await self.collection.insert_many(
-            [rss_feed.dict() for rss_feed in rss_feeds]
+        await self.collection.insert_many(
+            [
+                {**rss_feed.dict(exclude={"id"}), "_id": rss_feed.id}
+                for rss_feed in rss_feeds
+            ]
         )
-        rss_feeds = [
-            await self.get_by_id(result_id) for result_id in result.inserted_ids
-        ]
+        await self._bump_version()
+        feed_search_index.add(rss_feeds)
         return rss_feeds
 
-    async def update(self, feed_id, rss_feed: RssFeed) -> RssFeed:
+    async def upsert_many(self, rss_feeds: List[RssFeed]) -> RssFeedIngestResult:
+        """
+        Inserts new rss feeds and refreshes known ones in a single round trip,
+        matching existing rss feeds on their link
+
+        Args:
+            rss_feeds (List[RssFeed]): list of rss feeds
+
+        Returns:
+            RssFeedIngestResult: counts of inserted, updated and unchanged rss feeds
+
+        Raises:
+            BulkWriteError: if a write failed for another reason than a
+                duplicate link, once the other writes are accounted for
+        """
+        # the last occurrence of a link wins, two upserts of the same link in
+        # one unordered batch would race on the unique index
+        rss_feeds = list({rss_feed.link: rss_feed for rss_feed in rss_feeds}.values())
+        if not rss_feeds:
+            return RssFeedIngestResult()
+
+        operations = [
+            UpdateOne(
+                {"link": rss_feed.link},
+                {
+                    "$set": rss_feed.dict(exclude={"id", "view_count"}),
+                    "$setOnInsert": {"_id": rss_feed.id, "view_count": 0},
+                },
+                upsert=True,
+            )
+            for rss_feed in rss_feeds
+        ]
+        write_error = None
+        try:
+            result = await self.collection.bulk_write(operations, ordered=False)
+            updated = result.modified_count
+            inserted_ids = list(result.upserted_ids.values())
+        except BulkWriteError as e:
+            # a concurrent ingestion of the same link loses on the unique
+            # index, that rss feed is already stored and counts as skipped
+            updated = e.details["nModified"]
+            inserted_ids = [upserted["_id"] for upserted in e.details["upserted"]]
+            if any(
+                error["code"] != DUPLICATE_KEY_ERROR
+                for error in e.details["writeErrors"]
+            ):
+                write_error = e
+        if inserted_ids or updated:
+            await self._bump_version()
+        # rss feeds refreshed in place keep their stored id, only the new
+        # ones can be indexed from what is at hand
+        inserted = set(inserted_ids)
+        feed_search_index.add(
+            rss_feed for rss_feed in rss_feeds if rss_feed.id in inserted
+        )
+        if write_error is not None:
+            raise write_error
+        return RssFeedIngestResult(
+            inserted=len(inserted_ids),
+            updated=updated,
+            skipped=len(operations) - len(inserted_ids) - updated,
+            inserted_ids=inserted_ids,
+        )
+
+    async def update(self, feed_id, rss_feed: RssFeed) -> Union[RssFeed, None]:
         """
         Updates a rss feed
 
@@ -125,14 +548,49 @@ class RssFeedDatabase:
             rss_feed (RssFeed): rss feed
 
         Returns:
-            RssFeed: rss feed
+            RssFeed: rss feed, as updated
+            None: if no rss feed found
+
+        Raises:
+            DuplicateKeyError: if another rss feed has the same link
         """
-        await self.collection.update_one(
-            {"_id": ObjectId(feed_id)}, {"$set": rss_feed.dict(exclude={"id"})}
+        rss_feed = await self.collection.find_one_and_update(
+            {"_id": ObjectId(feed_id)},
+            {"$set": rss_feed.dict(exclude={"id", "view_count"})},
+            projection=FEED_PROJECTION,
+            return_document=ReturnDocument.AFTER,
         )
-        rss_feed = await self.get_by_id(feed_id)
+        if rss_feed is None:
+            return None
+        await self._bump_version()
+        rss_feed = read_model(RssFeed, rss_feed)
+        feed_search_index.add([rss_feed])
         return rss_feed
 
+    async def increment_view_counts(self, view_counts: Dict[ObjectId, int]) -> int:
+        """
+        Adds views to the pre-aggregated view counts of rss feeds
+
+        The collection version is left alone, view counts change with every
+        flush and would make every ETag of the rss feeds stale.
+
+        Args:
+            view_counts (dict): views to add per rss feed id
+
+        Returns:
+            int: number of rss feeds found
+        """
+        if not view_counts:
+            return 0
+        result = await self.collection.bulk_write(
+            [
+                UpdateOne({"_id": feed_id}, {"$inc": {"view_count": count}})
+                for feed_id, count in view_counts.items()
+            ],
+            ordered=False,
+        )
+        return result.matched_count
+
     async def delete(self, feed_id: str) -> bool:
         """
         Deletes a rss feed
@@ -144,7 +602,11 @@ class RssFeedDatabase:
             bool: True if rss feed deleted, False otherwise
         """
         result = await self.collection.delete_one({"_id": ObjectId(feed_id)})
-        return result.deleted_count > 0
+        if result.deleted_count == 0:
+            return False
+        await self._bump_version()
+        feed_search_index.remove(feed_id)
+        return True
 
     async def delete_many(self, provider_id: str) -> bool:
         """
@@ -159,4 +621,6 @@ class RssFeedDatabase:
         result = await self.collection.delete_many(
             {"provider_id": ObjectId(provider_id)}
         )
+        await self._bump_version()
+        feed_search_index.remove_provider(provider_id)
         return result.deleted_count > 0
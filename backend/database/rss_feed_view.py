@@ -0,0 +1,95 @@
+from typing import List
+
+import pymongo
+from bson import ObjectId
+from pymongo import IndexModel
+from pymongo.errors import BulkWriteError
+from core.config import settings
+from database.documents import field_projection, read_model
+from models.rss_feed import RssFeedView
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class RssFeedViewDatabase:
+    """Append only store of rss feed views"""
+
+    indexes = [
+        IndexModel(
+            [("feed_id", pymongo.ASCENDING), ("viewed_at", pymongo.DESCENDING)],
+            name="feed_viewed_at",
+        ),
+        IndexModel(
+            [("viewer_id", pymongo.ASCENDING), ("viewed_at", pymongo.DESCENDING)],
+            name="viewer_viewed_at",
+        ),
+    ]
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = self.db[settings.RSS_FEED_VIEWS_COLLECTION]
+
+    async def insert_many(self, views: List[RssFeedView]) -> int:
+        """
+        Stores views in one round trip; views already stored by a previous
+        attempt are skipped, so a failed batch can be written again
+
+        Args:
+            views (List[RssFeedView]): views to store
+
+        Returns:
+            int: number of views stored
+        """
+        if not views:
+            return 0
+        try:
+            result = await self.collection.insert_many(
+                [{**view.dict(exclude={"id"}), "_id": view.id} for view in views],
+                ordered=False,
+            )
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            if any(
+                error["code"] != DUPLICATE_KEY_ERROR
+                for error in e.details["writeErrors"]
+            ):
+                raise
+            return e.details["nInserted"]
+
+    async def list_by_feed(
+        self, feed_id: str, limit: int, projection: List[str] = None
+    ) -> List[RssFeedView]:
+        """
+        Gets the most recent views of a rss feed
+
+        Args:
+            feed_id (str): id of rss feed
+            limit (int): maximum number of views
+            projection (List[str]): fields of the views to read, all when None
+
+        Returns:
+            List[RssFeedView]: views, newest first
+        """
+        views = (
+            self.collection.find(
+                {"feed_id": ObjectId(feed_id)}, field_projection(projection)
+            )
+            .sort("viewed_at", pymongo.DESCENDING)
+            .limit(limit)
+        )
+        return [
+            read_model(RssFeedView, view, projection is not None)
+            async for view in views
+        ]
+
+    async def count_by_feed(self, feed_id: str) -> int:
+        """
+        Counts the views of a rss feed
+
+        Args:
+            feed_id (str): id of rss feed
+
+        Returns:
+            int: number of views
+        """
+        return await self.collection.count_documents({"feed_id": ObjectId(feed_id)})
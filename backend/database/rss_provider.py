@@ -1,33 +1,109 @@
-from typing import List, Union
+from datetime import datetime
+from typing import List, Tuple, Union
 
+import pymongo
 from bson import ObjectId
+from pymongo import IndexModel, ReturnDocument
 from core.config import settings
-from models.rss_provider import RssProvider
+from database.collection_version import CollectionVersionDatabase
+from database.documents import (
+    as_model_document,
+    field_projection,
+    model_projection,
+    read_model,
+)
+from models.rss_provider import FETCH_STATE_FIELDS, RssProvider, RssProviderSearchHit
 
 
 class RssProviderDatabase:
     """Provides Database CRUD operations for rss providers"""
 
+    indexes = [
+        IndexModel([("url", pymongo.ASCENDING)], name="url_unique", unique=True),
+        IndexModel([("next_fetch_at", pymongo.ASCENDING)], name="next_fetch_at"),
+        IndexModel(
+            [("title", pymongo.TEXT), ("description", pymongo.TEXT)],
+            name="text",
+            weights={"title": 10, "description": 1},
+        ),
+    ]
+
     def __init__(self, db):
         self.db = db
         self.collection = self.db[settings.RSS_PROVIDER_COLLECTION]
 
-    async def list(self, **query) -> List[RssProvider]:
+    async def _bump_version(self):
+        await CollectionVersionDatabase(self.db).bump(settings.RSS_PROVIDER_COLLECTION)
+
+    async def list(self, projection: List[str] = None, **query) -> List[RssProvider]:
         """Gets a list of all rss providers
 
         Args:
+            projection (List[str]): fields of the rss providers to read, all when None
             query (dict): values to be used for filtering
 
         Returns:
             List[Subscriber]: list of subscribers
         """
-        rss_providers = await self.collection.find(query).to_list(None)
+        rss_providers = await self.collection.find(
+            query, field_projection(projection)
+        ).to_list(None)
         rss_providers = [
-            RssProvider(**rss_provider, id=rss_provider["_id"])
+            read_model(RssProvider, rss_provider, projection is not None)
             for rss_provider in rss_providers
         ]
         return rss_providers
 
+    async def list_documents(self, projection: List[str] = None, **query) -> List[dict]:
+        """Gets a list of all rss providers as documents shaped like
+        RssProvider without building the models
+
+        Args:
+            projection (List[str]): fields of the rss providers to read, all when None
+            query (dict): values to be used for filtering
+
+        Returns:
+            List[dict]: list of rss provider documents
+        """
+        rss_providers = self.collection.find(
+            query, field_projection(projection, model_projection(RssProvider))
+        )
+        return [
+            as_model_document(rss_provider, RssProvider, projection)
+            async for rss_provider in rss_providers
+        ]
+
+    async def list_due(
+        self, now: datetime, limit: int, projection: List[str] = None
+    ) -> List[RssProvider]:
+        """Gets the rss providers whose next fetch is due, most overdue first
+
+        Args:
+            now (datetime): current time
+            limit (int): maximum number of rss providers
+            projection (List[str]): fields of the rss providers to read, all when None
+
+        Returns:
+            List[RssProvider]: list of rss providers
+        """
+        rss_providers = (
+            self.collection.find(
+                {
+                    "$or": [
+                        {"next_fetch_at": {"$lte": now}},
+                        {"next_fetch_at": None},
+                    ]
+                },
+                field_projection(projection),
+            )
+            .sort("next_fetch_at", pymongo.ASCENDING)
+            .limit(limit)
+        )
+        return [
+            read_model(RssProvider, rss_provider, projection is not None)
+            async for rss_provider in rss_providers
+        ]
+
     async def count(self, **query) -> int:
         """Gets the count of rss providers
 
@@ -39,57 +115,112 @@ class RssProviderDatabase:
         """
         return await self.collection.count_documents(query)
 
-    async def get_by_id(self, provider_id: str) -> Union[RssProvider, None]:
+    async def get_by_id(
+        self, provider_id: str, projection: List[str] = None
+    ) -> Union[RssProvider, None]:
         """
         Gets a rss provider by id
 
         Args:
             id (str): id of rss provider
+            projection (List[str]): fields of the rss providers to read, all when None
 
         Returns:
             RssProvider: rss provider
             None: if no rss provider found
         """
-        rss_provider = await self.collection.find_one({"_id": ObjectId(provider_id)})
+        rss_provider = await self.collection.find_one(
+            {"_id": ObjectId(provider_id)}, field_projection(projection)
+        )
         if rss_provider:
-            return RssProvider(**rss_provider, id=rss_provider["_id"])
+            return read_model(RssProvider, rss_provider, projection is not None)
         return None
 
-    async def get_by_url(self, url: str) -> RssProvider:
+    async def get_by_url(self, url: str, projection: List[str] = None) -> RssProvider:
         """
         Gets a rss provider by url
 
         Args:
             url (str): url of rss provider
+            projection (List[str]): fields of the rss providers to read, all when None
 
         Returns:
             RssProvider: rss provider
             None: if no rss provider found
         """
-        rss_provider = await self.collection.find_one({"url": url})
+        rss_provider = await self.collection.find_one(
+            {"url": url}, field_projection(projection)
+        )
         if rss_provider:
-            return RssProvider(**rss_provider, id=rss_provider["_id"])
+            return read_model(RssProvider, rss_provider, projection is not None)
         return None
 
-    async def search_by_name(self, name: str) -> List[RssProvider]:
+    async def search_by_name(
+        self, name: str, projection: List[str] = None
+    ) -> List[RssProvider]:
         """
         Searches for rss providers by name
 
         Args:
             name (str): name of rss provider
+            projection (List[str]): fields of the rss providers to read, all when None
 
         Returns:
-            List[RssProvider]: list of rss providers
+            List[RssProvider]: list of rss providers, most relevant first
         """
-        rss_providers = await self.collection.find(
-            {"name": {"$regex": f"/{name}$/i"}}
-        ).to_list(None)
+        rss_providers = (
+            await self.collection.find(
+                {"$text": {"$search": name}},
+                {
+                    **field_projection(projection, {}),
+                    "score": {"$meta": "textScore"},
+                },
+            )
+            .sort([("score", {"$meta": "textScore"})])
+            .to_list(None)
+        )
         rss_providers = [
-            RssProvider(**rss_provider, id=rss_provider["_id"])
+            read_model(RssProvider, rss_provider, projection is not None)
             for rss_provider in rss_providers
         ]
         return rss_providers
 
+    async def search(
+        self, text: str, limit: int, offset: int = 0, projection: List[str] = None
+    ) -> Tuple[List[RssProviderSearchHit], bool]:
+        """
+        Searches rss providers by title and description, most relevant first
+
+        Args:
+            text (str): words to search, "quoted phrases" and -negations allowed
+            limit (int): maximum number of rss providers
+            offset (int): number of rss providers to skip
+            projection (List[str]): fields of the rss providers to read, all when None
+
+        Returns:
+            List[RssProviderSearchHit]: matching rss providers with their score
+            bool: True if more rss providers match
+        """
+        cursor = (
+            self.collection.find(
+                {"$text": {"$search": text}},
+                {
+                    **field_projection(projection, {}),
+                    "score": {"$meta": "textScore"},
+                },
+            )
+            .sort([("score", {"$meta": "textScore"})])
+            .skip(offset)
+            .limit(limit + 1)
+        )
+        rss_providers = await cursor.to_list(limit + 1)
+        has_more = len(rss_providers) > limit
+        rss_providers = [
+            read_model(RssProviderSearchHit, rss_provider, projection is not None)
+            for rss_provider in rss_providers[:limit]
+        ]
+        return rss_providers, has_more
+
     async def create(self, rss_provider: RssProvider) -> RssProvider:
         """
         Creates a rss provider
@@ -98,13 +229,20 @@ class RssProviderDatabase:
             rss_provider (RssProvider): rss provider
 
         Returns:
-            RssProvider: rss provider
+            RssProvider: rss provider, as stored
+
+        Raises:
+            DuplicateKeyError: if a rss provider with the same url exists
         """
-        result = await self.collection.insert_one(rss_provider.dict(exclude={"id"}))
-        rss_provider = await self.get_by_id(result.inserted_id)
+        await self.collection.insert_one(
+            {**rss_provider.dict(exclude={"id"}), "_id": rss_provider.id}
+        )
+        await self._bump_version()
         return rss_provider
 
-    async def update(self, provider_id: str, rss_provider: RssProvider) -> RssProvider:
+    async def update(
+        self, provider_id: str, rss_provider: RssProvider
+    ) -> Union[RssProvider, None]:
         """
         Updates a rss provider
 
@@ -113,13 +251,142 @@ class RssProviderDatabase:
             rss_provider (RssProvider): rss provider
 
         Returns:
-            RssProvider: rss provider
+            RssProvider: rss provider, as updated
+            None: if no rss provider found
+
+        Raises:
+            DuplicateKeyError: if another rss provider has the same url
+        """
+        return await self.update_fields(
+            provider_id, **rss_provider.dict(exclude={"id"})
+        )
+
+    async def update_fields(
+        self, provider_id: str, **fields
+    ) -> Union[RssProvider, None]:
+        """
+        Sets the given fields of a rss provider and gets it as updated
+
+        Args:
+            provider_id (str): id of rss provider
+            fields (dict): values of the fields to set
+
+        Returns:
+            RssProvider: rss provider, as updated
+            None: if no rss provider found
+
+        Raises:
+            DuplicateKeyError: if another rss provider has the same url
+        """
+        rss_provider = await self.collection.find_one_and_update(
+            {"_id": ObjectId(provider_id)},
+            {"$set": fields},
+            return_document=ReturnDocument.AFTER,
+        )
+        if rss_provider is None:
+            return None
+        await self._bump_version()
+        return read_model(RssProvider, rss_provider)
+
+    async def set_fields(
+        self, provider_id: str, lease_token: int = None, **fields
+    ) -> bool:
+        """
+        Sets the given fields of a rss provider without reading it
+
+        Writing only fetch state fields, as every poll of the provider does,
+        keeps the collection version: responses do not show them.
+
+        With a lease token the write is fenced: it is stored along with the
+        fields and the write is rejected once a newer token was stored, so
+        a scheduler whose lease was taken over cannot overwrite the state
+        written by the new leader.
+
+        Args:
+            provider_id (str): id of rss provider
+            lease_token (int): fencing token of the scheduler lease
+            fields (dict): values of the fields to set
+
+        Returns:
+            bool: True if rss provider was found, and not fenced off
+        """
+        query = {"_id": ObjectId(provider_id)}
+        if lease_token is not None:
+            query["$or"] = [
+                {"lease_token": {"$lte": lease_token}},
+                {"lease_token": None},
+            ]
+            fields["lease_token"] = lease_token
+        result = await self.collection.update_one(query, {"$set": fields})
+        if result.matched_count == 0:
+            return False
+        if not fields.keys() <= FETCH_STATE_FIELDS:
+            await self._bump_version()
+        return True
+
+    async def add_followers(self, provider_id: str, count: int) -> Union[int, None]:
+        """
+        Adjusts the follower count of a rss provider
+
+        Args:
+            provider_id (str): id of rss provider
+            count (int): followers gained, negative when lost
+
+        Returns:
+            int: follower count of the rss provider, as adjusted
+            None: if no rss provider found
+        """
+        rss_provider = await self.collection.find_one_and_update(
+            {"_id": ObjectId(provider_id)},
+            {"$inc": {"follower_count": count}},
+            {"follower_count": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if rss_provider is None:
+            return None
+        await self._bump_version()
+        return rss_provider["follower_count"]
+
+    async def set_inbox_backfill(self, provider_id: str, pending: bool):
+        """
+        Marks a rss provider whose recent rss feeds are being pushed to the
+        inboxes of its followers; it is not part of responses, so the
+        collection version is kept
+
+        Args:
+            provider_id (str): id of rss provider
+            pending (bool): True until every inbox was backfilled
         """
         await self.collection.update_one(
-            {"_id": ObjectId(provider_id)}, {"$set": rss_provider.dict(exclude={"id"})}
+            {"_id": ObjectId(provider_id)}, {"$set": {"inbox_backfill": pending}}
         )
-        rss_provider = await self.get_by_id(id)
-        return rss_provider
+
+    async def list_popular_ids(
+        self, provider_ids: List[ObjectId], min_followers: int
+    ) -> List[ObjectId]:
+        """
+        Gets which of the given rss providers have more than a number of
+        followers, or are still being backfilled to the inboxes of their
+        followers since they stopped having that many
+
+        Args:
+            provider_ids (List[ObjectId]): ids of rss providers
+            min_followers (int): follower count to exceed
+
+        Returns:
+            List[ObjectId]: ids of the rss providers to read at request time
+        """
+        rss_providers = self.collection.find(
+            {
+                "_id": {"$in": provider_ids},
+                "$or": [
+                    {"follower_count": {"$gt": min_followers}},
+                    {"inbox_backfill": True},
+                ],
+            },
+            {"_id": 1},
+        )
+        return [rss_provider["_id"] async for rss_provider in rss_providers]
 
     async def delete(self, provider_id: str) -> bool:
         """
@@ -132,4 +399,7 @@ class RssProviderDatabase:
             bool: True if rss provider was deleted, False otherwise
         """
         result = await self.collection.delete_one({"_id": ObjectId(provider_id)})
-        return result.deleted_count > 0
+        if result.deleted_count == 0:
+            return False
+        await self._bump_version()
+        return True
@@ -1,27 +1,55 @@
-from typing import List
+from typing import Dict, List, Union
 
+import pymongo
 from bson import ObjectId
+from pymongo import IndexModel, ReturnDocument
 from core.config import settings
+from database.documents import field_projection, read_model
 from models.subscriber import Subscriber
 
 
+def read_subscriber(document: dict, partial: bool = False) -> Subscriber:
+    """Builds a subscriber from its document
+
+    Followed providers were stored as strings before timelines, they are
+    read as ObjectIds whether reads are trusted or not.
+    """
+    if "subscribed_providers" in document or not partial:
+        document["subscribed_providers"] = [
+            ObjectId(provider_id)
+            for provider_id in document.get("subscribed_providers", [])
+        ]
+    return read_model(Subscriber, document, partial)
+
+
 class DBSubscriber:
+    indexes = [
+        IndexModel([("email", pymongo.ASCENDING)], name="email_unique", unique=True),
+        IndexModel(
+            [("subscribed_providers", pymongo.ASCENDING)], name="subscribed_providers"
+        ),
+    ]
+
     def __init__(self, db):
         self.db = db
         self.collection = self.db[settings.SUBSCRIBER_COLLECTION]
 
-    async def list(self, **query) -> List[Subscriber]:
+    async def list(self, projection: List[str] = None, **query) -> List[Subscriber]:
         """Gets a list of all subscrubers
 
         Args:
+            projection (List[str]): fields of the subscribers to read, all when None
             query (dict): values to be used for filtering
 
         Returns:
             List[Subscriber]: list of subscribers
         """
-        subscribers = await self.collection.find(query).to_list(None)
+        subscribers = await self.collection.find(
+            query, field_projection(projection)
+        ).to_list(None)
         subscribers = [
-            Subscriber(**subscriber, id=subscriber["_id"]) for subscriber in subscribers
+            read_subscriber(subscriber, projection is not None)
+            for subscriber in subscribers
         ]
         return subscribers
 
@@ -36,35 +64,80 @@ class DBSubscriber:
         """
         return await self.collection.count_documents(query)
 
-    async def get_by_email(self, email) -> Subscriber:
+    async def list_follower_ids(self, provider_id: str) -> List[ObjectId]:
+        """Gets the ids of the subscribers following a provider
+
+        Args:
+            provider_id (str): id of rss provider
+
+        Returns:
+            List[ObjectId]: ids of subscribers
+        """
+        # follows made before ids were stored as ObjectId hold strings
+        subscribers = self.collection.find(
+            {
+                "subscribed_providers": {
+                    "$in": [ObjectId(provider_id), str(provider_id)]
+                }
+            },
+            {"_id": 1},
+        )
+        return [subscriber["_id"] async for subscriber in subscribers]
+
+    async def count_followers(self) -> Dict[ObjectId, int]:
+        """Counts the followers of every followed provider
+
+        Returns:
+            dict: follower count per rss provider id
+        """
+        counts = self.collection.aggregate(
+            [
+                {"$unwind": "$subscribed_providers"},
+                {
+                    "$group": {
+                        "_id": {"$toObjectId": "$subscribed_providers"},
+                        "count": {"$sum": 1},
+                    }
+                },
+            ]
+        )
+        return {count["_id"]: count["count"] async for count in counts}
+
+    async def get_by_email(self, email, projection: List[str] = None) -> Subscriber:
         """Gets a subscriber by email
 
         Args:
             email (str): email of subscriber
+            projection (List[str]): fields of the subscribers to read, all when None
 
         Returns:
             Subscriber: subscriber
             None: if no subscriber found
         """
-        subscriber = await self.collection.find_one({"email": email})
+        subscriber = await self.collection.find_one(
+            {"email": email}, field_projection(projection)
+        )
         if subscriber:
-            return Subscriber(**subscriber, id=subscriber["_id"])
+            return read_subscriber(subscriber, projection is not None)
         return None
 
-    async def get_by_id(self, id: str) -> Subscriber:
+    async def get_by_id(self, id: str, projection: List[str] = None) -> Subscriber:
         """
         Gets a subscriber by id
 
         Args:
             id (str): id of subscriber
+            projection (List[str]): fields of the subscribers to read, all when None
 
         Returns:
             Subscriber: subscriber
             None: if no subscriber found
         """
-        subscriber = await self.collection.find_one({"_id": ObjectId(id)})
+        subscriber = await self.collection.find_one(
+            {"_id": ObjectId(id)}, field_projection(projection)
+        )
         if subscriber:
-            return Subscriber(**subscriber, id=subscriber["_id"])
+            return read_subscriber(subscriber, projection is not None)
         return None
 
     async def create(self, subscriber: Subscriber) -> Subscriber:
@@ -75,9 +148,13 @@ class DBSubscriber:
 
         Returns:
             Subscriber: created subscriber
+
+        Raises:
+            DuplicateKeyError: if a subscriber with the same email exists
         """
-        result = await self.collection.insert_one(subscriber.dict(exclude={"id"}))
-        subscriber = await self.get_by_id(result.inserted_id)
+        await self.collection.insert_one(
+            {**subscriber.dict(exclude={"id"}), "_id": subscriber.id}
+        )
         return subscriber
 
     async def update(self, id: str, subscriber: Subscriber) -> Subscriber:
@@ -89,12 +166,82 @@ class DBSubscriber:
 
         Returns:
             Subscriber: updated subscriber
+            None: if no subscriber found
+
+        Raises:
+            DuplicateKeyError: if another subscriber has the same email
         """
-        await self.collection.update_one(
-            {"_id": ObjectId(id)}, {"$set": subscriber.dict(exclude={"id"})}
+        subscriber = await self.collection.find_one_and_update(
+            {"_id": ObjectId(id)},
+            {"$set": subscriber.dict(exclude={"id"})},
+            return_document=ReturnDocument.AFTER,
         )
-        subscriber = await self.get_by_id(id)
-        return subscriber
+        if subscriber:
+            return read_subscriber(subscriber)
+        return None
+
+    async def set_fields(self, id: str, **fields) -> bool:
+        """Sets the given fields of a subscriber without reading it
+
+        Args:
+            id (str): id of subscriber
+            fields (dict): values of the fields to set
+
+        Returns:
+            bool: True if subscriber was found, False otherwise
+        """
+        result = await self.collection.update_one(
+            {"_id": ObjectId(id)}, {"$set": fields}
+        )
+        return result.matched_count > 0
+
+    async def follow(self, id: str, provider_id: str) -> Union[Subscriber, None]:
+        """Adds a provider to the followed providers of a subscriber, in a
+        single update that only matches if it is not followed yet
+
+        Args:
+            id (str): id of subscriber
+            provider_id (str): id of rss provider
+
+        Returns:
+            Subscriber: subscriber, as updated
+            None: if no subscriber found or the provider is already followed
+        """
+        provider_id = ObjectId(provider_id)
+        # follows made before ids were stored as ObjectId hold strings
+        subscriber = await self.collection.find_one_and_update(
+            {
+                "_id": ObjectId(id),
+                "subscribed_providers": {"$nin": [provider_id, str(provider_id)]},
+            },
+            {"$addToSet": {"subscribed_providers": provider_id}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if subscriber:
+            return read_subscriber(subscriber)
+        return None
+
+    async def unfollow(self, id: str, provider_id: str) -> Union[Subscriber, None]:
+        """Removes a provider from the followed providers of a subscriber, in
+        a single update that only matches if it is followed
+
+        Args:
+            id (str): id of subscriber
+            provider_id (str): id of rss provider
+
+        Returns:
+            Subscriber: subscriber, as updated
+            None: if no subscriber found or the provider is not followed
+        """
+        provider_ids = [ObjectId(provider_id), str(provider_id)]
+        subscriber = await self.collection.find_one_and_update(
+            {"_id": ObjectId(id), "subscribed_providers": {"$in": provider_ids}},
+            {"$pull": {"subscribed_providers": {"$in": provider_ids}}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if subscriber:
+            return read_subscriber(subscriber)
+        return None
 
     async def delete(self, id: str) -> bool:
         """Deletes a subscriber
@@ -107,3 +254,23 @@ class DBSubscriber:
         """
         result = await self.collection.delete_one({"_id": ObjectId(id)})
         return result.deleted_count > 0
+
+    async def delete_and_get(
+        self, id: str, projection: List[str] = None
+    ) -> Union[Subscriber, None]:
+        """Deletes a subscriber and gets it as it was, in a single operation
+
+        Args:
+            id (str): id of subscriber to be deleted
+            projection (List[str]): fields of the subscriber to read, all when None
+
+        Returns:
+            Subscriber: deleted subscriber
+            None: if no subscriber found
+        """
+        subscriber = await self.collection.find_one_and_delete(
+            {"_id": ObjectId(id)}, projection=field_projection(projection)
+        )
+        if subscriber:
+            return read_subscriber(subscriber, projection is not None)
+        return None
@@ -0,0 +1,183 @@
+from datetime import datetime
+from typing import List, Tuple, Union
+
+from bson import ObjectId
+from core.config import settings
+
+# newest first inside an inbox, same order as the rss feed keyset
+INBOX_SORT = {"published_date": -1, "feed_id": -1}
+
+
+class TimelineInboxDatabase:
+    """Stores the materialized timeline of each subscriber
+
+    An inbox is one document per subscriber holding the
+    (published_date, feed_id, provider_id) entries of the newest rss feeds
+    of the providers they follow, kept sorted and capped to
+    TIMELINE_INBOX_SIZE entries by every push.
+    """
+
+    indexes = []
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = self.db[settings.TIMELINE_INBOX_COLLECTION]
+
+    async def create(self, subscriber_id: str, entries: List[dict]):
+        """
+        Creates or replaces the inbox of a subscriber
+
+        Args:
+            subscriber_id (str): id of subscriber
+            entries (List[dict]): inbox entries, newest first
+        """
+        await self.collection.replace_one(
+            {"_id": ObjectId(subscriber_id)},
+            {"items": entries[: settings.TIMELINE_INBOX_SIZE]},
+            upsert=True,
+        )
+
+    async def push(self, subscriber_ids: List[ObjectId], entries: List[dict]) -> int:
+        """
+        Adds entries to the existing inboxes of subscribers; subscribers
+        without an inbox get theirs built in full on their next read
+
+        Args:
+            subscriber_ids (List[ObjectId]): ids of subscribers
+            entries (List[dict]): inbox entries
+
+        Returns:
+            int: number of inboxes updated
+        """
+        if not subscriber_ids or not entries:
+            return 0
+        result = await self.collection.update_many(
+            {"_id": {"$in": subscriber_ids}},
+            {
+                "$push": {
+                    "items": {
+                        "$each": entries,
+                        "$sort": INBOX_SORT,
+                        "$slice": settings.TIMELINE_INBOX_SIZE,
+                    }
+                }
+            },
+        )
+        return result.matched_count
+
+    async def pull_provider(self, subscriber_id: str, provider_id: str):
+        """
+        Removes the entries of a provider from the inbox of a subscriber
+
+        Args:
+            subscriber_id (str): id of subscriber
+            provider_id (str): id of rss provider
+        """
+        await self.pull_provider_many([ObjectId(subscriber_id)], provider_id)
+
+    async def pull_provider_many(
+        self, subscriber_ids: List[ObjectId], provider_id: str
+    ):
+        """
+        Removes the entries of a provider from the inboxes of subscribers
+
+        Args:
+            subscriber_ids (List[ObjectId]): ids of subscribers
+            provider_id (str): id of rss provider
+        """
+        if not subscriber_ids:
+            return
+        await self.collection.update_many(
+            {"_id": {"$in": subscriber_ids}},
+            {"$pull": {"items": {"provider_id": ObjectId(provider_id)}}},
+        )
+
+    async def get_page(
+        self,
+        subscriber_id: str,
+        limit: int,
+        after: Union[Tuple[datetime, ObjectId], None] = None,
+        exclude_provider_ids: List[ObjectId] = None,
+    ) -> Union[Tuple[List[dict], int], None]:
+        """
+        Gets the entries of an inbox following a keyset position; only the
+        page leaves the database, not the whole inbox
+
+        Args:
+            subscriber_id (str): id of subscriber
+            limit (int): maximum number of entries
+            after (tuple): (published_date, feed_id) of the last entry of the previous page
+            exclude_provider_ids (List[ObjectId]): providers whose entries
+                are left out, such as those read at request time instead
+
+        Returns:
+            List[dict]: inbox entries, newest first
+            int: number of entries in the whole inbox
+            None: if the subscriber has no inbox
+        """
+        conditions = []
+        if after is not None:
+            published_date, feed_id = after
+            conditions.append(
+                {
+                    "$or": [
+                        {"$lt": ["$$item.published_date", published_date]},
+                        {
+                            "$and": [
+                                {"$eq": ["$$item.published_date", published_date]},
+                                {"$lt": ["$$item.feed_id", feed_id]},
+                            ]
+                        },
+                    ]
+                }
+            )
+        if exclude_provider_ids:
+            conditions.append(
+                {"$not": [{"$in": ["$$item.provider_id", exclude_provider_ids]}]}
+            )
+        items = "$items"
+        if conditions:
+            items = {
+                "$filter": {
+                    "input": "$items",
+                    "as": "item",
+                    "cond": {"$and": conditions},
+                }
+            }
+        inboxes = await self.collection.aggregate(
+            [
+                {"$match": {"_id": ObjectId(subscriber_id)}},
+                {
+                    "$project": {
+                        "size": {"$size": "$items"},
+                        "items": {"$slice": [items, limit]},
+                    }
+                },
+            ]
+        ).to_list(1)
+        if not inboxes:
+            return None
+        return inboxes[0]["items"], inboxes[0]["size"]
+
+    async def delete(self, subscriber_id: str) -> bool:
+        """
+        Deletes the inbox of a subscriber
+
+        Args:
+            subscriber_id (str): id of subscriber
+
+        Returns:
+            bool: True if deleted, False if not
+        """
+        result = await self.collection.delete_one({"_id": ObjectId(subscriber_id)})
+        return result.deleted_count > 0
+
+    async def delete_all(self) -> int:
+        """
+        Deletes every inbox, they are rebuilt on the next read
+
+        Returns:
+            int: number of deleted inboxes
+        """
+        result = await self.collection.delete_many({})
+        return result.deleted_count
@@ -1,11 +1,22 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from middlewares.error_handler import ErrorHandlerMiddleware
 from core.config import settings
-from application.routers import rss_provider, subscriber, rss_feed, auth
+from core.database import database_client
+from core.redis import redis_client
+from core.responses import FastJSONResponse
+from database.feed_search_index import feed_search_index
+from database.indexes import IndexSync
+from application.routers import rss_provider, subscriber, rss_feed, auth, monitoring
 from services.feeds_scheduler import feed_scheduler, FeedScheduler
+from services.utils.codec import password_codec
+from services.utils.feed_parser import feed_parser_pool
+from services.utils.http_client import feed_fetcher
+from services.utils.invalidation import invalidation_bus
+from services.utils.view_tracker import view_tracker
 
 
 app = FastAPI(
@@ -14,6 +25,10 @@ app = FastAPI(
     version=settings.PROJECT_VERSION,
     docs_url=settings.SWAGGER_URL,
     redoc_url=settings.REDOC_URL,
+    # encodes the output of response models, still validated, with orjson
+    default_response_class=FastJSONResponse
+    if settings.FAST_JSON_RESPONSES
+    else JSONResponse,
 )
 
 app.add_middleware(
@@ -23,22 +38,39 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-app.add_middleware(ErrorHandlerMiddleware, some_attribute="Error Handling Middleware")
+app.add_middleware(ErrorHandlerMiddleware)
 
 app.include_router(subscriber.router, prefix=settings.API_V1_STR)
 app.include_router(rss_provider.router, prefix=settings.API_V1_STR)
 app.include_router(rss_feed.router, prefix=settings.API_V1_STR)
 app.include_router(auth.router, prefix=settings.API_V1_STR)
+app.include_router(monitoring.router, prefix=settings.API_V1_STR)
 
 
 @app.on_event("startup")
 async def startup():
-    feed_scheduler.start(func=FeedScheduler.job_init_func)
+    database_client.connect()
+    if settings.SYNC_INDEXES_ON_STARTUP:
+        await IndexSync(database_client.get_database()).sync()
+    await feed_fetcher.start()
+    feed_parser_pool.start()
+    view_tracker.start()
+    invalidation_bus.start()
+    feed_search_index.start()
+    feed_scheduler.start(func=FeedScheduler.dispatch_due_providers)
 
 
 @app.on_event("shutdown")
 async def shutdown():
-    feed_scheduler.shutdown()
+    await feed_scheduler.shutdown()
+    await view_tracker.stop()
+    await invalidation_bus.stop()
+    await feed_search_index.stop()
+    await feed_fetcher.close()
+    feed_parser_pool.shutdown()
+    password_codec.shutdown()
+    await redis_client.close()
+    database_client.close()
 
 
 @app.get("/api/v1/ping")
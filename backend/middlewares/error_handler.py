@@ -1,23 +1,45 @@
-from fastapi.requests import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+import logging
+
+from fastapi import status
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from core.exception_handler import AppExceptionHandler
 
+logger = logging.getLogger(__name__)
+
+
+class ErrorHandlerMiddleware:
+    """Answers the exceptions raised by the application with their status code
+
+    A plain ASGI middleware: unlike BaseHTTPMiddleware it passes the
+    response messages straight through, so streamed bodies are not
+    buffered through an extra task and memory stream. An exception raised
+    once the response has started can no longer be answered and is
+    re-raised.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-class ErrorHandlerMiddleware(BaseHTTPMiddleware):
-    def __init__(
-        self,
-        app,
-        some_attribute: str,
-    ):
-        super().__init__(app)
-        self.some_attribute = some_attribute
+        response_started = False
 
-    async def dispatch(self, request: Request, call_next):
+        async def send_wrapper(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
 
         try:
-            # process the request and get the response
-            response = await call_next(request)
-            return response
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
-            print(e)
-            return AppExceptionHandler(e).raiseException()
+            if response_started:
+                raise
+            handler = AppExceptionHandler(e)
+            if handler.status_code >= status.HTTP_500_INTERNAL_SERVER_ERROR:
+                logger.exception("%s %s failed", scope["method"], scope["path"])
+            response = handler.raiseException()
+            await response(scope, receive, send)
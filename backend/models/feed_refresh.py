@@ -0,0 +1,64 @@
+from datetime import datetime
+from typing import List
+
+from bson import ObjectId
+from models.utils.custom_type import PyObjectId
+from pydantic import BaseModel, Field
+
+
+class ProviderRefreshReport(BaseModel):
+    """Outcome of refreshing the feeds of one rss provider"""
+
+    provider_id: PyObjectId
+    url: str
+    duration_ms: float = 0
+    attempts: int = 0
+    not_modified: bool = False
+    fetched: int = 0
+    invalid: int = 0
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    error: str = None
+    fenced: bool = False
+
+    class Config:
+        allow_population_by_field_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+
+
+class RefreshRunReport(BaseModel):
+    """Outcome of a refresh run over many rss providers"""
+
+    id: PyObjectId = Field(default_factory=PyObjectId)
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: datetime = None
+    duration_ms: float = 0
+    lease_token: int = None
+    fenced: bool = False
+    providers_total: int = 0
+    providers_failed: int = 0
+    providers_not_modified: int = 0
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    providers: List[ProviderRefreshReport] = Field(default_factory=list)
+
+    class Config:
+        allow_population_by_field_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+
+    def finish(self):
+        """Stamps the end of the run and totals the provider reports"""
+        self.finished_at = datetime.utcnow()
+        self.duration_ms = (self.finished_at - self.started_at).total_seconds() * 1000
+        self.providers_total = len(self.providers)
+        self.providers_failed = sum(1 for report in self.providers if report.error)
+        self.providers_not_modified = sum(
+            1 for report in self.providers if report.not_modified
+        )
+        self.inserted = sum(report.inserted for report in self.providers)
+        self.updated = sum(report.updated for report in self.providers)
+        self.skipped = sum(report.skipped for report in self.providers)
@@ -5,9 +5,13 @@ from models.utils.custom_type import PyObjectId
 from pydantic import AnyUrl, BaseModel, Field
 
 
-class ViewerDescription(BaseModel):
-    datetime: datetime
+class RssFeedView(BaseModel):
+    """A subscriber viewing a rss feed, stored apart from the rss feed"""
+
+    id: PyObjectId = Field(default_factory=PyObjectId)
+    feed_id: PyObjectId
     viewer_id: PyObjectId
+    viewed_at: datetime = Field(default_factory=datetime.utcnow)
 
     class Config:
         allow_population_by_field_name = True
@@ -24,9 +28,28 @@ class RssFeed(BaseModel):
     description: str
     published_date: datetime
     provider_id: PyObjectId = Field(default_factory=PyObjectId)
-    viewers: List[ViewerDescription] = Field(default_factory=list)
+    view_count: int = 0
 
     class Config:
         allow_population_by_field_name = True
         arbitrary_types_allowed = True
         json_encoders = {ObjectId: str}
+
+
+class RssFeedSearchHit(RssFeed):
+    """Rss feed matching a search, with its relevance"""
+
+    score: float = 0
+
+
+class RssFeedIngestResult(BaseModel):
+    """Outcome of a bulk rss feed ingestion"""
+
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    inserted_ids: List[PyObjectId] = Field(default_factory=list)
+
+    class Config:
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
@@ -3,6 +3,19 @@ from models.utils.custom_type import PyObjectId
 from pydantic import AnyUrl, BaseModel, EmailStr, Field
 from datetime import datetime
 
+# kept by the feed scheduler between two fetches, never part of responses;
+# lease_token is the fencing token of the last scheduler lease that wrote them
+FETCH_STATE_FIELDS = frozenset(
+    {
+        "etag",
+        "last_modified",
+        "fetch_interval",
+        "min_fetch_interval",
+        "next_fetch_at",
+        "lease_token",
+    }
+)
+
 
 class RssProvider(BaseModel):
     """Model of RSS providers"""
@@ -13,8 +26,20 @@ class RssProvider(BaseModel):
     description: str
     image: AnyUrl
     last_feed_time: datetime = None
+    etag: str = None
+    last_modified: str = None
+    fetch_interval: int = None
+    min_fetch_interval: int = None
+    next_fetch_at: datetime = None
+    follower_count: int = 0
 
     class Config:
         allow_population_by_field_name = True
         arbitrary_types_allowed = True
         json_encoders = {ObjectId: str}
+
+
+class RssProviderSearchHit(RssProvider):
+    """Rss provider matching a search, with its relevance"""
+
+    score: float = 0
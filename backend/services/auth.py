@@ -1,5 +1,6 @@
 from typing import Union
-from services.utils.codec import PasswordCodec, TokenCodec
+from services.utils.codec import TokenCodec, password_codec
+from services.utils.principal_cache import PRINCIPAL_FIELDS, principal_cache
 from database.subscriber import DBSubscriber
 from models.subscriber import Subscriber
 from core.config import settings
@@ -17,7 +18,17 @@ class AuthService:
         """
         subscriber = await self.subscriber_db.get_by_email(email)
         if subscriber:
-            if PasswordCodec().verify(password, subscriber.password):
+            verified, new_hash = await password_codec.verify_and_update(
+                password, subscriber.password
+            )
+            if verified:
+                if new_hash:
+                    # hashed with other rounds than BCRYPT_ROUNDS
+                    await self.subscriber_db.set_fields(
+                        subscriber.id, password=new_hash
+                    )
+                    subscriber.password = new_hash
+                    await principal_cache.invalidate_subscriber(subscriber.id)
                 if subscriber.is_verified:
                     return subscriber
                 raise UnauthorizedException("Account is not verified")
@@ -47,6 +58,7 @@ class AuthService:
             subscriber_update = await self.subscriber_db.update(
                 subscriber.id, subscriber
             )
+            await principal_cache.invalidate_subscriber(subscriber.id)
             return subscriber_update
         raise Exception("Invalid token")
 
@@ -57,19 +69,28 @@ class AuthService:
         subscriber_dict = TokenCodec().decode(token)
         subscriber = await self.subscriber_db.get_by_email(subscriber_dict["email"])
         if subscriber:
-            subscriber.password = PasswordCodec().encode(password)
+            subscriber.password = await password_codec.hash(password)
             subscriber_update = await self.subscriber_db.update(
                 subscriber.id, subscriber
             )
+            await principal_cache.invalidate_subscriber(subscriber.id)
             return subscriber_update
         raise Exception("Invalid token")
 
     async def get_subscriber_by_token(self, token: str) -> Union[Subscriber, None]:
         """
-        Get user by token
+        Get user by token, served from the principal cache while the
+        token is valid and the subscriber unchanged. The subscriber is
+        read without its password hash.
         """
+        subscriber = await principal_cache.get(token)
+        if subscriber:
+            return subscriber
         subscriber_dict = TokenCodec().decode(token)
-        subscriber = await self.subscriber_db.get_by_email(subscriber_dict["email"])
+        subscriber = await self.subscriber_db.get_by_email(
+            subscriber_dict["email"], PRINCIPAL_FIELDS
+        )
         if subscriber:
+            await principal_cache.set(token, subscriber, subscriber_dict["exp"])
             return subscriber
         raise NotFoundException("User not found")
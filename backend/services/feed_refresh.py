@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, List, Union
+
+import aiohttp
+from pydantic import ValidationError
+
+from core.config import settings
+from database.feed_refresh_run import FeedRefreshRunDatabase
+from models.feed_refresh import ProviderRefreshReport, RefreshRunReport
+from models.rss_feed import RssFeed
+from models.rss_provider import RssProvider
+from services.rss_feed import RssFeedService
+from services.rss_provider import RssProviderService
+from services.timeline import TimelineService
+from services.utils.leader_lease import LeaseLostError
+from services.utils.refresh_policy import RefreshPolicy
+from services.utils.rss_utils import RSSUtils
+
+logger = logging.getLogger(__name__)
+
+TRANSIENT_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+
+class FeedRefreshPipeline:
+    """Refreshes the feeds of rss providers in stages
+
+    Each provider goes through fetch -> parse -> dedupe -> persist (which
+    also fans new rss feeds out to follower timelines), then is
+    scheduled for its next fetch by the refresh policy. At most
+    `concurrency` providers are in flight at once, a failing provider is
+    recorded in the run report without affecting the others, and fetches
+    failing on network errors are retried with exponential backoff.
+
+    Runs of the scheduler are fenced by its lease. `fence`, when given, is
+    awaited before the feeds of a provider are persisted and must confirm
+    against the database that the lease is still held. The fetch state is
+    written with the lease token of the run, and the write is rejected
+    once a newer leader wrote the same provider. Once a provider is fenced
+    off, the remaining ones are left for the new leader. Rss feeds that
+    slip through between the check and the write are upserted by link, so
+    the new leader storing them again does not duplicate them.
+    """
+
+    def __init__(
+        self,
+        db,
+        concurrency: int = None,
+        max_retries: int = None,
+        backoff_base: float = None,
+        fence: Callable[[], Awaitable[bool]] = None,
+    ):
+        self.db = db
+        self.fence = fence
+        self.concurrency = concurrency or settings.FEED_REFRESH_CONCURRENCY
+        self.max_retries = (
+            settings.FEED_REFRESH_MAX_RETRIES if max_retries is None else max_retries
+        )
+        self.backoff_base = (
+            settings.FEED_REFRESH_BACKOFF_BASE if backoff_base is None else backoff_base
+        )
+        self.rss_feed_service = RssFeedService(db)
+        self.rss_provider_service = RssProviderService(db)
+        self.timeline_service = TimelineService(db)
+        self.refresh_policy = RefreshPolicy()
+
+    async def fetch(
+        self, provider: RssProvider, report: ProviderRefreshReport
+    ) -> RSSUtils:
+        """Fetches the feed of a provider, retrying network failures"""
+        while True:
+            report.attempts += 1
+            try:
+                return await RSSUtils.async_init(
+                    provider.url, provider.etag, provider.last_modified
+                )
+            except Exception as e:
+                transient = isinstance(e.__cause__, TRANSIENT_ERRORS)
+                if not transient or report.attempts > self.max_retries:
+                    raise
+                delay = self.backoff_base * 2 ** (report.attempts - 1)
+                await asyncio.sleep(delay + random.uniform(0, self.backoff_base))
+
+    async def parse(
+        self,
+        provider: RssProvider,
+        rss_util: RSSUtils,
+        report: ProviderRefreshReport,
+    ) -> List[RssFeed]:
+        """Builds the feeds of a fetched provider, dropping invalid entries"""
+        rss_feeds = []
+        report.invalid = rss_util.rss_data.invalid
+        report.fetched = len(rss_util.rss_data.items) + report.invalid
+        for rss_item in await rss_util.get_rss_items():
+            try:
+                rss_feeds.append(RssFeed(**rss_item, provider_id=provider.id))
+            except ValidationError:
+                report.invalid += 1
+        return rss_feeds
+
+    def dedupe(self, provider: RssProvider, rss_feeds: List[RssFeed]) -> List[RssFeed]:
+        """Keeps feeds newer than the last stored one, once per link"""
+        if provider.last_feed_time:
+            rss_feeds = [
+                rss_feed
+                for rss_feed in rss_feeds
+                if rss_feed.published_date > provider.last_feed_time
+            ]
+        return list({rss_feed.link: rss_feed for rss_feed in rss_feeds}.values())
+
+    async def check_fence(self):
+        """Raises LeaseLostError if the run is no longer allowed to write"""
+        if self.fence is not None and not await self.fence():
+            raise LeaseLostError("Scheduler lease was lost")
+
+    async def persist(
+        self,
+        provider: RssProvider,
+        rss_util: RSSUtils,
+        rss_feeds: List[RssFeed],
+        report: ProviderRefreshReport,
+    ) -> dict:
+        """Stores new feeds, returning the fetch state to keep on the provider"""
+        fetch_state = {"etag": rss_util.etag, "last_modified": rss_util.last_modified}
+        if rss_feeds:
+            ingest_result = await self.rss_feed_service.ingest(rss_feeds)
+            report.inserted = ingest_result.inserted
+            report.updated = ingest_result.updated
+            report.skipped = ingest_result.skipped
+            await self.timeline_service.fan_out(
+                provider, rss_feeds, ingest_result.inserted_ids
+            )
+            latest_feed = max(rss_feeds, key=lambda rss_feed: rss_feed.published_date)
+            fetch_state["last_feed_time"] = latest_feed.published_date
+        return fetch_state
+
+    async def schedule(
+        self,
+        provider: RssProvider,
+        rss_util: Union[RSSUtils, None],
+        report: ProviderRefreshReport,
+    ) -> dict:
+        """Computes when the provider should be fetched next"""
+        min_fetch_interval = provider.min_fetch_interval
+        published_dates = None
+        if rss_util is not None:
+            hinted_interval = self.refresh_policy.hinted_interval(
+                **rss_util.get_refresh_hints()
+            )
+            min_fetch_interval = hinted_interval or min_fetch_interval
+            if not rss_util.not_modified:
+                published_dates = (
+                    await self.rss_feed_service.get_recent_published_dates(provider.id)
+                )
+
+        fetch_interval = self.refresh_policy.next_interval(
+            provider.fetch_interval,
+            published_dates,
+            min_fetch_interval,
+            not_modified=report.not_modified,
+            failed=report.error is not None,
+        )
+        return {
+            "fetch_interval": fetch_interval,
+            "min_fetch_interval": min_fetch_interval,
+            "next_fetch_at": self.refresh_policy.next_fetch_at(fetch_interval),
+        }
+
+    async def refresh_provider(
+        self, provider: RssProvider, lease_token: int = None
+    ) -> ProviderRefreshReport:
+        """Runs every stage for one provider, capturing any error in the report
+
+        Args:
+            provider (RssProvider): provider to refresh
+            lease_token (int): fencing token the fetch state is written with
+        """
+        report = ProviderRefreshReport(provider_id=provider.id, url=provider.url)
+        started_at = time.perf_counter()
+        rss_util, fetch_state = None, {}
+        try:
+            rss_util = await self.fetch(provider, report)
+            if rss_util.not_modified:
+                report.not_modified = True
+            else:
+                rss_feeds = await self.parse(provider, rss_util, report)
+                rss_feeds = self.dedupe(provider, rss_feeds)
+                await self.check_fence()
+                fetch_state = await self.persist(provider, rss_util, rss_feeds, report)
+        except LeaseLostError:
+            report.fenced = True
+        except Exception as e:
+            report.error = f"{type(e).__name__}: {e}"
+            logger.warning("refreshing %s failed: %s", provider.url, report.error)
+
+        # failed providers are rescheduled too, with a longer interval
+        if not report.fenced:
+            try:
+                fetch_state.update(await self.schedule(provider, rss_util, report))
+                await self.rss_provider_service.update_fetch_state(
+                    provider.id, lease_token, **fetch_state
+                )
+            except LeaseLostError:
+                report.fenced = True
+            except Exception as e:
+                report.error = report.error or f"{type(e).__name__}: {e}"
+                logger.warning("scheduling %s failed: %s", provider.url, e)
+        report.duration_ms = (time.perf_counter() - started_at) * 1000
+        return report
+
+    async def run(
+        self, providers: List[RssProvider], lease_token: int = None
+    ) -> RefreshRunReport:
+        """Refreshes providers through a bounded pool of workers
+
+        Args:
+            providers (List[RssProvider]): providers to refresh
+            lease_token (int): fencing token of the scheduler lease of the run
+
+        Returns:
+            RefreshRunReport: per provider outcome and totals of the run
+        """
+        run_report = RefreshRunReport(lease_token=lease_token)
+        queue: asyncio.Queue = asyncio.Queue()
+        for provider in providers:
+            queue.put_nowait(provider)
+
+        async def worker():
+            while True:
+                try:
+                    provider = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                report = await self.refresh_provider(provider, lease_token)
+                run_report.providers.append(report)
+                if report.fenced:
+                    run_report.fenced = True
+                    return
+
+        workers = min(self.concurrency, len(providers))
+        await asyncio.gather(*[worker() for _ in range(workers)])
+        run_report.finish()
+        await FeedRefreshRunDatabase(self.db).create(run_report)
+        return run_report
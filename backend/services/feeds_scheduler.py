@@ -1,9 +1,7 @@
-import asyncio
-from sched import scheduler
-from typing import List
-from functools import reduce
+import logging
+from datetime import datetime
 
-from apscheduler.executors.pool import ProcessPoolExecutor, ThreadPoolExecutor
+from apscheduler.executors.asyncio import AsyncIOExecutor
 from apscheduler.jobstores.mongodb import MongoDBJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from pymongo import MongoClient
@@ -11,11 +9,13 @@ from pytz import utc
 
 from core.config import settings
 from core.dependencies import get_database
+from models.feed_refresh import RefreshRunReport
 from models.rss_provider import RssProvider
-from models.rss_feed import RssFeed
+from services.feed_refresh import FeedRefreshPipeline
 from services.rss_provider import RssProviderService
-from services.rss_feed import RssFeedService
-from services.utils.rss_utils import RSSUtils
+from services.utils.leader_lease import LeaderLease
+
+logger = logging.getLogger(__name__)
 
 
 class FeedScheduler:
@@ -28,16 +28,17 @@ class FeedScheduler:
                 client=self.__client,
             )
         }
-        self.__executors = {
-            "default": ThreadPoolExecutor(20),
-            "processpool": ProcessPoolExecutor(5),
-        }
+        # jobs are coroutines, they must be awaited on the event loop
+        self.__executors = {"default": AsyncIOExecutor()}
         self.scheduler = AsyncIOScheduler(
             jobstores=self.__jobstores,
             executors=self.__executors,
             job_defaults={"coalesce": False, "max_instances": 3},
             timezone=utc,
         )
+        # only the worker holding this lease runs scheduled jobs
+        self.lease = LeaderLease("feed_scheduler")
+        self.__func = None
 
     @classmethod
     async def get_latest_provider_feeds(cls, provider: RssProvider = None):
@@ -47,54 +48,89 @@ class FeedScheduler:
             provider {RssProvider} -- The provider to get the latest feeds from
 
         Returns:
-            List[RssFeed] -- The latest feeds from the provider
+            ProviderRefreshReport -- The outcome of the refresh of the provider
         """
-        rss_util = await RSSUtils.async_init(provider.url)
-        rss_feeds = await rss_util.get_rss_items()
-        parsed_rss_feeds: List[RssFeed] = [
-            RssFeed(**feed, provider_id=provider.id) for feed in rss_feeds
-        ]
-        if provider.last_feed_time:
-            parsed_rss_feeds = [
-                feed
-                for feed in parsed_rss_feeds
-                if feed.published_date > provider.last_feed_time
-            ]
-
-        latest_feed = reduce(
-            lambda feed1, feed2: feed1
-            if feed1.published_date > feed2.published_date
-            else feed2,
-            parsed_rss_feeds,
-        )
-        await RssProviderService(get_database()).update_last_feed_time(
-            provider.id, latest_feed.published_date
-        )
-        rss_feeds_saved = await RssFeedService(get_database()).create_many(
-            parsed_rss_feeds
-        )
-        return rss_feeds_saved
+        return await FeedRefreshPipeline(get_database()).refresh_provider(provider)
 
     @classmethod
     async def job_init_func(cls):
-        """This initializes the job to run"""
-        providers = await RssProviderService(get_database()).list()
+        """This refreshes every provider at once"""
+        database = get_database()
+        providers = await RssProviderService(database).list()
         if providers:
-            results = await asyncio.gather(
-                *[cls.get_latest_provider_feeds(provider) for provider in providers]
+            report = await FeedRefreshPipeline(database).run(providers)
+            cls.log_report(report)
+
+    @classmethod
+    async def dispatch_due_providers(cls):
+        """This refreshes the providers whose next fetch is due
+
+        Every provider carries its own next_fetch_at, so fetches are spread
+        over time instead of all providers being refreshed together.
+        """
+        lease = feed_scheduler.lease
+        if not await lease.is_valid():
+            logger.warning("skipping feed dispatch, scheduler lease is not held")
+            return
+
+        database = get_database()
+        providers = await RssProviderService(database).list_due(
+            datetime.utcnow(), settings.FEED_DISPATCH_BATCH_SIZE
+        )
+        if providers:
+            report = await FeedRefreshPipeline(database, fence=lease.is_valid).run(
+                providers, lease_token=lease.token
             )
-            print("scheduled job is done running")
+            cls.log_report(report)
+
+    @staticmethod
+    def log_report(report: RefreshRunReport):
+        logger.info(
+            "feed refresh done in %.0fms: %d providers, %d failed, "
+            "%d not modified, %d new feeds",
+            report.duration_ms,
+            report.providers_total,
+            report.providers_failed,
+            report.providers_not_modified,
+            report.inserted,
+        )
 
     def start(self, func):
-        self.scheduler.start()
-        print("scheduler started")
-        if self.scheduler.get_job("feed_scheduler") is None:
-            self.scheduler.add_job(func, "interval", hours=1, id="feed_scheduler")
+        """Competes for the scheduler lease, jobs only run while it is held"""
+        self.__func = func
+        self.lease.start(on_acquired=self.__resume, on_lost=self.__pause)
+
+    def __resume(self):
+        if not self.scheduler.running:
+            self.scheduler.start()
+            print("scheduler started")
+            # replaced by the per provider dispatcher
+            if self.scheduler.get_job("feed_scheduler") is not None:
+                self.scheduler.remove_job("feed_scheduler")
+            self.scheduler.add_job(
+                self.__func,
+                "interval",
+                seconds=settings.FEED_DISPATCH_INTERVAL,
+                id="feed_dispatcher",
+                replace_existing=True,
+                coalesce=True,
+                max_instances=1,
+            )
             print("scheduled job added")
+        else:
+            self.scheduler.resume()
+            print("scheduler resumed")
+
+    def __pause(self):
+        if self.scheduler.running:
+            self.scheduler.pause()
+            print("scheduler paused")
 
-    def shutdown(self):
-        self.scheduler.shutdown()
-        print("scheduler shutdown")
+    async def shutdown(self):
+        await self.lease.stop()
+        if self.scheduler.running:
+            self.scheduler.shutdown()
+            print("scheduler shutdown")
 
 
 feed_scheduler = FeedScheduler()
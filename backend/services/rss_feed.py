@@ -1,8 +1,16 @@
-from typing import List
+from datetime import datetime
+from typing import AsyncIterator, List, Tuple, Union
 
+from pymongo.errors import DuplicateKeyError
+
+from database.feed_search_index import feed_search_index
 from database.rss_feed import RssFeedDatabase
-from models.rss_feed import RssFeed
+from models.rss_feed import RssFeed, RssFeedIngestResult, RssFeedSearchHit
+from services.utils.invalidation import RSS_FEEDS, invalidation_bus
+from services.utils.pagination import KeysetCursor
+from services.utils.timeline_cache import timeline_cache
 from core.exceptions import (
+    BadRequest,
     NotFoundException,
     DatabaseException,
     ExistingDataException,
@@ -14,18 +22,168 @@ class RssFeedService:
         self.db = db
         self.rss_feed_db = RssFeedDatabase(db)
 
-    async def list(self, **query) -> List[RssFeed]:
+    async def list(self, projection: List[str] = None, **query) -> List[RssFeed]:
         """Gets a list of all rss feeds
 
         Args:
+            projection (List[str]): fields of the rss feeds to read, all when None
             query (dict): values to be used for filtering
 
         Returns:
             List[RssFeed]: list of rss feeds
         """
-        rss_feeds = await self.rss_feed_db.list(**query)
+        rss_feeds = await self.rss_feed_db.list(projection, **query)
         return rss_feeds
 
+    async def list_page(
+        self,
+        limit: int,
+        after: Union[str, None] = None,
+        projection: List[str] = None,
+        **query,
+    ) -> Tuple[List[RssFeed], Union[str, None]]:
+        """Gets a page of rss feeds, newest first
+
+        Args:
+            limit (int): maximum number of rss feeds in the page
+            after (str): cursor returned with the previous page
+            projection (List[str]): fields of the rss feeds to read, all when None
+            query (dict): values to be used for filtering
+
+        Returns:
+            List[RssFeed]: list of rss feeds
+            str: cursor of the next page, None if this is the last page
+
+        Raises:
+            BadRequest: if the cursor is invalid
+        """
+        after_key = KeysetCursor.decode(after) if after else None
+        # the cursor is built from the last rss feed of the page
+        if projection is not None:
+            projection = [*projection, "published_date"]
+        rss_feeds, has_more = await self.rss_feed_db.list_page(
+            limit, after_key, projection, **query
+        )
+        next_cursor = None
+        if has_more:
+            last_feed = rss_feeds[-1]
+            next_cursor = KeysetCursor.encode(last_feed.published_date, last_feed.id)
+        return rss_feeds, next_cursor
+
+    async def list_page_documents(
+        self,
+        limit: int,
+        after: Union[str, None] = None,
+        projection: List[str] = None,
+        **query,
+    ) -> Tuple[List[dict], Union[str, None]]:
+        """Gets a page of rss feeds, newest first, as documents shaped like
+        RssFeed, for routes serializing them without models
+
+        Args:
+            limit (int): maximum number of rss feeds in the page
+            after (str): cursor returned with the previous page
+            projection (List[str]): fields of the rss feeds to read, all when None
+            query (dict): values to be used for filtering
+
+        Returns:
+            List[dict]: list of rss feed documents
+            str: cursor of the next page, None if this is the last page
+
+        Raises:
+            BadRequest: if the cursor is invalid
+        """
+        after_key = KeysetCursor.decode(after) if after else None
+        if projection is not None:
+            projection = [*projection, "published_date"]
+        rss_feeds, has_more = await self.rss_feed_db.list_page_documents(
+            limit, after_key, projection, **query
+        )
+        next_cursor = None
+        if has_more:
+            last_feed = rss_feeds[-1]
+            next_cursor = KeysetCursor.encode(
+                last_feed["published_date"], last_feed["id"]
+            )
+        return rss_feeds, next_cursor
+
+    def iterate(
+        self, after: Union[str, None] = None, projection: List[str] = None, **query
+    ) -> AsyncIterator[RssFeed]:
+        """Streams rss feeds, newest first, without loading them all in memory
+
+        Args:
+            after (str): cursor to resume after
+            projection (List[str]): fields of the rss feeds to read, all when None
+            query (dict): values to be used for filtering
+
+        Returns:
+            AsyncIterator[RssFeed]: rss feeds
+
+        Raises:
+            BadRequest: if the cursor is invalid
+        """
+        after_key = KeysetCursor.decode(after) if after else None
+        return self.rss_feed_db.iterate(after_key, projection, **query)
+
+    async def search(
+        self,
+        text: str,
+        limit: int,
+        offset: int = 0,
+        provider_id: str = None,
+        published_after: datetime = None,
+        published_before: datetime = None,
+        projection: List[str] = None,
+    ) -> Tuple[List[RssFeedSearchHit], Union[int, None]]:
+        """Searches rss feeds by title and description, most relevant first
+
+        Args:
+            text (str): words to search
+            limit (int): maximum number of rss feeds in the page
+            offset (int): number of rss feeds to skip
+            provider_id (str): only search the rss feeds of this provider
+            published_after (datetime): only search rss feeds published after
+            published_before (datetime): only search rss feeds published before
+            projection (List[str]): fields of the rss feeds to read, all when None
+
+        Returns:
+            List[RssFeedSearchHit]: matching rss feeds with their score
+            int: offset of the next page, None if this is the last page
+
+        Raises:
+            BadRequest: if there is nothing to search
+        """
+        if not text.strip():
+            raise BadRequest("Search text is empty")
+        if feed_search_index.enabled:
+            hits, has_more = await feed_search_index.search(
+                text, limit, offset, provider_id, published_after, published_before
+            )
+            rss_feeds = {
+                rss_feed.id: rss_feed
+                for rss_feed in await self.rss_feed_db.list_by_ids(
+                    [feed_id for feed_id, _ in hits], projection
+                )
+            }
+            # rss feeds deleted since they were indexed are left out
+            rss_feeds = [
+                RssFeedSearchHit.construct(**rss_feeds[feed_id].dict(), score=score)
+                for feed_id, score in hits
+                if feed_id in rss_feeds
+            ]
+        else:
+            rss_feeds, has_more = await self.rss_feed_db.search(
+                text,
+                limit,
+                offset,
+                provider_id,
+                published_after,
+                published_before,
+                projection,
+            )
+        return rss_feeds, offset + limit if has_more else None
+
     async def count(self, **query) -> int:
         """Gets the count of rss feeds
 
@@ -37,53 +195,73 @@ class RssFeedService:
         """
         return await self.rss_feed_db.count(**query)
 
-    async def get_by_id(self, id: str) -> RssFeed:
+    async def get_by_id(self, id: str, projection: List[str] = None) -> RssFeed:
         """
         Gets a rss feed by id
 
         Args:
             id (str): id of rss feed
+            projection (List[str]): fields of the rss feeds to read, all when None
 
         Returns:
             RssFeed: rss feed
             None: if no rss feed found
         """
-        rss_feed = await self.rss_feed_db.get_by_id(id)
+        rss_feed = await self.rss_feed_db.get_by_id(id, projection)
         if rss_feed:
             return rss_feed
         raise NotFoundException(f"Rss feed with id {id} not found")
 
-    async def get_by_url(self, url: str) -> RssFeed:
+    async def get_by_url(self, url: str, projection: List[str] = None) -> RssFeed:
         """
         Gets a rss feed by url
 
         Args:
             url (str): url of rss feed
+            projection (List[str]): fields of the rss feeds to read, all when None
 
         Returns:
             RssFeed: rss feed
         """
-        rss_feed = await self.rss_feed_db.get_by_url(url)
+        rss_feed = await self.rss_feed_db.get_by_url(url, projection)
         if rss_feed:
             return rss_feed
         raise NotFoundException(f"Rss feed with url {url} not found")
 
-    async def get_by_provider_id(self, url: str) -> RssFeed:
+    async def get_by_provider_id(
+        self, url: str, projection: List[str] = None
+    ) -> RssFeed:
         """
         Gets a rss feed by provider url
 
         Args:
             url (str): url of rss provider
+            projection (List[str]): fields of the rss feeds to read, all when None
 
         Returns:
             RssFeed: rss feed
             None: if no rss feed found
         """
-        rss_feed = await self.rss_feed_db.get_by_provider_id(url)
+        rss_feed = await self.rss_feed_db.get_by_provider_id(url, projection)
         if rss_feed:
             return rss_feed
         raise NotFoundException(f"Rss feed with url {url} not found")
 
+    async def get_recent_published_dates(
+        self, provider_id: str, limit: int = 20
+    ) -> List[datetime]:
+        """
+        Gets the publish dates of the most recent rss feeds of a provider
+
+        Args:
+            provider_id (str): id of rss provider
+            limit (int): maximum number of dates
+
+        Returns:
+            List[datetime]: publish dates, newest first
+        """
+        return await self.rss_feed_db.get_recent_published_dates(provider_id, limit)
+
     async def create(self, rss_feed: RssFeed) -> RssFeed:
         """
         Creates a rss feed
@@ -93,9 +271,18 @@ class RssFeedService:
 
         Returns:
             RssFeed: rss feed
+
+        Raises:
+            ExistingDataException: if a rss feed with the same url exists
         """
-        rss_feed = await self.rss_feed_db.create(rss_feed)
+        try:
+            rss_feed = await self.rss_feed_db.create(rss_feed)
+        except DuplicateKeyError:
+            raise ExistingDataException(
+                f"Rss feed with url {rss_feed.link} already exists"
+            )
         if rss_feed:
+            await invalidation_bus.publish(RSS_FEEDS)
             return rss_feed
         raise DatabaseException("Error creating rss feed")
 
@@ -111,9 +298,27 @@ class RssFeedService:
         """
         rss_feeds = await self.rss_feed_db.create_many(rss_feeds)
         if rss_feeds:
+            await invalidation_bus.publish(RSS_FEEDS)
             return rss_feeds
         raise DatabaseException("Error creating rss feeds")
 
+    async def ingest(self, rss_feeds: List[RssFeed]) -> RssFeedIngestResult:
+        """
+        Stores fetched rss feeds, deduplicated on their link
+
+        Args:
+            rss_feeds (List[RssFeed]): list of rss feeds
+
+        Returns:
+            RssFeedIngestResult: counts of inserted, updated and unchanged rss feeds
+        """
+        ingest_result = await self.rss_feed_db.upsert_many(rss_feeds)
+        if ingest_result.inserted or ingest_result.updated:
+            await invalidation_bus.publish(RSS_FEEDS)
+            for provider_id in {rss_feed.provider_id for rss_feed in rss_feeds}:
+                timeline_cache.invalidate_provider(provider_id)
+        return ingest_result
+
     async def update(self, id: str, rss_feed: RssFeed) -> RssFeed:
         """
         Updates a rss feed
@@ -124,16 +329,22 @@ class RssFeedService:
 
         Returns:
             RssFeed: rss feed
+
+        Raises:
+            NotFoundException: if rss feed not found
+            ExistingDataException: if another rss feed has the same url
         """
-        if await self.rss_feed_db.get_by_id(id) is not None:
-            if await self.rss_feed_db.get_by_url(rss_feed.link) is None:
-                rss_feed = await self.rss_feed_db.update(id, rss_feed)
-                if rss_feed:
-                    return rss_feed
+        # the unique link index settles conflicts, no lookup can race it
+        try:
+            updated = await self.rss_feed_db.update(id, rss_feed)
+        except DuplicateKeyError:
             raise ExistingDataException(
                 f"Rss feed with url {rss_feed.link} already exists"
             )
-        raise NotFoundException(f"Rss feed with id {id} not found")
+        if updated is None:
+            raise NotFoundException(f"Rss feed with id {id} not found")
+        await invalidation_bus.publish(RSS_FEEDS)
+        return updated
 
     async def delete(self, id: str) -> bool:
         """
@@ -143,11 +354,12 @@ class RssFeedService:
             id (str): id of rss feed
 
         Returns:
-            bool: True if rss feed deleted, False otherwise
+            bool: True if rss feed deleted
+
+        Raises:
+            NotFoundException: if rss feed not found
         """
-        if await self.rss_feed_db.get_by_id(id) is not None:
-            deleted = await self.rss_feed_db.delete(id)
-            if deleted:
-                return True
-            raise DatabaseException("Error deleting rss feed")
+        if await self.rss_feed_db.delete(id):
+            await invalidation_bus.publish(RSS_FEEDS)
+            return True
         raise NotFoundException(f"Rss feed with id {id} not found")
@@ -1,14 +1,19 @@
 from datetime import datetime
-from typing import List
+from typing import List, Tuple, Union
+
+from pymongo.errors import DuplicateKeyError
 
 from database.rss_provider import RssProviderDatabase
-from models.rss_provider import RssProvider
+from models.rss_provider import FETCH_STATE_FIELDS, RssProvider, RssProviderSearchHit
 
 from core.exceptions import (
+    BadRequest,
     DatabaseException,
     ExistingDataException,
     NotFoundException,
 )
+from services.utils.invalidation import RSS_PROVIDERS, invalidation_bus
+from services.utils.leader_lease import LeaseLostError
 from services.utils.rss_utils import RSSUtils
 
 
@@ -17,18 +22,47 @@ class RssProviderService:
         self.db = db
         self.rss_provider_db = RssProviderDatabase(db)
 
-    async def list(self, **query) -> List[RssProvider]:
+    async def list(self, projection: List[str] = None, **query) -> List[RssProvider]:
         """Gets a list of all rss providers
 
         Args:
+            projection (List[str]): fields of the rss providers to read, all when None
             query (dict): values to be used for filtering
 
         Returns:
             List[RssProvider]: list of rss providers
         """
-        rss_providers = await self.rss_provider_db.list(**query)
+        rss_providers = await self.rss_provider_db.list(projection, **query)
         return rss_providers
 
+    async def list_documents(self, projection: List[str] = None, **query) -> List[dict]:
+        """Gets a list of all rss providers as documents shaped like
+        RssProvider, for routes serializing them without models
+
+        Args:
+            projection (List[str]): fields of the rss providers to read, all when None
+            query (dict): values to be used for filtering
+
+        Returns:
+            List[dict]: list of rss provider documents
+        """
+        return await self.rss_provider_db.list_documents(projection, **query)
+
+    async def list_due(
+        self, now: datetime, limit: int, projection: List[str] = None
+    ) -> List[RssProvider]:
+        """Gets the rss providers whose next fetch is due
+
+        Args:
+            now (datetime): current time
+            limit (int): maximum number of rss providers
+            projection (List[str]): fields of the rss providers to read, all when None
+
+        Returns:
+            List[RssProvider]: list of rss providers, most overdue first
+        """
+        return await self.rss_provider_db.list_due(now, limit, projection)
+
     async def count(self, **query) -> int:
         """Gets the count of rss providers
 
@@ -40,35 +74,65 @@ class RssProviderService:
         """
         return await self.rss_provider_db.count(**query)
 
-    async def get_by_id(self, id: str) -> RssProvider:
+    async def get_by_id(self, id: str, projection: List[str] = None) -> RssProvider:
         """
         Gets a rss provider by id
 
         Args:
             id (str): id of rss provider
+            projection (List[str]): fields of the rss providers to read, all when None
 
         Returns:
             RssProvider: rss provider
             None: if no rss provider found
         """
-        rss_provider = await self.rss_provider_db.get_by_id(id)
+        rss_provider = await self.rss_provider_db.get_by_id(id, projection)
         if rss_provider:
             return rss_provider
         raise NotFoundException(f"Rss provider with id {id} not found")
 
-    async def search_by_name(self, name: str) -> List[RssProvider]:
+    async def search_by_name(
+        self, name: str, projection: List[str] = None
+    ) -> List[RssProvider]:
         """
         Searches for rss providers by name
 
         Args:
             name (str): name of rss provider
+            projection (List[str]): fields of the rss providers to read, all when None
 
         Returns:
             List[RssProvider]: list of rss providers
         """
-        rss_providers = await self.rss_provider_db.search_by_name(name)
+        rss_providers = await self.rss_provider_db.search_by_name(name, projection)
         return rss_providers
 
+    async def search(
+        self, text: str, limit: int, offset: int = 0, projection: List[str] = None
+    ) -> Tuple[List[RssProviderSearchHit], Union[int, None]]:
+        """
+        Searches rss providers by title and description, most relevant first
+
+        Args:
+            text (str): words to search
+            limit (int): maximum number of rss providers in the page
+            offset (int): number of rss providers to skip
+            projection (List[str]): fields of the rss providers to read, all when None
+
+        Returns:
+            List[RssProviderSearchHit]: matching rss providers with their score
+            int: offset of the next page, None if this is the last page
+
+        Raises:
+            BadRequest: if there is nothing to search
+        """
+        if not text.strip():
+            raise BadRequest("Search text is empty")
+        rss_providers, has_more = await self.rss_provider_db.search(
+            text, limit, offset, projection
+        )
+        return rss_providers, offset + limit if has_more else None
+
     async def create(self, url: str) -> RssProvider:
         """
         Creates a rss provider
@@ -79,15 +143,24 @@ class RssProviderService:
         Returns:
             RssProvider: rss provider
         """
-        rss_provider = await self.rss_provider_db.get_by_url(url)
+        rss_provider = await self.rss_provider_db.get_by_url(url, ["id"])
         if rss_provider is None:
             rss_util = await RSSUtils.async_init(url)
             rss_info = await rss_util.get_rss_info()
             print(rss_info)
 
+            # no validators are kept: the first scheduled refresh must get
+            # the full feed to store its items
             rss_provider = RssProvider(url=url, **rss_info)
-            rss_provider = await self.rss_provider_db.create(rss_provider)
+            try:
+                rss_provider = await self.rss_provider_db.create(rss_provider)
+            except DuplicateKeyError:
+                # created by another request while the feed was fetched
+                raise ExistingDataException(
+                    f"Rss provider with url '{url}' already exists"
+                )
             if rss_provider:
+                await invalidation_bus.publish(RSS_PROVIDERS)
                 return rss_provider
             raise DatabaseException("Error creating rss provider")
         raise ExistingDataException(f"Rss provider with url '{url}' already exists")
@@ -102,17 +175,26 @@ class RssProviderService:
 
         Returns:
             RssProvider: rss provider
+
+        Raises:
+            NotFoundException: if rss provider not found
+            ExistingDataException: if another rss provider has the url
         """
-        rss_provider = await self.rss_provider_db.get_by_id(id)
-        if rss_provider:
-            rss_provider.url = url
-            rss_provider = await self.rss_provider_db.update(rss_provider)
-            return rss_provider
-        raise NotFoundException(f"Rss provider with id {id} not found")
+        # the fetch state belongs to the previous url, the provider is
+        # fetched again from scratch on the next dispatch
+        fetch_state = dict.fromkeys(FETCH_STATE_FIELDS - {"lease_token"})
+        try:
+            rss_provider = await self.rss_provider_db.update_fields(
+                id, url=url, last_feed_time=None, **fetch_state
+            )
+        except DuplicateKeyError:
+            raise ExistingDataException(f"Rss provider with url '{url}' already exists")
+        if rss_provider is None:
+            raise NotFoundException(f"Rss provider with id {id} not found")
+        await invalidation_bus.publish(RSS_PROVIDERS)
+        return rss_provider
 
-    async def update_last_feed_time(
-        self, id: str, last_feed_time: datetime
-    ) -> RssProvider:
+    async def update_last_feed_time(self, id: str, last_feed_time: datetime) -> bool:
         """
         Updates last feed time of rss provider
 
@@ -121,16 +203,41 @@ class RssProviderService:
             last_feed_time (datetime): last feed time of rss provider
 
         Returns:
-            RssProvider: rss provider
+            bool: True if rss provider was updated
         """
-        rss_provider = await self.rss_provider_db.get_by_id(id)
-        if rss_provider:
-            rss_provider.last_feed_time = last_feed_time
-            rss_provider = await self.rss_provider_db.update(rss_provider)
-            return rss_provider
+        return await self.update_fetch_state(id, last_feed_time=last_feed_time)
+
+    async def update_fetch_state(
+        self, id: str, lease_token: int = None, **fetch_state
+    ) -> bool:
+        """
+        Updates the state kept between two fetches of a rss provider, such as
+        its last feed time and the ETag and Last-Modified validators
+
+        Args:
+            id (str): id of rss provider
+            lease_token (int): fencing token of the scheduler lease writing it
+            fetch_state (dict): values of the fetch state fields to set
+
+        Returns:
+            bool: True if rss provider was updated
+
+        Raises:
+            NotFoundException: if the rss provider does not exist
+            LeaseLostError: if a newer scheduler lease wrote the state since
+        """
+        if await self.rss_provider_db.set_fields(id, lease_token, **fetch_state):
+            # a poll that found nothing new changes nothing responses show
+            if not fetch_state.keys() <= FETCH_STATE_FIELDS:
+                await invalidation_bus.publish(RSS_PROVIDERS)
+            return True
+        if lease_token is not None and await self.rss_provider_db.get_by_id(id, ["id"]):
+            raise LeaseLostError(
+                f"Rss provider with id {id} was refreshed under a newer lease"
+            )
         raise NotFoundException(f"Rss provider with id {id} not found")
 
-    async def delete(self, id: str) -> RssProvider:
+    async def delete(self, id: str) -> bool:
         """
         Deletes a rss provider
 
@@ -138,12 +245,12 @@ class RssProviderService:
             id (str): id of rss provider
 
         Returns:
-            RssProvider: rss provider
+            bool: True if rss provider deleted
+
+        Raises:
+            NotFoundException: if rss provider not found
         """
-        rss_provider = await self.rss_provider_db.get_by_id(id)
-        if rss_provider:
-            result = await self.rss_provider_db.delete(rss_provider)
-            if result:
-                return rss_provider
-            raise DatabaseException("Error deleting rss provider")
+        if await self.rss_provider_db.delete(id):
+            await invalidation_bus.publish(RSS_PROVIDERS)
+            return True
         raise NotFoundException(f"Rss provider with id {id} not found")
@@ -1,9 +1,14 @@
 from typing import List
 
+from pymongo.errors import DuplicateKeyError
+
 from database.subscriber import DBSubscriber
 from database.rss_provider import RssProviderDatabase
 from models.subscriber import Subscriber
-from .utils.codec import PasswordCodec
+from .utils.codec import password_codec
+from .utils.principal_cache import principal_cache
+from .timeline import TimelineService
+from .utils.timeline_cache import timeline_cache
 from core.exceptions import (
     DatabaseException,
     ExistingDataException,
@@ -16,16 +21,17 @@ class SubscriberService:
         self.database = database
         self.subscriber_db = DBSubscriber(self.database)
 
-    async def list(self, **query) -> List[Subscriber]:
+    async def list(self, projection: List[str] = None, **query) -> List[Subscriber]:
         """Gets a list of all subscrubers
 
         Args:
+            projection (List[str]): fields of the subscribers to read, all when None
             query (dict): values to be used for filtering
 
         Returns:
             List[Subscriber]: list of subscribers
         """
-        subscribers = await self.subscriber_db.list(**query)
+        subscribers = await self.subscriber_db.list(projection, **query)
         return subscribers
 
     async def count(self, **query) -> int:
@@ -39,11 +45,12 @@ class SubscriberService:
         """
         return await self.subscriber_db.count(**query)
 
-    async def get_by_email(self, email) -> Subscriber:
+    async def get_by_email(self, email, projection: List[str] = None) -> Subscriber:
         """Gets a subscriber by email
 
         Args:
             email (str): email of subscriber
+            projection (List[str]): fields of the subscribers to read, all when None
 
         Returns:
             Subscriber: subscriber
@@ -52,16 +59,17 @@ class SubscriberService:
         Raises:
             NotFoundException: if subscriber not found
         """
-        subscriber = await self.subscriber_db.get_by_email(email)
+        subscriber = await self.subscriber_db.get_by_email(email, projection)
         if subscriber:
             return subscriber
         raise NotFoundException(f"Subscriber with email {email} not found")
 
-    async def get_by_id(self, id: str) -> Subscriber:
+    async def get_by_id(self, id: str, projection: List[str] = None) -> Subscriber:
         """Gets a subscriber by id
 
         Args:
             id (str): id of subscriber
+            projection (List[str]): fields of the subscribers to read, all when None
 
         Returns:
             Subscriber: subscriber
@@ -69,7 +77,7 @@ class SubscriberService:
         Raises:
             NotFoundException: if subscriber not found
         """
-        subscriber = await self.subscriber_db.get_by_id(id)
+        subscriber = await self.subscriber_db.get_by_id(id, projection)
         if subscriber:
             return subscriber
         raise NotFoundException(f"Subscriber with id {id} not found")
@@ -87,22 +95,25 @@ class SubscriberService:
             ExistingDataException: if subscriber with email already exists
             DatabaseException: if failed to create subscriber
         """
-        email_search = await self.subscriber_db.get_by_email(subscriber.email)
-        if email_search:
-            if email_search.is_verified:
+        # hash user password
+        subscriber.password = await password_codec.hash(subscriber.password)
+
+        try:
+            created = await self.subscriber_db.create(subscriber)
+        except DuplicateKeyError:
+            # only a conflicting sign up pays for the lookup
+            email_search = await self.subscriber_db.get_by_email(
+                subscriber.email, ["is_verified"]
+            )
+            if email_search is None or email_search.is_verified:
                 raise ExistingDataException(
                     f"Subscriber with email {subscriber.email} already exists"
                 )
             raise ExistingDataException(
                 f"Subscriber with email {subscriber.email} has not verified email"
             )
-
-        # hash user password
-        subscriber.password = PasswordCodec().hash(subscriber.password)
-
-        subscriber = await self.subscriber_db.create(subscriber)
-        if subscriber:
-            return subscriber
+        if created:
+            return created
         raise DatabaseException("Failed to create subscriber")
 
     async def update(self, id: str, subscriber: Subscriber) -> Subscriber:
@@ -116,24 +127,18 @@ class SubscriberService:
 
         Raises:
             NotFoundException: if subscriber not found
-            DatabaseException: if failed to update subscriber
             ExistingDataException: if subscriber with email already exists
         """
-        db_subscriber = await self.subscriber_db.get_by_id(id)
-        if db_subscriber is None:
-            raise NotFoundException(f"Subscriber with id {subscriber.id} not found")
-
-        email_search = await self.subscriber_db.get_by_email(subscriber.email)
-        if (email_search and email_search.id == subscriber.id) or (
-            email_search is None
-        ):
-            subscriber = await self.subscriber_db.update(id, subscriber)
-            if subscriber:
-                return Subscriber(**subscriber)
-            raise DatabaseException("Failed to update subscriber")
-        raise ExistingDataException(
-            f"Subscriber with email {subscriber.email} already exists"
-        )
+        try:
+            updated = await self.subscriber_db.update(id, subscriber)
+        except DuplicateKeyError:
+            raise ExistingDataException(
+                f"Subscriber with email {subscriber.email} already exists"
+            )
+        if updated is None:
+            raise NotFoundException(f"Subscriber with id {id} not found")
+        await principal_cache.invalidate_subscriber(id)
+        return updated
 
     async def delete(self, id: str) -> bool:
         """Deletes a subscriber by id
@@ -142,66 +147,89 @@ class SubscriberService:
             id (str): id of subscriber
 
         Returns:
-            bool: True if deleted, False if not
+            bool: True if deleted
 
         Raises:
             NotFoundException: if subscriber not found
-            DatabaseException: if failed to delete subscriber
         """
-        db_subscriber = await self.subscriber_db.get_by_id(id)
+        # deleted and read at once, only the request that deleted the
+        # subscriber takes its follows back
+        db_subscriber = await self.subscriber_db.delete_and_get(
+            id, ["subscribed_providers"]
+        )
         if db_subscriber is None:
             raise NotFoundException(f"Subscriber with id {id} not found")
-        result = await self.subscriber_db.delete(id)
-        if result:
-            return True
-        raise DatabaseException("Failed to delete subscriber")
+        await TimelineService(self.database).delete(db_subscriber)
+        await principal_cache.invalidate_subscriber(id)
+        timeline_cache.invalidate_subscriber(id)
+        return True
 
-    async def provider_follow(self, id: str, provider_id: str) -> bool:
+    async def provider_follow(self, id: str, provider_id: str) -> Subscriber:
         """Follows a provider
 
+        The follow is a single conditional update, the follower count of the
+        provider only moves when it changed the followed providers.
+
         Args:
             id (str): id of subscriber
             provider_id (str): id of provider
-        """
-        db_subscriber = await self.subscriber_db.get_by_id(id)
-        if db_subscriber is None:
-            raise NotFoundException(f"Subscriber with id {id} not found")
 
-        provider = await RssProviderDatabase(self.database).get_by_id(provider_id)
+        Returns:
+            Subscriber: subscriber, as updated
+
+        Raises:
+            NotFoundException: if subscriber or provider not found
+            ExistingDataException: if the provider is already followed
+        """
+        provider = await RssProviderDatabase(self.database).get_by_id(
+            provider_id, ["follower_count"]
+        )
         if provider is None:
             raise NotFoundException(f"Provider with id {provider_id} not found")
 
-        subscriber_providers = db_subscriber.subscribed_providers
-        if provider_id in subscriber_providers:
+        subscriber = await self.subscriber_db.follow(id, provider.id)
+        if subscriber is None:
+            if await self.subscriber_db.get_by_id(id, ["id"]) is None:
+                raise NotFoundException(f"Subscriber with id {id} not found")
             raise ExistingDataException(
                 f"Subscriber with id {id} already follows provider with id {provider_id}"
             )
-        subscriber_providers.append(provider_id)
-        db_subscriber.subscribed_providers = subscriber_providers
-        result = await self.subscriber_db.update(id, db_subscriber)
-        return result
+        await TimelineService(self.database).follow(id, provider)
+        await principal_cache.invalidate_subscriber(id)
+        timeline_cache.invalidate_subscriber(id)
+        return subscriber
 
-    async def provider_unfollow(self, id: str, provider_id: str) -> bool:
+    async def provider_unfollow(self, id: str, provider_id: str) -> Subscriber:
         """Unfollows a provider
 
+        The unfollow is a single conditional update, the follower count of
+        the provider only moves when it changed the followed providers.
+
         Args:
             id (str): id of subscriber
             provider_id (str): id of provider
-        """
-        db_subscriber = await self.subscriber_db.get_by_id(id)
-        if db_subscriber is None:
-            raise NotFoundException(f"Subscriber with id {id} not found")
 
-        provider = await RssProviderDatabase(self.database).get_by_id(provider_id)
+        Returns:
+            Subscriber: subscriber, as updated
+
+        Raises:
+            NotFoundException: if subscriber or provider not found, or the
+                provider is not followed
+        """
+        provider = await RssProviderDatabase(self.database).get_by_id(
+            provider_id, ["follower_count"]
+        )
         if provider is None:
             raise NotFoundException(f"Provider with id {provider_id} not found")
 
-        subscriber_providers = db_subscriber.subscribed_providers
-        if provider_id not in subscriber_providers:
+        subscriber = await self.subscriber_db.unfollow(id, provider.id)
+        if subscriber is None:
+            if await self.subscriber_db.get_by_id(id, ["id"]) is None:
+                raise NotFoundException(f"Subscriber with id {id} not found")
             raise NotFoundException(
                 f"Subscriber with id {id} does not follow provider with id {provider_id}"
             )
-        subscriber_providers.remove(provider_id)
-        db_subscriber.subscribed_providers = subscriber_providers
-        result = await self.subscriber_db.update(id, db_subscriber)
-        return result
+        await TimelineService(self.database).unfollow(id, provider)
+        await principal_cache.invalidate_subscriber(id)
+        timeline_cache.invalidate_subscriber(id)
+        return subscriber
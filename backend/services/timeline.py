@@ -0,0 +1,314 @@
+"""
+Subscriber timelines, read from the rss feeds of the followed providers
+(fan-in) or, with TIMELINE_FANOUT_ENABLED, from a materialized inbox per
+subscriber filled at ingestion (fan-out)
+
+Rebuild follower counts and drop every inbox, from backend/, with:
+
+    python -m services.timeline --rebuild
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from typing import List, Tuple, Union
+
+from bson import ObjectId
+
+from core.config import settings
+from core.database import database_client
+from database.rss_feed import RssFeedDatabase
+from database.rss_provider import RssProviderDatabase
+from database.subscriber import DBSubscriber
+from database.timeline_inbox import TimelineInboxDatabase
+from models.rss_feed import RssFeed
+from models.rss_provider import RssProvider
+from models.subscriber import Subscriber
+from services.utils.pagination import KeysetCursor
+from services.utils.timeline_cache import timeline_cache
+
+
+def _sort_key(item) -> tuple:
+    if isinstance(item, RssFeed):
+        return item.published_date, item.id
+    return item["published_date"], item["feed_id"]
+
+
+class TimelineService:
+    """Builds the timeline of a subscriber from the providers they follow
+
+    With fan-out enabled, new rss feeds of ordinary providers are pushed to
+    the inbox of each follower at ingestion, so a timeline page costs one
+    inbox read plus one `_id` lookup whatever the number of followed
+    providers. Providers with more than TIMELINE_FANOUT_MAX_FOLLOWERS
+    followers are not pushed, they would turn one ingestion into that many
+    writes; their rss feeds are read at request time and merged in.
+
+    The inbox entries a provider left there before it became popular are
+    skipped. When it stops being popular, its recent rss feeds are pushed
+    to the inboxes of its followers, and it is read at request time until
+    that backfill is done.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.rss_feed_db = RssFeedDatabase(db)
+        self.rss_provider_db = RssProviderDatabase(db)
+        self.subscriber_db = DBSubscriber(db)
+        self.inbox_db = TimelineInboxDatabase(db)
+
+    @staticmethod
+    def _is_popular(rss_provider: RssProvider) -> bool:
+        return (rss_provider.follower_count or 0) > (
+            settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+        )
+
+    async def get_page(
+        self, subscriber: Subscriber, limit: int, after: Union[str, None] = None
+    ) -> Tuple[List[RssFeed], Union[str, None]]:
+        """Gets a page of the rss feeds of the providers a subscriber follows,
+        newest first
+
+        Args:
+            subscriber (Subscriber): subscriber
+            limit (int): maximum number of rss feeds in the page
+            after (str): cursor returned with the previous page
+
+        Returns:
+            List[RssFeed]: list of rss feeds
+            str: cursor of the next page, None if this is the last page
+
+        Raises:
+            BadRequest: if the cursor is invalid
+        """
+        page = timeline_cache.get(subscriber.id, limit, after)
+        if page is not None:
+            return page
+
+        provider_ids = subscriber.subscribed_providers
+        if not provider_ids:
+            return [], None
+        after_key = KeysetCursor.decode(after) if after else None
+        if settings.TIMELINE_FANOUT_ENABLED:
+            rss_feeds, has_more = await self._read_inbox(subscriber, limit, after_key)
+        else:
+            rss_feeds, has_more = await self.rss_feed_db.list_timeline(
+                provider_ids, limit, after_key
+            )
+        next_cursor = None
+        if has_more:
+            last_feed = rss_feeds[-1]
+            next_cursor = KeysetCursor.encode(last_feed.published_date, last_feed.id)
+
+        page = (rss_feeds, next_cursor)
+        timeline_cache.set(subscriber.id, provider_ids, limit, after, page)
+        return page
+
+    async def _read_inbox(
+        self,
+        subscriber: Subscriber,
+        limit: int,
+        after: Union[Tuple[datetime, ObjectId], None],
+    ) -> Tuple[List[RssFeed], bool]:
+        """Reads a timeline page from the inbox, merged with the rss feeds of
+        the popular providers the subscriber follows"""
+        provider_ids = subscriber.subscribed_providers
+        popular_ids = await self.rss_provider_db.list_popular_ids(
+            provider_ids, settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+        )
+        ordinary_ids = [
+            provider_id
+            for provider_id in provider_ids
+            if provider_id not in popular_ids
+        ]
+
+        entries = []
+        if ordinary_ids:
+            inbox = await self.inbox_db.get_page(
+                subscriber.id, limit + 1, after, popular_ids
+            )
+            if inbox is None:
+                entries = await self.build_inbox(subscriber.id, ordinary_ids)
+                inbox_size = len(entries)
+                if after is not None:
+                    entries = [entry for entry in entries if _sort_key(entry) < after]
+                entries = entries[: limit + 1]
+            else:
+                entries, inbox_size = inbox
+            if len(entries) <= limit and inbox_size >= settings.TIMELINE_INBOX_SIZE:
+                # the page runs past the capped inbox, older rss feeds
+                # are only in the rss feeds collection
+                return await self.rss_feed_db.list_timeline(provider_ids, limit, after)
+
+        rss_feeds = await self.rss_feed_db.list_by_ids(
+            [entry["feed_id"] for entry in entries]
+        )
+        has_more = len(entries) > limit
+        if popular_ids:
+            popular_feeds, popular_has_more = await self.rss_feed_db.list_timeline(
+                popular_ids, limit, after
+            )
+            rss_feeds += popular_feeds
+            has_more = has_more or popular_has_more
+
+        # an rss feed both pushed and read at request time is listed once
+        rss_feeds = list({rss_feed.id: rss_feed for rss_feed in rss_feeds}.values())
+        rss_feeds.sort(key=_sort_key, reverse=True)
+        has_more = has_more or len(rss_feeds) > limit
+        return rss_feeds[:limit], has_more
+
+    async def build_inbox(
+        self, subscriber_id: str, provider_ids: List[ObjectId]
+    ) -> List[dict]:
+        """Builds the inbox of a subscriber from the most recent rss feeds of
+        the providers they follow
+
+        Args:
+            subscriber_id (str): id of subscriber
+            provider_ids (List[ObjectId]): ids of the providers to fan out
+
+        Returns:
+            List[dict]: inbox entries, newest first
+        """
+        provider_entries = await asyncio.gather(
+            *[
+                self.rss_feed_db.get_recent_inbox_entries(
+                    provider_id, settings.TIMELINE_INBOX_SIZE
+                )
+                for provider_id in provider_ids
+            ]
+        )
+        entries = [entry for entries in provider_entries for entry in entries]
+        entries.sort(key=_sort_key, reverse=True)
+        entries = entries[: settings.TIMELINE_INBOX_SIZE]
+        await self.inbox_db.create(subscriber_id, entries)
+        return entries
+
+    async def fan_out(
+        self,
+        rss_provider: RssProvider,
+        rss_feeds: List[RssFeed],
+        inserted_ids: List[ObjectId],
+    ) -> int:
+        """Pushes newly stored rss feeds of a provider to its followers
+
+        Args:
+            rss_provider (RssProvider): rss provider
+            rss_feeds (List[RssFeed]): ingested rss feeds
+            inserted_ids (List[ObjectId]): ids of the rss feeds that were new
+
+        Returns:
+            int: number of inboxes updated
+        """
+        if not settings.TIMELINE_FANOUT_ENABLED or self._is_popular(rss_provider):
+            return 0
+        inserted_ids = set(inserted_ids)
+        entries = [
+            {
+                "published_date": rss_feed.published_date,
+                "feed_id": rss_feed.id,
+                "provider_id": rss_provider.id,
+            }
+            for rss_feed in rss_feeds
+            if rss_feed.id in inserted_ids
+        ]
+        if not entries:
+            return 0
+        follower_ids = await self.subscriber_db.list_follower_ids(rss_provider.id)
+        return await self.inbox_db.push(follower_ids, entries)
+
+    async def follow(self, subscriber_id: str, rss_provider: RssProvider):
+        """Counts a new follower and backfills their inbox with the most
+        recent rss feeds of the provider"""
+        await self.rss_provider_db.add_followers(rss_provider.id, 1)
+        if settings.TIMELINE_FANOUT_ENABLED and not self._is_popular(rss_provider):
+            entries = await self.rss_feed_db.get_recent_inbox_entries(
+                rss_provider.id, settings.TIMELINE_INBOX_SIZE
+            )
+            await self.inbox_db.push([ObjectId(subscriber_id)], entries)
+
+    async def unfollow(self, subscriber_id: str, rss_provider: RssProvider):
+        """Counts a lost follower and trims the provider from their inbox"""
+        await self._lose_follower(rss_provider.id)
+        if settings.TIMELINE_FANOUT_ENABLED:
+            await self.inbox_db.pull_provider(subscriber_id, rss_provider.id)
+
+    async def delete(self, subscriber: Subscriber):
+        """Forgets the follows and the inbox of a deleted subscriber"""
+        await self.inbox_db.delete(subscriber.id)
+        for provider_id in subscriber.subscribed_providers:
+            await self._lose_follower(provider_id)
+
+    async def _lose_follower(self, provider_id: ObjectId):
+        follower_count = await self.rss_provider_db.add_followers(provider_id, -1)
+        # only the unfollow bringing the count down to the limit sees it
+        if (
+            settings.TIMELINE_FANOUT_ENABLED
+            and follower_count == settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+        ):
+            await self.backfill(provider_id)
+
+    async def backfill(self, provider_id: ObjectId) -> int:
+        """Pushes the recent rss feeds of a provider that stopped being
+        popular to the inboxes of its followers
+
+        Its followers read it at request time until every inbox is done;
+        its older entries are pulled first, so the backfill can run again.
+
+        Args:
+            provider_id (ObjectId): id of rss provider
+
+        Returns:
+            int: number of inboxes updated
+        """
+        await self.rss_provider_db.set_inbox_backfill(provider_id, True)
+        entries = await self.rss_feed_db.get_recent_inbox_entries(
+            provider_id, settings.TIMELINE_INBOX_SIZE
+        )
+        follower_ids = await self.subscriber_db.list_follower_ids(provider_id)
+        await self.inbox_db.pull_provider_many(follower_ids, provider_id)
+        updated = await self.inbox_db.push(follower_ids, entries)
+        await self.rss_provider_db.set_inbox_backfill(provider_id, False)
+        return updated
+
+    async def rebuild(self) -> Tuple[int, int]:
+        """Recounts the followers of every provider and drops every inbox,
+        inboxes are then rebuilt on the next read of each subscriber
+
+        Returns:
+            int: number of providers with followers
+            int: number of inboxes dropped
+        """
+        follower_counts = await self.subscriber_db.count_followers()
+        # inboxes are rebuilt from scratch, no backfill is left pending
+        await self.rss_provider_db.collection.update_many(
+            {}, {"$set": {"follower_count": 0, "inbox_backfill": False}}
+        )
+        for provider_id, follower_count in follower_counts.items():
+            await self.rss_provider_db.set_fields(
+                provider_id, follower_count=follower_count
+            )
+        return len(follower_counts), await self.inbox_db.delete_all()
+
+
+async def main() -> int:
+    try:
+        providers, inboxes = await TimelineService(
+            database_client.get_database()
+        ).rebuild()
+    finally:
+        database_client.close()
+    print(f"recounted followers of {providers} providers, dropped {inboxes} inboxes")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Timeline maintenance")
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="recount provider followers and drop every inbox",
+    )
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.error("nothing to do, pass --rebuild")
+    raise SystemExit(asyncio.run(main()))
@@ -1,20 +1,88 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import Tuple, Union
+
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 
 from core.config import settings
-from core.exceptions import BadRequest
+from core.exceptions import BadRequest, TooManyRequestsException
 
 
 class PasswordCodec:
-    def __init__(self):
-        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    """Hashes and verifies passwords with bcrypt off the event loop
+
+    A bcrypt call holds the CPU for hundreds of milliseconds, so hashing
+    runs in a dedicated pool of BCRYPT_THREADS threads (bcrypt releases the
+    GIL). At most BCRYPT_MAX_PENDING calls may be running or queued; past
+    that TooManyRequestsException is raised instead of letting logins pile
+    up behind each other.
+    """
+
+    def __init__(
+        self, rounds: int = None, threads: int = None, max_pending: int = None
+    ):
+        self.rounds = rounds or settings.BCRYPT_ROUNDS
+        self.threads = threads or settings.BCRYPT_THREADS
+        self.max_pending = max_pending or settings.BCRYPT_MAX_PENDING
+        self.pwd_context = CryptContext(
+            schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=self.rounds
+        )
+        self.executor: Union[ThreadPoolExecutor, None] = None
+        self.pending = 0
+        self.rejected = 0
+
+    async def _run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise TooManyRequestsException("Too many password checks in progress")
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.threads, thread_name_prefix="bcrypt"
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self.pwd_context.verify, password, hashed_password)
+
+    async def verify_and_update(
+        self, password: str, hashed_password: str
+    ) -> Tuple[bool, Union[str, None]]:
+        """Verifies a password, rehashing it when it was hashed with
+        other rounds than BCRYPT_ROUNDS
+
+        Returns:
+            tuple: whether the password matches, new hash to store or None
+        """
+        return await self._run(
+            self.pwd_context.verify_and_update, password, hashed_password
+        )
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def stats(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "threads": self.threads,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+        }
 
-    def hash(self, password):
-        return self.pwd_context.hash(password)
 
-    def verify(self, password, hashed_password):
-        return self.pwd_context.verify(password, hashed_password)
+password_codec = PasswordCodec()
 
 
 class TokenCodec:
@@ -0,0 +1,125 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timezone
+from typing import List, Tuple, Union
+
+import feedparser
+from dateutil import parser
+
+from core.config import settings
+
+# (title, link, description, published_date)
+FeedItem = Tuple[str, str, str, object]
+
+
+def _parse_date(value: str):
+    """Parses a feed date into a naive UTC datetime, as stored in the database"""
+    published_date = parser.parse(value)
+    if published_date.tzinfo is not None:
+        published_date = published_date.astimezone(timezone.utc).replace(tzinfo=None)
+    return published_date
+
+
+def _parse_int(value) -> Union[int, None]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_feed(body: bytes) -> Tuple[dict, List[FeedItem], int, dict]:
+    """Parses a raw feed document
+
+    Runs in a worker process, so it only takes and returns plain picklable
+    values: the feed information, the item tuples, the number of entries
+    dropped for missing fields or unparsable dates and the refresh hints
+    (RSS ttl, sy:updatePeriod and sy:updateFrequency) of the publisher.
+    """
+    rss_data = feedparser.parse(body)
+    feed = rss_data.feed
+    info = {
+        "title": feed.get("title"),
+        "link": feed.get("link"),
+        "description": feed.get("description"),
+        "image": feed.get("image", {}).get("url"),
+    }
+
+    items, invalid = [], 0
+    for entry in rss_data.entries:
+        try:
+            items.append(
+                (
+                    entry.title,
+                    entry.link,
+                    entry.description,
+                    _parse_date(entry.published),
+                )
+            )
+        except (AttributeError, ValueError, OverflowError):
+            invalid += 1
+
+    hints = {
+        "ttl": _parse_int(feed.get("ttl")),
+        "update_period": (feed.get("sy_updateperiod") or "").strip().lower() or None,
+        "update_frequency": _parse_int(feed.get("sy_updatefrequency")),
+    }
+    return info, items, invalid, hints
+
+
+class ParsedFeed:
+    """Feed information and compact items of a parsed feed document"""
+
+    def __init__(self, info: dict, items: List[FeedItem], invalid: int, hints: dict):
+        self.info = info
+        self.items = items
+        self.invalid = invalid
+        self.hints = hints
+
+
+class FeedParserPool:
+    """Parses feed documents in a dedicated pool of processes
+
+    feedparser and dateutil are CPU bound, running them in other processes
+    keeps the event loop free to serve requests during a refresh. With
+    FEED_PARSER_PROCESSES set to 0 documents are parsed in the calling
+    process.
+    """
+
+    def __init__(self):
+        self.executor: Union[ProcessPoolExecutor, None] = None
+
+    def start(self) -> Union[ProcessPoolExecutor, None]:
+        """Creates the process pool if it does not exist yet"""
+        if self.executor is None and settings.FEED_PARSER_PROCESSES > 0:
+            # spawn instead of fork, forking a process running an event loop
+            # and database threads is not safe
+            self.executor = ProcessPoolExecutor(
+                max_workers=settings.FEED_PARSER_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self.executor
+
+    def shutdown(self):
+        """Stops the worker processes"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def parse(self, body: bytes) -> ParsedFeed:
+        """Parses a raw feed document
+
+        Args:
+            body (bytes): raw feed document
+
+        Returns:
+            ParsedFeed: feed information and items
+        """
+        executor = self.start()
+        if executor is None:
+            return ParsedFeed(*parse_feed(body))
+        loop = asyncio.get_running_loop()
+        return ParsedFeed(*await loop.run_in_executor(executor, parse_feed, body))
+
+
+feed_parser_pool = FeedParserPool()
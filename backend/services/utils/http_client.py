@@ -0,0 +1,151 @@
+import time
+from typing import Union
+
+import aiohttp
+from multidict import CIMultiDictProxy
+
+from core.cache import TTLCache
+from core.config import settings
+
+try:
+    import brotli  # noqa: F401 - aiohttp decodes br bodies when available
+
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+
+class FetchResponse:
+    """Body and metadata of a fetched url"""
+
+    def __init__(self, status: int, body: bytes, headers: CIMultiDictProxy):
+        self.status = status
+        self.body = body
+        self.headers = headers
+
+
+class FetchMetrics:
+    """Latency and transfer counters of the fetches of one url"""
+
+    def __init__(self):
+        self.fetches = 0
+        self.errors = 0
+        self.not_modified = 0
+        self.total_ms = 0.0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self.total_bytes = 0
+        self.last_bytes = 0
+        self.last_status = None
+
+    def record(self, elapsed_ms: float, status: int = None, size: int = 0):
+        self.fetches += 1
+        self.total_ms += elapsed_ms
+        self.last_ms = elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.last_status = status
+        if status is None:
+            self.errors += 1
+        elif status == 304:
+            self.not_modified += 1
+        self.total_bytes += size
+        self.last_bytes = size
+
+    def dict(self) -> dict:
+        return {
+            "fetches": self.fetches,
+            "errors": self.errors,
+            "not_modified": self.not_modified,
+            "average_ms": round(self.total_ms / self.fetches, 3)
+            if self.fetches
+            else 0.0,
+            "last_ms": round(self.last_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+            "total_bytes": self.total_bytes,
+            "last_bytes": self.last_bytes,
+            "last_status": self.last_status,
+        }
+
+
+class FeedFetcher:
+    """Long lived HTTP client used to fetch rss feeds
+
+    A single session is shared by every fetch of the process, so
+    connections and DNS lookups are reused between providers and runs.
+    Metrics are kept for the FEED_FETCH_METRICS_SIZE most recently fetched
+    urls, and dropped for urls not fetched for FEED_FETCH_METRICS_TTL
+    seconds.
+    """
+
+    def __init__(self):
+        self.session: Union[aiohttp.ClientSession, None] = None
+        self.metrics = TTLCache(
+            settings.FEED_FETCH_METRICS_SIZE, settings.FEED_FETCH_METRICS_TTL
+        )
+
+    async def start(self) -> aiohttp.ClientSession:
+        """Creates the shared session if it does not exist yet"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=settings.FEED_FETCH_MAX_CONNECTIONS,
+                limit_per_host=settings.FEED_FETCH_MAX_CONNECTIONS_PER_HOST,
+                use_dns_cache=True,
+                ttl_dns_cache=settings.FEED_FETCH_DNS_CACHE_TTL,
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=settings.FEED_FETCH_TOTAL_TIMEOUT,
+                connect=settings.FEED_FETCH_CONNECT_TIMEOUT,
+                sock_read=settings.FEED_FETCH_READ_TIMEOUT,
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=timeout,
+                headers={
+                    "Accept-Encoding": ACCEPT_ENCODING,
+                    "User-Agent": settings.FEED_FETCH_USER_AGENT,
+                },
+            )
+        return self.session
+
+    async def close(self):
+        """Closes the shared session and its connections"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def fetch(self, url: str, headers: dict = None) -> FetchResponse:
+        """Gets a url, recording its latency and size
+
+        Args:
+            url (str): url to fetch
+            headers (dict): extra request headers
+
+        Returns:
+            FetchResponse: status, body and headers of the response
+
+        Raises:
+            aiohttp.ClientError: if the request fails
+            asyncio.TimeoutError: if the request times out
+        """
+        session = await self.start()
+        metrics = self.metrics.get(url) or FetchMetrics()
+        # storing the metrics again keeps the url from expiring
+        self.metrics.set(url, metrics)
+        started_at = time.perf_counter()
+        try:
+            async with session.get(url, headers=headers) as response:
+                body = await response.read()
+        except Exception:
+            metrics.record((time.perf_counter() - started_at) * 1000)
+            raise
+        metrics.record(
+            (time.perf_counter() - started_at) * 1000, response.status, len(body)
+        )
+        return FetchResponse(response.status, body, response.headers)
+
+    def stats(self) -> dict:
+        """Returns the fetch metrics of the urls fetched recently"""
+        return {url: metrics.dict() for url, metrics in self.metrics.items()}
+
+
+feed_fetcher = FeedFetcher()
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import Awaitable, Callable, List, Union
+
+from core.config import settings
+from core.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+RSS_FEEDS = "rss_feeds"
+RSS_PROVIDERS = "rss_providers"
+
+# delay before subscribing again after losing the redis connection
+RECONNECT_DELAY = 1
+
+
+class InvalidationBus:
+    """Tells every worker that cached reads of a namespace are stale
+
+    Handlers registered with `add_handler` drop what a worker holds in
+    memory, they are called right away in the publishing worker. When
+    REDIS_URL is set, the event is also published on INVALIDATION_CHANNEL
+    so the other workers call theirs; events a worker missed while
+    disconnected from Redis are replaced by invalidating everything once
+    it subscribes again. Hooks registered with `add_publish_hook` drop
+    shared state, such as Redis cache entries, and only run in the
+    publishing worker.
+    """
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self._handlers: List[Callable[[Union[str, None]], None]] = []
+        self._publish_hooks: List[Callable[[str], Awaitable[None]]] = []
+        self._task: Union[asyncio.Task, None] = None
+        self.published = 0
+        self.received = 0
+        self.errors = 0
+
+    def add_handler(self, handler: Callable[[Union[str, None]], None]):
+        """Registers a callable invalidating a namespace, or every
+        namespace when called with None"""
+        self._handlers.append(handler)
+
+    def add_publish_hook(self, hook: Callable[[str], Awaitable[None]]):
+        """Registers a coroutine function invalidating the shared state of a
+        namespace, awaited once by the publishing worker"""
+        self._publish_hooks.append(hook)
+
+    def _dispatch(self, namespace: Union[str, None]):
+        for handler in self._handlers:
+            handler(namespace)
+
+    async def publish(self, *namespaces: str):
+        """Invalidates namespaces in this worker and the others"""
+        for namespace in namespaces:
+            self._dispatch(namespace)
+            for hook in self._publish_hooks:
+                await hook(namespace)
+        redis = redis_client.get()
+        if redis is None:
+            return
+        try:
+            for namespace in namespaces:
+                await redis.publish(
+                    settings.INVALIDATION_CHANNEL,
+                    json.dumps({"origin": self.origin, "namespace": namespace}),
+                )
+                self.published += 1
+        except Exception as e:
+            self.errors += 1
+            logger.warning("publishing invalidation failed: %s", e)
+
+    async def _listen(self):
+        redis = redis_client.get()
+        while True:
+            try:
+                async with redis.pubsub() as pubsub:
+                    await pubsub.subscribe(settings.INVALIDATION_CHANNEL)
+                    # whatever was published while unsubscribed is lost
+                    self._dispatch(None)
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        event = json.loads(message["data"])
+                        if event["origin"] != self.origin:
+                            self.received += 1
+                            self._dispatch(event["namespace"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning("listening to invalidations failed: %s", e)
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    def start(self):
+        """Listens to the invalidations of the other workers, if Redis is set"""
+        if self._task is None and redis_client.get() is not None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "listening": self._task is not None,
+            "published": self.published,
+            "received": self.received,
+            "errors": self.errors,
+        }
+
+
+invalidation_bus = InvalidationBus()
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Union
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from core.config import settings
+from core.database import database_client
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLostError(Exception):
+    """Raised when a write is fenced off because the lease was lost"""
+
+
+class LeaderLease:
+    """Mongo backed lease electing one leader across workers and hosts
+
+    The lease is a document holding its owner, an expiry and a fencing
+    token. The owner renews the expiry every `renew_interval` seconds; once
+    it stops (crash, hang, lost database), any other process takes the
+    lease over as soon as it expires, incrementing the token. A holder that
+    cannot renew steps down on its own when its local copy of the expiry
+    passes, so two leaders never act on the same token.
+    """
+
+    def __init__(self, name: str, ttl: int = None, renew_interval: int = None):
+        self.name = name
+        self.ttl = ttl or settings.SCHEDULER_LEASE_TTL
+        self.renew_interval = renew_interval or settings.SCHEDULER_LEASE_RENEW_INTERVAL
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.token: Union[int, None] = None
+        self.expires_at: Union[datetime, None] = None
+        self._task: Union[asyncio.Task, None] = None
+
+    @property
+    def collection(self):
+        return database_client.get_database()[settings.SCHEDULER_LEASE_COLLECTION]
+
+    @property
+    def is_leader(self) -> bool:
+        """True while this process holds an unexpired lease"""
+        return (
+            self.token is not None
+            and self.expires_at is not None
+            and datetime.utcnow() < self.expires_at
+        )
+
+    def _step_down(self):
+        self.token = None
+        self.expires_at = None
+
+    async def try_acquire(self) -> bool:
+        """Renews the lease when held, otherwise takes it if free or expired
+
+        Returns:
+            bool: True if this process holds the lease
+        """
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+
+        if self.token is not None:
+            lease = await self.collection.find_one_and_update(
+                {"_id": self.name, "owner": self.owner, "token": self.token},
+                {"$set": {"expires_at": expires_at, "renewed_at": now}},
+            )
+            if lease:
+                self.expires_at = expires_at
+                return True
+            self._step_down()
+
+        try:
+            lease = await self.collection.find_one_and_update(
+                {
+                    "_id": self.name,
+                    "$or": [{"expires_at": {"$lt": now}}, {"owner": None}],
+                },
+                {
+                    "$set": {
+                        "owner": self.owner,
+                        "expires_at": expires_at,
+                        "acquired_at": now,
+                        "renewed_at": now,
+                    },
+                    "$inc": {"token": 1},
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # the lease exists and is held by another process
+            return False
+        self.token = lease["token"]
+        self.expires_at = expires_at
+        return True
+
+    async def release(self):
+        """Gives the lease up so another process can take it at once"""
+        if self.token is None:
+            return
+        await self.collection.update_one(
+            {"_id": self.name, "owner": self.owner, "token": self.token},
+            {"$set": {"owner": None, "expires_at": datetime.utcnow()}},
+        )
+        self._step_down()
+
+    async def is_valid(self) -> bool:
+        """Checks against the database that the lease is still ours"""
+        if not self.is_leader:
+            return False
+        return (
+            await self.collection.count_documents(
+                {
+                    "_id": self.name,
+                    "owner": self.owner,
+                    "token": self.token,
+                    "expires_at": {"$gt": datetime.utcnow()},
+                }
+            )
+            > 0
+        )
+
+    async def _run(self, on_acquired: Callable, on_lost: Callable):
+        was_leader = False
+        while True:
+            try:
+                await self.try_acquire()
+            except Exception as e:
+                logger.warning("renewing lease %s failed: %s", self.name, e)
+                if not self.is_leader:
+                    self._step_down()
+
+            if self.is_leader and not was_leader:
+                logger.info("acquired lease %s, token %s", self.name, self.token)
+                on_acquired()
+            elif was_leader and not self.is_leader:
+                logger.info("lost lease %s", self.name)
+                on_lost()
+            was_leader = self.is_leader
+            await asyncio.sleep(self.renew_interval)
+
+    def start(self, on_acquired: Callable, on_lost: Callable):
+        """Competes for the lease in the background
+
+        Args:
+            on_acquired (Callable): called when this process becomes leader
+            on_lost (Callable): called when this process stops being leader
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(on_acquired, on_lost))
+
+    async def stop(self):
+        """Stops competing for the lease and releases it"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.release()
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "owner": self.owner,
+            "is_leader": self.is_leader,
+            "token": self.token,
+            "expires_at": self.expires_at,
+        }
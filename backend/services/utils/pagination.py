@@ -0,0 +1,31 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from core.exceptions import BadRequest
+
+
+class KeysetCursor:
+    """Encodes and decodes opaque keyset pagination cursors
+
+    A cursor points at the last item of a page through its
+    (published_date, _id) sort key.
+    """
+
+    @staticmethod
+    def encode(published_date: datetime, id: ObjectId) -> str:
+        raw = f"{published_date.isoformat()}|{id}".encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    @staticmethod
+    def decode(cursor: str) -> Tuple[datetime, ObjectId]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            published_date, id = raw.split("|")
+            return datetime.fromisoformat(published_date), ObjectId(id)
+        except (binascii.Error, UnicodeDecodeError, ValueError, InvalidId) as e:
+            raise BadRequest("Invalid pagination cursor") from e
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import time
+from typing import Dict, Set, Union
+
+from core.cache import TTLCache
+from core.config import settings
+from core.redis import redis_client
+from models.subscriber import Subscriber
+from services.utils.invalidation import invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+REDIS_PREFIX = "principal:"
+# invalidation bus namespace of the cached tokens of a subscriber
+NAMESPACE_PREFIX = "principals:"
+
+# the password hash is not needed to authorize a request, it is never cached
+PRINCIPAL_FIELDS = [name for name in Subscriber.__fields__ if name != "password"]
+
+
+class PrincipalCache:
+    """Caches the subscriber behind an access token
+
+    Entries are keyed by a digest of the token and never outlive the
+    token's `exp`. The in-process tier is an LRU with a short TTL; when
+    REDIS_URL is set a shared Redis tier is consulted on local misses, and
+    its entries expire with the token too. Changing a subscriber must go
+    through `invalidate_subscriber`, which reaches every worker through the
+    invalidation bus.
+
+    Cached subscribers only hold PRINCIPAL_FIELDS, their password hash is
+    left out of both tiers.
+    """
+
+    def __init__(self):
+        self.local = TTLCache(
+            settings.PRINCIPAL_CACHE_SIZE,
+            settings.PRINCIPAL_CACHE_TTL,
+            on_evict=self._forget,
+        )
+        self._keys_by_subscriber: Dict[str, Set[str]] = {}
+        self.redis_hits = 0
+        self.redis_misses = 0
+        invalidation_bus.add_handler(self.invalidate_local)
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    async def get(self, token: str) -> Union[Subscriber, None]:
+        """Gets the cached subscriber of a token"""
+        key = self.key(token)
+        subscriber = self.local.get(key)
+        if subscriber is not None:
+            return subscriber.copy()
+
+        redis = redis_client.get()
+        if redis is None:
+            return None
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.get(REDIS_PREFIX + key)
+                pipe.ttl(REDIS_PREFIX + key)
+                cached, ttl = await pipe.execute()
+        except Exception as e:
+            logger.warning("reading principal cache from redis failed: %s", e)
+            return None
+        # the redis entry expires with the token, ttl is what is left of it
+        if cached is None or ttl <= 0:
+            self.redis_misses += 1
+            return None
+        self.redis_hits += 1
+        # validated with a placeholder for the password, then left out again
+        subscriber = Subscriber.parse_obj({**json.loads(cached), "password": ""}).copy(
+            exclude={"password"}
+        )
+        self._set_local(key, subscriber, ttl)
+        return subscriber.copy()
+
+    async def set(self, token: str, subscriber: Subscriber, expires_at: float):
+        """Caches the subscriber of a token until at most its expiry
+
+        Args:
+            token (str): access token
+            subscriber (Subscriber): subscriber the token belongs to
+            expires_at (float): `exp` claim of the token, as a timestamp
+        """
+        ttl = int(expires_at - time.time())
+        if ttl <= 0:
+            return
+        key = self.key(token)
+        subscriber = subscriber.copy(exclude={"password"})
+        self._set_local(key, subscriber, ttl)
+
+        redis = redis_client.get()
+        if redis is None:
+            return
+        subscriber_id = str(subscriber.id)
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.set(REDIS_PREFIX + key, subscriber.json(), ex=ttl)
+                pipe.sadd(f"{REDIS_PREFIX}subscriber:{subscriber_id}", key)
+                pipe.expire(
+                    f"{REDIS_PREFIX}subscriber:{subscriber_id}",
+                    settings.AUTH_EXP_TIME * 60,
+                )
+                await pipe.execute()
+        except Exception as e:
+            logger.warning("writing principal cache to redis failed: %s", e)
+
+    def _set_local(self, key: str, subscriber: Subscriber, ttl: float):
+        self.local.set(key, subscriber.copy(), ttl)
+        self._keys_by_subscriber.setdefault(str(subscriber.id), set()).add(key)
+
+    def _forget(self, key: str, subscriber: Subscriber):
+        subscriber_id = str(subscriber.id)
+        keys = self._keys_by_subscriber.get(subscriber_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_subscriber[subscriber_id]
+
+    def invalidate_local(self, namespace: Union[str, None]):
+        """Drops the cached tokens of the subscriber of a namespace in this
+        worker, or every cached token when namespace is None"""
+        if namespace is None:
+            self.local.clear()
+            self._keys_by_subscriber.clear()
+        elif namespace.startswith(NAMESPACE_PREFIX):
+            subscriber_id = namespace[len(NAMESPACE_PREFIX) :]
+            for key in self._keys_by_subscriber.pop(subscriber_id, set()):
+                self.local.delete(key)
+
+    async def invalidate_subscriber(self, subscriber_id: str):
+        """Drops every cached token of a subscriber, in every worker"""
+        subscriber_id = str(subscriber_id)
+        redis = redis_client.get()
+        if redis is not None:
+            # dropped first, so no worker copies them back from redis
+            index_key = f"{REDIS_PREFIX}subscriber:{subscriber_id}"
+            try:
+                keys = await redis.smembers(index_key)
+                await redis.delete(
+                    index_key, *[REDIS_PREFIX + key.decode() for key in keys]
+                )
+            except Exception as e:
+                logger.warning("invalidating principal cache in redis failed: %s", e)
+        await invalidation_bus.publish(NAMESPACE_PREFIX + subscriber_id)
+
+    def stats(self) -> dict:
+        return {
+            "local": self.local.stats(),
+            "redis_enabled": redis_client.enabled,
+            "redis_hits": self.redis_hits,
+            "redis_misses": self.redis_misses,
+        }
+
+
+principal_cache = PrincipalCache()
@@ -0,0 +1,155 @@
+import random
+import re
+from datetime import datetime, timedelta
+from statistics import median
+from typing import List, Union
+
+from core.config import settings
+
+SYNDICATION_PERIODS = {
+    "hourly": 3600,
+    "daily": 86400,
+    "weekly": 604800,
+    "monthly": 2592000,
+    "yearly": 31536000,
+}
+
+MAX_AGE_PATTERN = re.compile(r"max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+def parse_max_age(cache_control: Union[str, None]) -> Union[int, None]:
+    """Gets the max-age in seconds of a Cache-Control header"""
+    if not cache_control:
+        return None
+    match = MAX_AGE_PATTERN.search(cache_control)
+    return int(match.group(1)) if match else None
+
+
+class RefreshPolicy:
+    """Decides how long to wait before fetching a provider again
+
+    The interval follows the observed publish rate of the provider: it
+    moves toward half the typical gap between two publications, grows when
+    the feed did not change or the fetch failed, and never goes below what
+    the publisher asks for through Cache-Control max-age, the RSS `ttl` or
+    the `sy:updatePeriod`/`sy:updateFrequency` syndication hints.
+    """
+
+    # weight of the latest observation against the previous interval
+    SMOOTHING = 0.5
+    BACKOFF_NOT_MODIFIED = 1.25
+    BACKOFF_FAILED = 2
+
+    def __init__(
+        self,
+        min_interval: int = None,
+        max_interval: int = None,
+        default_interval: int = None,
+        jitter: float = None,
+    ):
+        self.min_interval = min_interval or settings.FEED_REFRESH_MIN_INTERVAL
+        self.max_interval = max_interval or settings.FEED_REFRESH_MAX_INTERVAL
+        self.default_interval = (
+            default_interval or settings.FEED_REFRESH_DEFAULT_INTERVAL
+        )
+        self.jitter = settings.FEED_REFRESH_JITTER if jitter is None else jitter
+
+    @staticmethod
+    def hinted_interval(
+        max_age: int = None,
+        ttl: int = None,
+        update_period: str = None,
+        update_frequency: int = None,
+    ) -> Union[int, None]:
+        """Gets the interval the publisher asks to be polled at: the longest
+        of its hints, so polling respects every one of them
+
+        Args:
+            max_age (int): Cache-Control max-age in seconds
+            ttl (int): RSS ttl in minutes
+            update_period (str): sy:updatePeriod
+            update_frequency (int): sy:updateFrequency
+
+        Returns:
+            int: interval in seconds, None without hints
+        """
+        hints = []
+        if max_age:
+            hints.append(max_age)
+        if ttl:
+            hints.append(ttl * 60)
+        if update_period in SYNDICATION_PERIODS:
+            hints.append(SYNDICATION_PERIODS[update_period] // (update_frequency or 1))
+        return max(hints) if hints else None
+
+    @staticmethod
+    def publish_gap(
+        published_dates: List[datetime], now: datetime = None
+    ) -> Union[float, None]:
+        """Estimates the time between two publications of a provider
+
+        The median gap between consecutive publications is used, raised to
+        half the age of the newest one so feeds that went quiet slow down.
+
+        Args:
+            published_dates (List[datetime]): recent publish dates, any order
+
+        Returns:
+            float: gap in seconds, None without enough history
+        """
+        if not published_dates:
+            return None
+        now = now or datetime.utcnow()
+        published_dates = sorted(published_dates, reverse=True)
+        gaps = [
+            (newer - older).total_seconds()
+            for newer, older in zip(published_dates, published_dates[1:])
+        ]
+        age = (now - published_dates[0]).total_seconds()
+        if not gaps:
+            return max(age, 0) or None
+        return max(median(gaps), age / 2)
+
+    def next_interval(
+        self,
+        previous_interval: int = None,
+        published_dates: List[datetime] = None,
+        min_interval: int = None,
+        not_modified: bool = False,
+        failed: bool = False,
+    ) -> int:
+        """Computes the interval before the next fetch of a provider
+
+        Args:
+            previous_interval (int): interval used for the last fetch
+            published_dates (List[datetime]): recent publish dates of the provider
+            min_interval (int): interval hinted by the publisher
+            not_modified (bool): the last fetch returned 304
+            failed (bool): the last fetch failed
+
+        Returns:
+            int: interval in seconds
+        """
+        interval = previous_interval or self.default_interval
+        if failed:
+            interval *= self.BACKOFF_FAILED
+        elif not_modified:
+            interval *= self.BACKOFF_NOT_MODIFIED
+        else:
+            publish_gap = self.publish_gap(published_dates or [])
+            if publish_gap is None:
+                interval *= self.BACKOFF_NOT_MODIFIED
+            else:
+                # poll about twice per publication
+                target = publish_gap / 2
+                interval = (1 - self.SMOOTHING) * interval + self.SMOOTHING * target
+
+        lower = max(self.min_interval, min_interval or 0)
+        return int(min(max(interval, lower), self.max_interval))
+
+    def next_fetch_at(self, interval: int, now: datetime = None) -> datetime:
+        """Gets the time of the next fetch, spread by jitter so providers
+        with the same interval do not all fire together"""
+        now = now or datetime.utcnow()
+        spread = random.uniform(1 - self.jitter, 1 + self.jitter)
+        return now + timedelta(seconds=interval * spread)
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Tuple, Type, Union
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pydantic import parse_raw_as
+
+from core.cache import TTLCache
+from core.config import settings
+from core.redis import redis_client
+from services.utils.invalidation import invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+REDIS_PREFIX = "response:"
+MISSING = object()
+
+
+class ResponseCache:
+    """Caches the results of read-heavy queries per namespace
+
+    The in-process tier is an LRU with a RESPONSE_CACHE_TTL time to live;
+    when REDIS_URL is set a shared Redis tier is consulted on local misses.
+    Concurrent misses of the same key in a worker share a single load
+    instead of all querying the database.
+
+    Writes publish the namespace they touch on the invalidation bus, which
+    drops it here in every worker and in Redis. A load that started before
+    an invalidation of its namespace is returned but not cached in this
+    worker. Routes also put their ETag in the key, which changes with the
+    version of the collections read, so a result missed by an invalidation
+    is never served under a newer ETag.
+    """
+
+    def __init__(self):
+        self.local = TTLCache(settings.RESPONSE_CACHE_SIZE, settings.RESPONSE_CACHE_TTL)
+        self._generations: Dict[str, int] = {}
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self.coalesced = 0
+        self.redis_hits = 0
+        self.redis_misses = 0
+        invalidation_bus.add_handler(self.invalidate_local)
+        invalidation_bus.add_publish_hook(self.invalidate_shared)
+
+    @staticmethod
+    def _redis_key(namespace: str, key: Tuple) -> str:
+        return f"{REDIS_PREFIX}{namespace}:" + ":".join(map(str, key))
+
+    async def get_or_load(
+        self,
+        namespace: str,
+        key: Tuple,
+        loader: Callable[[], Awaitable[Any]],
+        type_: Type,
+    ) -> Any:
+        """Gets a cached result, loading it once on a miss
+
+        Args:
+            namespace (str): namespace invalidated by writes the result
+                depends on
+            key (tuple): key of the result in the namespace
+            loader (Callable): coroutine function loading the result
+            type_ (Type): type of the result, to read it back from Redis
+
+        Returns:
+            Any: the result, shared with other callers, not to be modified
+        """
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return await loader()
+        cache_key = (namespace,) + tuple(key)
+        value = self.local.get(cache_key, MISSING)
+        if value is not MISSING:
+            return value
+
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        generation = self._generations.get(namespace, 0)
+        try:
+            value = await self._load(namespace, key, loader, type_, generation)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # the caller raises it, waiters are optional
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            if self._generations.get(namespace, 0) == generation:
+                self.local.set(cache_key, value)
+            return value
+        finally:
+            del self._inflight[cache_key]
+
+    async def _load(self, namespace, key, loader, type_, generation: int) -> Any:
+        redis = redis_client.get()
+        if redis is None:
+            return await loader()
+
+        redis_key = self._redis_key(namespace, key)
+        try:
+            cached = await redis.get(redis_key)
+        except Exception as e:
+            logger.warning("reading response cache from redis failed: %s", e)
+            cached = None
+        if cached is not None:
+            self.redis_hits += 1
+            return parse_raw_as(type_, cached)
+        self.redis_misses += 1
+
+        value = await loader()
+        if self._generations.get(namespace, 0) != generation:
+            return value
+        encoded = json.dumps(jsonable_encoder(value, custom_encoder={ObjectId: str}))
+        keys = f"{REDIS_PREFIX}keys:{namespace}"
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.set(redis_key, encoded, ex=settings.RESPONSE_CACHE_TTL)
+                pipe.sadd(keys, redis_key)
+                pipe.expire(keys, settings.RESPONSE_CACHE_TTL)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning("writing response cache to redis failed: %s", e)
+        return value
+
+    def invalidate_local(self, namespace: Union[str, None]):
+        """Drops the results of a namespace cached in this worker, or every
+        result when namespace is None
+
+        Namespaces this cache never loaded, such as those of other caches
+        sharing the invalidation bus, are left alone.
+        """
+        namespaces = (
+            {key[0] for key in self.local.keys()}
+            | {key[0] for key in self._inflight}
+            | set(self._generations)
+        )
+        if namespace is not None:
+            namespaces &= {namespace}
+        for name in namespaces:
+            self._generations[name] = self._generations.get(name, 0) + 1
+        for key in self.local.keys():
+            if key[0] in namespaces:
+                self.local.delete(key)
+
+    async def invalidate_shared(self, namespace: str):
+        """Drops the results of a namespace cached in Redis"""
+        redis = redis_client.get()
+        if redis is None:
+            return
+        keys = f"{REDIS_PREFIX}keys:{namespace}"
+        try:
+            redis_keys = await redis.smembers(keys)
+            await redis.delete(keys, *redis_keys)
+        except Exception as e:
+            logger.warning("invalidating response cache in redis failed: %s", e)
+
+    def stats(self) -> dict:
+        return {
+            **self.local.stats(),
+            "inflight": len(self._inflight),
+            "coalesced": self.coalesced,
+            "redis_hits": self.redis_hits,
+            "redis_misses": self.redis_misses,
+            "invalidations": invalidation_bus.stats(),
+        }
+
+
+response_cache = ResponseCache()
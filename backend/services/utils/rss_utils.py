@@ -1,56 +1,99 @@
+import asyncio
+
 import aiohttp
-import feedparser
 from core.exceptions import BadRequest
-from dateutil import parser
+from services.utils.feed_parser import feed_parser_pool
+from services.utils.http_client import feed_fetcher
+from services.utils.refresh_policy import parse_max_age
 
 
 class RSSUtils:
     """Provides util functions for reading rss feeds"""
 
     @classmethod
-    async def __get_rss_data(cls, url):
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    response = await response.text()
-                    rss_data = feedparser.parse(response)
-                    return rss_data
-                raise BadRequest("RSS url is not accessible")
+    async def __get_rss_data(cls, url, etag=None, last_modified=None):
+        """Fetches the feed, conditionally when validators of a previous
+        fetch are given
+
+        Returns:
+            tuple: parsed feed (None when not modified), ETag, Last-Modified,
+                Cache-Control max-age
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        try:
+            response = await feed_fetcher.fetch(url, headers=headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise BadRequest("RSS url is not accessible") from e
+
+        max_age = parse_max_age(response.headers.get("Cache-Control"))
+        if response.status == 304:
+            return None, etag, last_modified, max_age
+        if response.status == 200:
+            rss_data = await feed_parser_pool.parse(response.body)
+            return (
+                rss_data,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                max_age,
+            )
+        raise BadRequest("RSS url is not accessible")
 
     def __init__(self):
         self.url = None
         self.rss_data = None
+        self.etag = None
+        self.last_modified = None
+        self.max_age = None
+
+    @property
+    def not_modified(self) -> bool:
+        """True when the server answered a conditional fetch with 304"""
+        return self.rss_data is None
 
     @classmethod
-    async def async_init(cls, url) -> "RSSUtils":
-        """initialize rss utils asynchroneously"""
+    async def async_init(cls, url, etag=None, last_modified=None) -> "RSSUtils":
+        """initialize rss utils asynchroneously
+
+        Passing the ETag and Last-Modified of the previous fetch makes the
+        request conditional, an unchanged feed is then neither downloaded
+        nor parsed and `not_modified` is True.
+        """
         self = cls()
         self.url = url
-        rss_data = await cls.__get_rss_data(url)
-        self.rss_data = rss_data
+        (
+            self.rss_data,
+            self.etag,
+            self.last_modified,
+            self.max_age,
+        ) = await cls.__get_rss_data(url, etag, last_modified)
         return self
 
+    def get_refresh_hints(self) -> dict:
+        """Gets the hints of the publisher on how often to poll the feed"""
+        hints = {"max_age": self.max_age}
+        if not self.not_modified:
+            hints.update(self.rss_data.hints)
+        return hints
+
     async def get_rss_info(self) -> dict:
         """Gets RSS feed provider information"""
-        rss_info = {}
-        rss_info["title"] = self.rss_data.feed.title
-        rss_info["link"] = self.rss_data.feed.link
-        rss_info["description"] = self.rss_data.feed.description
-        rss_info["image"] = self.rss_data.feed.image.url
-        return rss_info
-
-    async def get_rss_item_data(self, rss_item) -> dict:
-        """Gets RSS feed item data"""
-        rss_item_data = {}
-        rss_item_data["title"] = rss_item.title
-        rss_item_data["link"] = rss_item.link
-        rss_item_data["description"] = rss_item.description
-        rss_item_data["published_date"] = parser.parse(rss_item.published)
-        return rss_item_data
+        if not self.rss_data.info["title"]:
+            raise BadRequest("RSS url is not a valid rss feed")
+        return dict(self.rss_data.info)
 
     async def get_rss_items(self) -> list:
-        """Gets RSS feed items"""
-        rss_items = []
-        for rss_item in self.rss_data.entries:
-            rss_items.append(await self.get_rss_item_data(rss_item))
-        return rss_items
+        """Gets RSS feed items, leaving out entries that could not be parsed"""
+        return [
+            {
+                "title": title,
+                "link": link,
+                "description": description,
+                "published_date": published_date,
+            }
+            for title, link, description, published_date in self.rss_data.items
+        ]
@@ -0,0 +1,97 @@
+from typing import Dict, List, Set, Tuple, Union
+
+from core.cache import TTLCache
+from core.config import settings
+from models.rss_feed import RssFeed
+
+TimelinePage = Tuple[List[RssFeed], Union[str, None]]
+
+
+class TimelineCache:
+    """Short lived per subscriber cache of timeline pages
+
+    Pages are dropped when the subscriber follows or unfollows a provider
+    and when new rss feeds of one of the providers they follow are stored.
+    Invalidation only reaches the worker it runs in, TIMELINE_CACHE_TTL
+    bounds how stale the other workers can be.
+
+    A subscriber is forgotten by the indexes once their last page is
+    evicted or invalidated, so they never outgrow the cache.
+    """
+
+    def __init__(self):
+        self.pages = TTLCache(
+            settings.TIMELINE_CACHE_SIZE,
+            settings.TIMELINE_CACHE_TTL,
+            on_evict=self._evicted,
+        )
+        self._keys_by_subscriber: Dict[str, Set[tuple]] = {}
+        self._providers_by_subscriber: Dict[str, Set[str]] = {}
+        self._subscribers_by_provider: Dict[str, Set[str]] = {}
+
+    def get(
+        self, subscriber_id: str, limit: int, after: Union[str, None]
+    ) -> Union[TimelinePage, None]:
+        return self.pages.get((str(subscriber_id), limit, after))
+
+    def set(
+        self,
+        subscriber_id: str,
+        provider_ids: List,
+        limit: int,
+        after: Union[str, None],
+        page: TimelinePage,
+    ):
+        """Caches a timeline page of a subscriber
+
+        Args:
+            subscriber_id (str): id of the subscriber
+            provider_ids (List): ids of the providers the page was built from
+            limit (int): size of the page
+            after (str): cursor the page starts after
+            page (tuple): rss feeds and cursor of the next page
+        """
+        subscriber_id = str(subscriber_id)
+        key = (subscriber_id, limit, after)
+        self.pages.set(key, page)
+        self._keys_by_subscriber.setdefault(subscriber_id, set()).add(key)
+        providers = self._providers_by_subscriber.setdefault(subscriber_id, set())
+        for provider_id in map(str, provider_ids):
+            providers.add(provider_id)
+            self._subscribers_by_provider.setdefault(provider_id, set()).add(
+                subscriber_id
+            )
+
+    def _evicted(self, key: tuple, page: TimelinePage):
+        subscriber_id = key[0]
+        keys = self._keys_by_subscriber.get(subscriber_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                self._forget(subscriber_id)
+
+    def _forget(self, subscriber_id: str) -> Set[tuple]:
+        keys = self._keys_by_subscriber.pop(subscriber_id, set())
+        for provider_id in self._providers_by_subscriber.pop(subscriber_id, set()):
+            subscribers = self._subscribers_by_provider.get(provider_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber_id)
+                if not subscribers:
+                    del self._subscribers_by_provider[provider_id]
+        return keys
+
+    def invalidate_subscriber(self, subscriber_id: str):
+        """Drops every cached page of a subscriber"""
+        for key in self._forget(str(subscriber_id)):
+            self.pages.delete(key)
+
+    def invalidate_provider(self, provider_id: str):
+        """Drops the cached pages of every subscriber following a provider"""
+        for subscriber_id in self._subscribers_by_provider.pop(str(provider_id), set()):
+            self.invalidate_subscriber(subscriber_id)
+
+    def stats(self) -> dict:
+        return self.pages.stats()
+
+
+timeline_cache = TimelineCache()
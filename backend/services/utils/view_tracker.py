@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Deque, Tuple, Union
+
+from bson import ObjectId
+
+from core.cache import TTLCache
+from core.config import settings
+from core.database import database_client
+from database.collection_version import CollectionVersionDatabase
+from database.rss_feed import RssFeedDatabase
+from database.rss_feed_view import RssFeedViewDatabase
+from models.rss_feed import RssFeedView
+
+logger = logging.getLogger(__name__)
+
+ACCEPTED = "accepted"
+DUPLICATE = "duplicate"
+DROPPED = "dropped"
+
+# (view id, feed id, viewer id, viewed at)
+BufferedView = Tuple[ObjectId, ObjectId, ObjectId, datetime]
+
+
+class ViewTracker:
+    """Records rss feed views in memory and writes them in batches
+
+    Recording a view only appends a tuple to a bounded buffer of
+    VIEW_BUFFER_SIZE views; once full, new views are dropped and counted
+    rather than letting memory grow while the database is unreachable. A
+    viewer viewing the same rss feed again within VIEW_DEDUPE_WINDOW
+    seconds is not recorded twice.
+
+    The buffer is flushed every VIEW_FLUSH_INTERVAL_MS milliseconds, or as
+    soon as VIEW_FLUSH_BATCH_SIZE views are waiting: views are appended to
+    the views collection in one insert and the view counts of the rss
+    feeds bumped in one bulk write. A batch that fails is kept and written
+    again with the next flush: views carry their id, so the ones that made
+    it the first time are not stored twice, and counts are only added once
+    their views are stored.
+
+    Flushes do not bump the version of the rss feeds collection, which
+    would change every ETag each second; it is bumped for view counts at
+    most every VIEW_COUNTS_VERSION_INTERVAL seconds, so counts served
+    through conditional requests lag by that much at most.
+    """
+
+    def __init__(
+        self,
+        flush_interval_ms: int = None,
+        flush_batch_size: int = None,
+        buffer_size: int = None,
+        dedupe_window: float = None,
+    ):
+        self.flush_interval = (
+            flush_interval_ms or settings.VIEW_FLUSH_INTERVAL_MS
+        ) / 1000
+        self.flush_batch_size = flush_batch_size or settings.VIEW_FLUSH_BATCH_SIZE
+        self.buffer_size = buffer_size or settings.VIEW_BUFFER_SIZE
+        self.recent_views = TTLCache(
+            settings.VIEW_DEDUPE_SIZE,
+            settings.VIEW_DEDUPE_WINDOW if dedupe_window is None else dedupe_window,
+        )
+        self._views: Deque[BufferedView] = deque()
+        self._view_counts: Counter = Counter()
+        self._flush_requested: Union[asyncio.Event, None] = None
+        self._task: Union[asyncio.Task, None] = None
+        self._counts_updated = False
+        self._counts_versioned_at = time.monotonic()
+        self.accepted = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.flush_errors = 0
+
+    def record(self, feed_id, viewer_id, viewed_at: datetime = None) -> str:
+        """Buffers a view of a rss feed by a subscriber
+
+        Returns:
+            str: ACCEPTED, DUPLICATE when seen within the dedupe window, or
+                DROPPED when the buffer is full
+        """
+        feed_id, viewer_id = ObjectId(feed_id), ObjectId(viewer_id)
+        if self.recent_views.get((viewer_id, feed_id)) is not None:
+            self.deduplicated += 1
+            return DUPLICATE
+        if len(self._views) >= self.buffer_size:
+            self.dropped += 1
+            return DROPPED
+
+        self.recent_views.set((viewer_id, feed_id), True)
+        self._views.append(
+            (ObjectId(), feed_id, viewer_id, viewed_at or datetime.utcnow())
+        )
+        self.accepted += 1
+        if (
+            len(self._views) >= self.flush_batch_size
+            and self._flush_requested is not None
+        ):
+            self._flush_requested.set()
+        return ACCEPTED
+
+    async def flush(self) -> int:
+        """Writes the buffered views and view counts, one batch at a time
+
+        Returns:
+            int: number of views written
+        """
+        db = database_client.get_database()
+        view_db, rss_feed_db = RssFeedViewDatabase(db), RssFeedDatabase(db)
+        written = 0
+        while True:
+            batch = [
+                self._views.popleft()
+                for _ in range(min(self.flush_batch_size, len(self._views)))
+            ]
+            if batch:
+                try:
+                    await view_db.insert_many(
+                        [
+                            RssFeedView(
+                                id=id,
+                                feed_id=feed_id,
+                                viewer_id=viewer_id,
+                                viewed_at=at,
+                            )
+                            for id, feed_id, viewer_id, at in batch
+                        ]
+                    )
+                except Exception:
+                    self._views.extendleft(reversed(batch))
+                    raise
+                self._view_counts.update(feed_id for _, feed_id, _, _ in batch)
+
+            view_counts, self._view_counts = self._view_counts, Counter()
+            try:
+                await rss_feed_db.increment_view_counts(view_counts)
+            except Exception:
+                self._view_counts.update(view_counts)
+                raise
+            if view_counts:
+                self._counts_updated = True
+            await self._bump_counts_version(db)
+            self.flushed += len(batch)
+            written += len(batch)
+            if not self._views:
+                return written
+
+    async def _bump_counts_version(self, db):
+        """Publishes updated view counts through the collection version,
+        at most every VIEW_COUNTS_VERSION_INTERVAL seconds"""
+        now = time.monotonic()
+        if (
+            not self._counts_updated
+            or now - self._counts_versioned_at < settings.VIEW_COUNTS_VERSION_INTERVAL
+        ):
+            return
+        await CollectionVersionDatabase(db).bump(settings.RSS_FEEDS_COLLECTION)
+        self._counts_updated = False
+        self._counts_versioned_at = now
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._flush_requested.wait(), timeout=self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                self.flush_errors += 1
+                logger.warning("flushing rss feed views failed: %s", e)
+                await asyncio.sleep(self.flush_interval)
+
+    def start(self):
+        """Flushes buffered views in the background"""
+        if self._task is None:
+            # created here so it belongs to the running event loop
+            self._flush_requested = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops flushing in the background and writes what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning("flushing rss feed views on shutdown failed: %s", e)
+
+    def stats(self) -> dict:
+        return {
+            "pending_views": len(self._views),
+            "pending_counts": len(self._view_counts),
+            "buffer_size": self.buffer_size,
+            "accepted": self.accepted,
+            "deduplicated": self.deduplicated,
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+            "flush_errors": self.flush_errors,
+        }
+
+
+view_tracker = ViewTracker()
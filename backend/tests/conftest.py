@@ -0,0 +1,28 @@
+import os
+import sys
+
+# modules are imported from backend/, as when the app runs
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for name in ("JWT_SECRET_KEY", "EMAIL_HOST_USER", "EMAIL_HOST_PASSWORD"):
+    os.environ.setdefault(name, "test")
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from core.database import database_client
+from services.utils.response_cache import response_cache
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """In-memory database served by the shared database client"""
+    db = AsyncMongoMockClient()["test"]
+    monkeypatch.setattr(database_client, "get_database", lambda: db)
+    # collection versions start over, responses of other tests share ETags
+    response_cache.invalidate_local(None)
+    return db
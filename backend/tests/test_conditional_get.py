@@ -0,0 +1,92 @@
+from datetime import datetime
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from application.routers import rss_feed
+from core.dependencies import get_current_user
+from database.rss_feed import RssFeedDatabase
+from database.rss_provider import RssProviderDatabase
+from middlewares.error_handler import ErrorHandlerMiddleware
+from models.rss_feed import RssFeed
+from models.rss_provider import RssProvider
+from models.subscriber import Subscriber
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def client(database):
+    app = FastAPI()
+    app.add_middleware(ErrorHandlerMiddleware)
+    app.include_router(rss_feed.router)
+    app.dependency_overrides[get_current_user] = lambda: Subscriber(
+        name="reader", email="reader@example.com", password="hash"
+    )
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+async def feed(database):
+    return await RssFeedDatabase(database).create(
+        RssFeed(
+            title="feed",
+            link="http://provider.test/feed",
+            description="d",
+            published_date=datetime(2026, 10, 17),
+        )
+    )
+
+
+async def test_matching_etag_answers_not_modified(client, feed):
+    response = await client.get("/rss_feeds/")
+    etag = response.headers["etag"]
+    assert response.status_code == 200
+    assert response.headers["cache-control"]
+
+    response = await client.get("/rss_feeds/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+
+async def test_write_changes_the_etag(database, client, feed):
+    etag = (await client.get("/rss_feeds/")).headers["etag"]
+
+    await RssFeedDatabase(database).delete(feed.id)
+
+    response = await client.get("/rss_feeds/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["items"] == []
+
+
+async def test_view_counts_and_fetch_state_keep_the_etag(database, client, feed):
+    provider = await RssProviderDatabase(database).create(
+        RssProvider(
+            url="http://provider.test/rss",
+            title="provider",
+            description="d",
+            image="http://provider.test/image.png",
+        )
+    )
+    etag = (await client.get("/rss_feeds/")).headers["etag"]
+    versions = await database["collection_versions"].find().to_list(None)
+
+    await RssFeedDatabase(database).increment_view_counts({feed.id: 3})
+    await RssProviderDatabase(database).set_fields(
+        provider.id, etag='"abc"', next_fetch_at=datetime(2026, 10, 17)
+    )
+
+    response = await client.get("/rss_feeds/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert await database["collection_versions"].find().to_list(None) == versions
+
+
+async def test_stream_carries_the_etag(client, feed):
+    response = await client.get("/rss_feeds/", params={"stream": "true"})
+    assert response.status_code == 200
+    assert response.headers["etag"]
+    assert response.headers["cache-control"]
@@ -0,0 +1,62 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+from core.config import settings
+from core.inverted_index import InvertedIndex
+from database.feed_search_index import FeedSearchIndex
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def embedded(monkeypatch):
+    monkeypatch.setattr(settings, "FEED_SEARCH_BACKEND", "embedded")
+
+
+def rss_feed(title: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=ObjectId(),
+        provider_id=None,
+        published_date=datetime(2026, 10, 17),
+        title=title,
+        description="",
+    )
+
+
+async def test_changes_are_searchable_in_order(embedded, tmp_path):
+    index = FeedSearchIndex(str(tmp_path / "index"))
+    kept, removed = rss_feed("kept"), rss_feed("removed")
+
+    index.add([kept, removed])
+    index.remove(removed.id)
+
+    hits, _ = await index.search("kept removed", 10)
+    assert [id for id, _ in hits] == [kept.id]
+
+
+async def test_snapshot_renamed_over_by_another_worker_is_not_mapped(
+    embedded, monkeypatch, tmp_path
+):
+    path = str(tmp_path / "index")
+    index, other = FeedSearchIndex(path), FeedSearchIndex(path)
+    ours = rss_feed("ours")
+    index.add([ours])
+    other.add([rss_feed("theirs")])
+    write = InvertedIndex.write
+
+    def write_then_race(self, path):
+        temporary_path = write(self, path)
+        if self is index.index:
+            # another worker snapshots the same path in between
+            other.index.save(path)
+        return temporary_path
+
+    monkeypatch.setattr(InvertedIndex, "write", write_then_race)
+
+    await index.save()
+
+    assert [id for id, _ in (await index.search("ours", 10))[0]] == [ours.id]
+    assert index.stats()["newest_id"] == str(ours.id)
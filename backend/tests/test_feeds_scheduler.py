@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from apscheduler.jobstores.memory import MemoryJobStore
+
+from core.config import settings
+from models.feed_refresh import RefreshRunReport
+from models.rss_provider import RssProvider
+from database.rss_provider import RssProviderDatabase
+from services import feeds_scheduler
+from services.feeds_scheduler import FeedScheduler
+from services.utils.leader_lease import LeaderLease
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def scheduler(monkeypatch, database):
+    monkeypatch.setattr(
+        feeds_scheduler, "MongoDBJobStore", lambda **kwargs: MemoryJobStore()
+    )
+    monkeypatch.setattr(settings, "SCHEDULER_LEASE_RENEW_INTERVAL", 1)
+    monkeypatch.setattr(settings, "FEED_DISPATCH_INTERVAL", 0.05)
+    return FeedScheduler()
+
+
+async def test_dispatch_job_is_awaited_once_the_lease_is_held(scheduler):
+    dispatched = asyncio.Event()
+
+    async def dispatch():
+        dispatched.set()
+
+    scheduler.start(func=dispatch)
+    try:
+        await asyncio.wait_for(dispatched.wait(), timeout=5)
+    finally:
+        await scheduler.shutdown()
+
+
+async def test_dispatch_due_providers_refreshes_due_providers(
+    monkeypatch, database, scheduler
+):
+    now = datetime.utcnow()
+    rss_provider_db = RssProviderDatabase(database)
+    due = RssProvider(
+        url="http://due.test/rss",
+        title="due",
+        description="d",
+        image="http://due.test/image.png",
+        next_fetch_at=now - timedelta(minutes=1),
+    )
+    later = RssProvider(
+        url="http://later.test/rss",
+        title="later",
+        description="d",
+        image="http://later.test/image.png",
+        next_fetch_at=now + timedelta(hours=1),
+    )
+    await rss_provider_db.create(due)
+    await rss_provider_db.create(later)
+
+    runs = []
+
+    class Pipeline:
+        def __init__(self, db, fence=None):
+            self.fence = fence
+
+        async def run(self, providers, lease_token=None):
+            runs.append(([provider.id for provider in providers], lease_token))
+            return RefreshRunReport(lease_token=lease_token)
+
+    monkeypatch.setattr(feeds_scheduler, "FeedRefreshPipeline", Pipeline)
+    lease = LeaderLease("feed_scheduler_test")
+    assert await lease.try_acquire()
+    monkeypatch.setattr(scheduler, "lease", lease)
+    monkeypatch.setattr(feeds_scheduler, "feed_scheduler", scheduler)
+
+    await FeedScheduler.dispatch_due_providers()
+
+    assert runs == [([due.id], lease.token)]
+
+
+async def test_dispatch_due_providers_skips_without_the_lease(
+    monkeypatch, database, scheduler
+):
+    monkeypatch.setattr(
+        feeds_scheduler,
+        "FeedRefreshPipeline",
+        lambda *args, **kwargs: pytest.fail("dispatched without the lease"),
+    )
+    monkeypatch.setattr(feeds_scheduler, "feed_scheduler", scheduler)
+
+    await FeedScheduler.dispatch_due_providers()
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from core.config import settings
+from database.rss_provider import RssProviderDatabase
+from models.rss_provider import RssProvider
+from services.feed_refresh import FeedRefreshPipeline
+from services.rss_provider import RssProviderService
+from services.utils.leader_lease import LeaderLease, LeaseLostError
+
+pytestmark = pytest.mark.anyio
+
+
+async def expire(database, lease: LeaderLease):
+    await database[settings.SCHEDULER_LEASE_COLLECTION].update_one(
+        {"_id": lease.name},
+        {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}},
+    )
+
+
+async def test_lease_is_held_by_one_process(database):
+    leader, follower = LeaderLease("test"), LeaderLease("test")
+
+    assert await leader.try_acquire()
+    assert not await follower.try_acquire()
+    assert await leader.try_acquire()
+    assert leader.token == 1
+    assert await leader.is_valid()
+    assert not await follower.is_valid()
+
+
+async def test_expired_lease_is_taken_over_with_a_new_token(database):
+    leader, follower = LeaderLease("test"), LeaderLease("test")
+    assert await leader.try_acquire()
+
+    await expire(database, leader)
+
+    assert await follower.try_acquire()
+    assert follower.token == leader.token + 1
+    assert not await leader.is_valid()
+    # the former leader steps down instead of renewing
+    assert not await leader.try_acquire()
+    assert not leader.is_leader
+
+
+async def test_released_lease_is_taken_at_once(database):
+    leader, follower = LeaderLease("test"), LeaderLease("test")
+    assert await leader.try_acquire()
+
+    await leader.release()
+
+    assert await follower.try_acquire()
+    assert not leader.is_leader
+
+
+async def test_fetch_state_written_under_an_older_lease_is_rejected(database):
+    provider = await RssProviderDatabase(database).create(
+        RssProvider(
+            url="http://provider.test/rss",
+            title="provider",
+            description="d",
+            image="http://provider.test/image.png",
+        )
+    )
+    service = RssProviderService(database)
+    next_fetch_at = datetime(2026, 10, 17, 12)
+
+    assert await service.update_fetch_state(provider.id, 2, next_fetch_at=next_fetch_at)
+    with pytest.raises(LeaseLostError):
+        await service.update_fetch_state(
+            provider.id, 1, next_fetch_at=datetime(2026, 10, 17, 13)
+        )
+
+    stored = await RssProviderDatabase(database).get_by_id(provider.id)
+    assert stored.next_fetch_at == next_fetch_at
+
+
+async def test_refresh_run_stops_once_the_lease_is_lost(monkeypatch, database):
+    rss_provider_db = RssProviderDatabase(database)
+    providers = [
+        await rss_provider_db.create(
+            RssProvider(
+                url=f"http://provider{number}.test/rss",
+                title="provider",
+                description="d",
+                image="http://provider.test/image.png",
+            )
+        )
+        for number in range(3)
+    ]
+
+    async def lost():
+        return False
+
+    pipeline = FeedRefreshPipeline(database, concurrency=1, fence=lost)
+
+    async def fetch(provider, report):
+        return SimpleNamespace(not_modified=False)
+
+    async def parse(provider, rss_util, report):
+        return []
+
+    async def persist(*args):
+        pytest.fail("persisted without the lease")
+
+    monkeypatch.setattr(pipeline, "fetch", fetch)
+    monkeypatch.setattr(pipeline, "parse", parse)
+    monkeypatch.setattr(pipeline, "persist", persist)
+
+    report = await pipeline.run(providers, lease_token=1)
+
+    assert report.fenced
+    assert [provider.fenced for provider in report.providers] == [True]
+    stored = await rss_provider_db.get_by_id(providers[0].id)
+    assert stored.next_fetch_at is None
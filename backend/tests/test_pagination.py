@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from core.exceptions import BadRequest
+from database.rss_feed import RssFeedDatabase
+from models.rss_feed import RssFeed
+from services.rss_feed import RssFeedService
+from services.utils.pagination import KeysetCursor
+
+pytestmark = pytest.mark.anyio
+
+
+def test_cursor_round_trip():
+    published_date, id = datetime(2026, 10, 17, 12, 30, 15, 250), ObjectId()
+
+    assert KeysetCursor.decode(KeysetCursor.encode(published_date, id)) == (
+        published_date,
+        id,
+    )
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "MjAyNnxub3QgYW4gaWQ="])
+def test_invalid_cursor_is_a_bad_request(cursor):
+    with pytest.raises(BadRequest):
+        KeysetCursor.decode(cursor)
+
+
+async def test_pages_list_every_feed_once_newest_first(database):
+    rss_feed_db = RssFeedDatabase(database)
+    # feeds published at the same time are ordered by id
+    rss_feeds = [
+        await rss_feed_db.create(
+            RssFeed(
+                title=f"feed {number}",
+                link=f"http://provider.test/{number}",
+                description="d",
+                published_date=datetime(2026, 10, number // 2 + 1),
+            )
+        )
+        for number in range(7)
+    ]
+    service = RssFeedService(database)
+
+    pages, after = [], None
+    while True:
+        page, after = await service.list_page(3, after)
+        pages.append([rss_feed.id for rss_feed in page])
+        if after is None:
+            break
+
+    expected = [
+        rss_feed.id
+        for rss_feed in sorted(
+            rss_feeds,
+            key=lambda rss_feed: (rss_feed.published_date, rss_feed.id),
+            reverse=True,
+        )
+    ]
+    assert pages == [expected[:3], expected[3:6], expected[6:]]
@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+from core.config import settings
+from core.redis import redis_client
+from models.subscriber import Subscriber
+from services.utils.principal_cache import PrincipalCache
+
+pytestmark = pytest.mark.anyio
+
+
+def subscriber(name: str) -> Subscriber:
+    return Subscriber(name=name, email=f"{name}@example.com", password="hash")
+
+
+async def test_password_hash_is_not_cached():
+    cache = PrincipalCache()
+    await cache.set("token", subscriber("reader"), time.time() + 60)
+
+    cached = await cache.get("token")
+    assert cached.email == "reader@example.com"
+    assert "password" not in cached.dict()
+
+
+async def test_evicted_tokens_are_forgotten(monkeypatch):
+    monkeypatch.setattr(settings, "PRINCIPAL_CACHE_SIZE", 2)
+    cache = PrincipalCache()
+    readers = [subscriber(f"reader{number}") for number in range(5)]
+    for number, reader in enumerate(readers):
+        await cache.set(f"token{number}", reader, time.time() + 60)
+
+    assert len(cache.local) == 2
+    assert set(cache._keys_by_subscriber) == {str(reader.id) for reader in readers[3:]}
+
+
+class ExpiringRedis:
+    """Redis holding a principal whose token has just expired"""
+
+    def __init__(self, cached: str):
+        self.cached = cached
+
+    def pipeline(self, transaction=True):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def get(self, key):
+        pass
+
+    def ttl(self, key):
+        pass
+
+    async def execute(self):
+        return [self.cached, -2]
+
+
+async def test_redis_hit_of_an_expired_token_is_a_miss(monkeypatch):
+    cache = PrincipalCache()
+    reader = subscriber("reader").copy(exclude={"password"})
+    monkeypatch.setattr(redis_client, "get", lambda: ExpiringRedis(reader.json()))
+
+    assert await cache.get("token") is None
+    assert len(cache.local) == 0
+
+
+async def test_invalidation_reaches_every_worker():
+    cache, other_worker = PrincipalCache(), PrincipalCache()
+    reader = subscriber("reader")
+    await cache.set("token", reader, time.time() + 60)
+    await other_worker.set("token", reader, time.time() + 60)
+
+    await cache.invalidate_subscriber(reader.id)
+
+    assert await cache.get("token") is None
+    assert await other_worker.get("token") is None
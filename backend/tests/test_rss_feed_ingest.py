@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from database.rss_feed import RssFeedDatabase
+from models.rss_feed import RssFeed
+
+pytestmark = pytest.mark.anyio
+
+
+def rss_feed(number: int) -> RssFeed:
+    return RssFeed(
+        title=f"feed {number}",
+        link=f"http://provider.test/{number}",
+        description="d",
+        published_date=datetime(2026, 10, 17),
+    )
+
+
+def failing_bulk_write(code: int):
+    async def bulk_write(operations, ordered):
+        raise BulkWriteError(
+            {
+                "writeErrors": [{"index": 0, "code": code, "errmsg": "failed"}],
+                "nModified": 0,
+                "upserted": [],
+            }
+        )
+
+    return bulk_write
+
+
+async def test_duplicate_links_count_as_skipped(monkeypatch, database):
+    rss_feed_db = RssFeedDatabase(database)
+    monkeypatch.setattr(rss_feed_db.collection, "bulk_write", failing_bulk_write(11000))
+
+    result = await rss_feed_db.upsert_many([rss_feed(1)])
+
+    assert (result.inserted, result.updated, result.skipped) == (0, 0, 1)
+
+
+async def test_other_write_errors_are_raised(monkeypatch, database):
+    rss_feed_db = RssFeedDatabase(database)
+    monkeypatch.setattr(rss_feed_db.collection, "bulk_write", failing_bulk_write(10334))
+
+    with pytest.raises(BulkWriteError):
+        await rss_feed_db.upsert_many([rss_feed(1)])
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from application.routers import rss_provider
+from core.config import settings
+from core.dependencies import get_current_user
+from database.rss_provider import RssProviderDatabase
+from models.rss_provider import RssProvider
+from models.subscriber import Subscriber
+
+pytestmark = pytest.mark.anyio
+
+SCHEDULER_FIELDS = {
+    "etag",
+    "last_modified",
+    "fetch_interval",
+    "min_fetch_interval",
+    "next_fetch_at",
+}
+
+
+@pytest.fixture
+def client(database):
+    app = FastAPI()
+    app.include_router(rss_provider.router)
+    app.dependency_overrides[get_current_user] = lambda: Subscriber(
+        name="reader", email="reader@example.com", password="hash"
+    )
+    return httpx.AsyncClient(app=app, base_url="http://test")
+
+
+@pytest.mark.parametrize("fast_json", [False, True])
+async def test_provider_responses_leave_the_fetch_state_out(
+    monkeypatch, database, client, fast_json
+):
+    monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", fast_json)
+    provider = await RssProviderDatabase(database).create(
+        RssProvider(
+            url="http://provider.test/rss",
+            title="provider",
+            description="d",
+            image="http://provider.test/image.png",
+            etag='"abc"',
+            last_modified="Sat, 17 Oct 2026 00:00:00 GMT",
+            fetch_interval=600,
+            min_fetch_interval=60,
+            next_fetch_at=datetime(2026, 10, 17),
+        )
+    )
+
+    async with client:
+        listed = await client.get("/rss_providers/")
+        fetched = await client.get(f"/rss_providers/{provider.id}")
+
+    assert listed.status_code == 200 and fetched.status_code == 200
+    for body in (listed.json()[0], fetched.json()):
+        assert body["id"] == str(provider.id)
+        assert body["title"] == "provider"
+        assert not SCHEDULER_FIELDS & set(body)
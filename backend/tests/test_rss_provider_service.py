@@ -0,0 +1,62 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from database.rss_provider import RssProviderDatabase
+from models.rss_provider import RssProvider
+from services import rss_provider
+from services.rss_provider import RssProviderService
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_created_provider_is_fetched_in_full_first(monkeypatch, database):
+    class RSSUtils:
+        @staticmethod
+        async def async_init(url):
+            async def get_rss_info():
+                return {
+                    "title": "provider",
+                    "description": "d",
+                    "image": "http://provider.test/image.png",
+                }
+
+            return SimpleNamespace(
+                etag='"abc"', last_modified="yesterday", get_rss_info=get_rss_info
+            )
+
+    monkeypatch.setattr(rss_provider, "RSSUtils", RSSUtils)
+
+    created = await RssProviderService(database).create("http://provider.test/rss")
+
+    stored = await RssProviderDatabase(database).get_by_id(created.id)
+    assert stored.etag is None
+    assert stored.last_modified is None
+
+
+async def test_changing_the_url_resets_the_fetch_state(database):
+    provider = await RssProviderDatabase(database).create(
+        RssProvider(
+            url="http://old.test/rss",
+            title="provider",
+            description="d",
+            image="http://old.test/image.png",
+            last_feed_time=datetime(2026, 10, 17),
+            etag='"abc"',
+            last_modified="yesterday",
+            fetch_interval=3600,
+            next_fetch_at=datetime(2026, 10, 18),
+        )
+    )
+
+    updated = await RssProviderService(database).update(
+        provider.id, "http://new.test/rss"
+    )
+
+    assert updated.url == "http://new.test/rss"
+    assert updated.last_feed_time is None
+    assert updated.etag is None
+    assert updated.last_modified is None
+    assert updated.fetch_interval is None
+    assert updated.next_fetch_at is None
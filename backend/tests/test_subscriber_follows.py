@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from core.exceptions import ExistingDataException, NotFoundException
+from database.rss_provider import RssProviderDatabase
+from database.subscriber import DBSubscriber
+from models.rss_provider import RssProvider
+from models.subscriber import Subscriber
+from services.subscriber import SubscriberService
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def subscriber(database):
+    return await DBSubscriber(database).create(
+        Subscriber(name="reader", email="reader@example.com", password="hash")
+    )
+
+
+@pytest.fixture
+async def provider(database):
+    return await RssProviderDatabase(database).create(
+        RssProvider(
+            url="http://provider.test/rss",
+            title="provider",
+            description="d",
+            image="http://provider.test/image.png",
+        )
+    )
+
+
+async def follower_count(database, provider) -> int:
+    provider = await RssProviderDatabase(database).get_by_id(provider.id)
+    return provider.follower_count
+
+
+async def test_concurrent_follows_count_one_follower(database, subscriber, provider):
+    service = SubscriberService(database)
+    results = await asyncio.gather(
+        service.provider_follow(str(subscriber.id), str(provider.id)),
+        service.provider_follow(str(subscriber.id), str(provider.id)),
+        return_exceptions=True,
+    )
+
+    assert sum(isinstance(result, Subscriber) for result in results) == 1
+    assert sum(isinstance(result, ExistingDataException) for result in results) == 1
+    assert await follower_count(database, provider) == 1
+    stored = await DBSubscriber(database).get_by_id(subscriber.id)
+    assert stored.subscribed_providers == [provider.id]
+    assert stored.password == "hash"
+
+
+async def test_unfollow_only_counts_a_followed_provider(database, subscriber, provider):
+    service = SubscriberService(database)
+    await service.provider_follow(str(subscriber.id), str(provider.id))
+
+    updated = await service.provider_unfollow(str(subscriber.id), str(provider.id))
+    assert updated.subscribed_providers == []
+    with pytest.raises(NotFoundException):
+        await service.provider_unfollow(str(subscriber.id), str(provider.id))
+    assert await follower_count(database, provider) == 0
+
+
+async def test_delete_takes_the_follows_back_once(database, subscriber, provider):
+    service = SubscriberService(database)
+    await service.provider_follow(str(subscriber.id), str(provider.id))
+
+    assert await service.delete(str(subscriber.id)) is True
+    with pytest.raises(NotFoundException):
+        await service.delete(str(subscriber.id))
+    assert await follower_count(database, provider) == 0
@@ -0,0 +1,101 @@
+from datetime import datetime
+
+import pytest
+
+from core.config import settings
+from database.rss_feed import RssFeedDatabase
+from database.rss_provider import RssProviderDatabase
+from database.subscriber import DBSubscriber
+from database.timeline_inbox import TimelineInboxDatabase
+from models.rss_feed import RssFeed
+from models.rss_provider import RssProvider
+from models.subscriber import Subscriber
+from services.timeline import TimelineService
+from services.utils.timeline_cache import timeline_cache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def timeline(monkeypatch, database):
+    monkeypatch.setattr(settings, "TIMELINE_FANOUT_ENABLED", True)
+    monkeypatch.setattr(settings, "TIMELINE_FANOUT_MAX_FOLLOWERS", 1)
+    monkeypatch.setattr(timeline_cache, "get", lambda *args: None)
+    provider = await RssProviderDatabase(database).create(
+        RssProvider(
+            url="http://provider.test/rss",
+            title="provider",
+            description="d",
+            image="http://provider.test/image.png",
+        )
+    )
+    readers = [
+        Subscriber(
+            name=f"reader{number}",
+            email=f"reader{number}@example.com",
+            password="hash",
+            subscribed_providers=[provider.id],
+        )
+        for number in range(2)
+    ]
+    for reader in readers:
+        await DBSubscriber(database).create(reader)
+    rss_feeds = [
+        await RssFeedDatabase(database).create(
+            RssFeed(
+                title=f"feed {number}",
+                link=f"http://provider.test/{number}",
+                description="d",
+                published_date=datetime(2026, 10, 17, number),
+                provider_id=provider.id,
+            )
+        )
+        for number in range(3)
+    ]
+    return TimelineService(database), provider, readers, rss_feeds
+
+
+async def feed_ids(service: TimelineService, reader: Subscriber) -> list:
+    rss_feeds, _ = await service.get_page(reader, 10)
+    return [rss_feed.id for rss_feed in rss_feeds]
+
+
+async def test_provider_turned_popular_is_listed_once(database, timeline):
+    service, provider, readers, rss_feeds = timeline
+    newest_first = [rss_feed.id for rss_feed in reversed(rss_feeds)]
+    # following another provider keeps reading the inbox
+    other = await RssProviderDatabase(database).create(
+        RssProvider(
+            url="http://other.test/rss",
+            title="other",
+            description="d",
+            image="http://other.test/image.png",
+        )
+    )
+    readers[0].subscribed_providers.append(other.id)
+    await service.follow(readers[0].id, provider)
+    assert await feed_ids(service, readers[0]) == newest_first
+
+    # the second follower makes it popular, its inbox entries stay behind
+    await RssProviderDatabase(database).add_followers(provider.id, 1)
+
+    assert await feed_ids(service, readers[0]) == newest_first
+
+
+async def test_provider_no_longer_popular_is_backfilled(database, timeline):
+    service, provider, readers, rss_feeds = timeline
+    newest_first = [rss_feed.id for rss_feed in reversed(rss_feeds)]
+    await RssProviderDatabase(database).add_followers(provider.id, 2)
+    # the inbox holds nothing of the popular provider
+    await TimelineInboxDatabase(database).create(readers[0].id, [])
+    assert await feed_ids(service, readers[0]) == newest_first
+
+    await service.unfollow(readers[1].id, provider)
+
+    inbox = await TimelineInboxDatabase(database).get_page(readers[0].id, 10)
+    assert [entry["feed_id"] for entry in inbox[0]] == newest_first
+    assert await feed_ids(service, readers[0]) == newest_first
+    stored = await database[settings.RSS_PROVIDER_COLLECTION].find_one(
+        {"_id": provider.id}
+    )
+    assert stored["inbox_backfill"] is False
@@ -0,0 +1,25 @@
+from core.config import settings
+from services.utils.timeline_cache import TimelineCache
+
+
+def test_evicted_subscribers_are_forgotten(monkeypatch):
+    monkeypatch.setattr(settings, "TIMELINE_CACHE_SIZE", 2)
+    cache = TimelineCache()
+    for number in range(5):
+        cache.set(f"subscriber{number}", [f"provider{number}"], 10, None, ([], None))
+
+    assert set(cache._keys_by_subscriber) == {"subscriber3", "subscriber4"}
+    assert set(cache._providers_by_subscriber) == {"subscriber3", "subscriber4"}
+    assert set(cache._subscribers_by_provider) == {"provider3", "provider4"}
+
+
+def test_invalidating_a_provider_forgets_its_subscribers():
+    cache = TimelineCache()
+    cache.set("subscriber", ["provider", "other"], 10, None, ([], None))
+
+    cache.invalidate_provider("provider")
+
+    assert cache.get("subscriber", 10, None) is None
+    assert cache._keys_by_subscriber == {}
+    assert cache._providers_by_subscriber == {}
+    assert cache._subscribers_by_provider == {}